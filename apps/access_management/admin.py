@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Q
 from django.utils.html import format_html
 from .models import SystemAccess, DigitalSignature
 
@@ -14,10 +15,24 @@ class SystemAccessAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('employee', 'system')
 
 
+class LegacyDuplicateFilter(admin.SimpleListFilter):
+    """Подписи, оставшиеся без ключа номера или отпечатка как дубликаты при миграции 0004"""
+    title = 'Дубликат до введения ключей'
+    parameter_name = 'legacy_duplicate'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Да'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(Q(serial_key='') | Q(thumbprint_key=''))
+        return queryset
+
+
 @admin.register(DigitalSignature)
 class DigitalSignatureAdmin(admin.ModelAdmin):
     list_display = ('employee', 'certificate_type', 'certificate_serial', 'expiry_date', 'status', 'has_file', 'created_at')
-    list_filter = ('status', 'certificate_type', 'expiry_date')
+    list_filter = ('status', 'certificate_type', 'expiry_date', LegacyDuplicateFilter)
     search_fields = (
         'employee__last_name', 'employee__first_name', 'employee__middle_name',
         'certificate_serial', 'certificate_alias', 'carrier_serial', 'notes'
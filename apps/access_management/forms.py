@@ -142,6 +142,7 @@ class DigitalSignatureForm(forms.ModelForm):
                     "Проверьте формат файла или заполните поля вручную."
                 )
         
+        # Уникальность серийного номера и отпечатка проверяется в DigitalSignature.clean()
         return cleaned_data
 
 
@@ -164,6 +165,13 @@ class BulkCertificateUploadForm(forms.Form):
         empty_label='-- Не указан --',
         widget=forms.Select(attrs={'class': 'form-select'})
     )
+    update_existing = forms.BooleanField(
+        required=False,
+        initial=False,
+        label='Обновлять существующие сертификаты',
+        help_text='Для уже загруженных сертификатов (совпал серийный номер или отпечаток) обновить срок действия и статус вместо пропуска',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
 
 class CertificateImportForm(forms.Form):
@@ -185,6 +193,13 @@ class CertificateImportForm(forms.Form):
         empty_label='-- Использовать тип из HTML --',
         widget=forms.Select(attrs={'class': 'form-select'})
     )
+    update_existing = forms.BooleanField(
+        required=False,
+        initial=False,
+        label='Обновлять существующие сертификаты',
+        help_text='Для уже загруженных сертификатов (совпал серийный номер) обновить срок действия и статус вместо пропуска',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
     
     def clean_html_file(self):
         """Валидация HTML-файла"""
@@ -0,0 +1,261 @@
+"""
+Массовая загрузка файлов сертификатов (.cer, .pfx).
+
+- Сертификаты разбираются в пуле процессов (разбор X.509 - нагрузка на CPU).
+- ФИО из сертификатов сопоставляются с сотрудниками (EmployeeNameMatcher),
+  кандидаты для всех ФИО загружаются одним запросом; дубликаты проверяются
+  по нормализованным серийным номерам и отпечаткам
+  (DigitalSignature.serial_key/thumbprint_key), загруженным одним запросом. В режиме обновления у существующих подписей обновляются срок
+  действия и статус (bulk_update).
+- Файлы записываются в хранилище, записи DigitalSignature создаются через
+  bulk_create в одной транзакции; при ошибке записанные файлы удаляются.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from apps.hr.matching import EmployeeNameMatcher
+from .models import DigitalSignature, normalize_certificate_key
+from .utils.certificate_parser import (
+    parse_certificate_file, CertificateParseError, generate_certificate_filename,
+    certificate_digest, certificate_parse_cache,
+)
+
+
+BULK_BATCH_SIZE = 500
+
+# Меньше файлов разбирается в текущем процессе: запуск пула дороже самого разбора
+PARALLEL_PARSE_THRESHOLD = 20
+CERTIFICATE_PARSE_WORKERS = getattr(settings, 'CERTIFICATE_PARSE_WORKERS', None) or os.cpu_count() or 1
+
+
+def certificate_status(expiry_date, today=None):
+    """Статус подписи по сроку действия: истекший или истекающий в течение 30 дней требует актуализации"""
+    today = today or timezone.now().date()
+    if (expiry_date - today).days <= 30:
+        return DigitalSignature.STATUS_NEEDS_UPDATE
+    return DigitalSignature.STATUS_ACTIVE
+
+
+def _parse_one(item):
+    """Разбор одного файла; выполняется в воркере пула, поэтому ошибки возвращаются, а не пробрасываются"""
+    content, filename = item
+    try:
+        data = parse_certificate_file(content, filename)
+    except CertificateParseError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f'Неожиданная ошибка: {str(e)}'
+    # Атрибуты Subject не нужны для загрузки и не передаются обратно из воркера
+    data.pop('subject_attributes', None)
+    return data, None
+
+
+def parse_certificates(items):
+    """
+    Разбирает список (содержимое, имя файла); результат в том же порядке: (данные, ошибка).
+    Уже разобранные файлы берутся из кэша разбора, в пул отправляются только остальные.
+    """
+    digests = [certificate_digest(content) for content, _ in items]
+    results = [None] * len(items)
+    missing = []
+    for index, digest in enumerate(digests):
+        data = certificate_parse_cache.get(digest)
+        if data is not None:
+            results[index] = (data, None)
+        else:
+            missing.append(index)
+
+    to_parse = [items[index] for index in missing]
+    if len(to_parse) < PARALLEL_PARSE_THRESHOLD or CERTIFICATE_PARSE_WORKERS < 2:
+        parsed = [_parse_one(item) for item in to_parse]
+    else:
+        workers = min(CERTIFICATE_PARSE_WORKERS, len(to_parse) // PARALLEL_PARSE_THRESHOLD + 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_one, to_parse, chunksize=max(1, len(to_parse) // (workers * 4))))
+
+    for index, (data, error) in zip(missing, parsed):
+        if error is None:
+            certificate_parse_cache.set(digests[index], data)
+        results[index] = (data, error)
+    return results
+
+
+class CertificateKeyIndex:
+    """Нормализованные серийные номера и отпечатки существующих подписей -> id, одним запросом"""
+
+    def __init__(self):
+        self.serials = {}
+        self.thumbprints = {}
+        for pk, serial_key, thumbprint_key in DigitalSignature.objects.values_list('pk', 'serial_key', 'thumbprint_key'):
+            if serial_key:
+                self.serials[serial_key] = pk
+            if thumbprint_key:
+                self.thumbprints[thumbprint_key] = pk
+
+    def find(self, serial_key, thumbprint_key=''):
+        pk = self.serials.get(serial_key) if serial_key else None
+        if pk is None and thumbprint_key:
+            pk = self.thumbprints.get(thumbprint_key)
+        return pk
+
+
+def update_certificates(updates):
+    """
+    Режим обновления при повторном импорте: {id подписи: (дата окончания, статус)}.
+    Аннулированные подписи статус не меняют. Возвращает множество id измененных подписей.
+    """
+    if not updates:
+        return set()
+    now = timezone.now()
+    changed = []
+    for signature in DigitalSignature.objects.filter(pk__in=list(updates)).only('pk', 'expiry_date', 'status'):
+        expiry_date, status = updates[signature.pk]
+        if signature.status == DigitalSignature.STATUS_REVOKED:
+            status = signature.status
+        if (signature.expiry_date, signature.status) == (expiry_date, status):
+            continue
+        signature.expiry_date = expiry_date
+        signature.status = status
+        # bulk_update не заполняет auto_now
+        signature.updated_at = now
+        changed.append(signature)
+    DigitalSignature.objects.bulk_update(changed, ['expiry_date', 'status', 'updated_at'], batch_size=BULK_BATCH_SIZE)
+    return {signature.pk for signature in changed}
+
+
+class BulkCertificateImporter:
+    """
+    Импортер файлов сертификатов.
+
+    Использование:
+        importer = BulkCertificateImporter(certificate_type, update_existing=False)
+        results = importer.run(files)
+        # results: {'success': [...], 'updated': [...], 'skipped': [...], 'errors': [...], 'duplicates': [...]}
+
+    update_existing - для уже загруженных сертификатов (совпал серийный номер или
+    отпечаток) обновлять срок действия и статус вместо пропуска как дубликата.
+    """
+
+    def __init__(self, certificate_type, update_existing=False):
+        self.certificate_type = certificate_type
+        self.update_existing = update_existing
+        self.results = {
+            'success': [],  # Успешно загружено
+            'updated': [],  # Обновлены срок действия и статус существующих
+            'skipped': [],  # Пропущено (сотрудник не найден)
+            'errors': [],   # Ошибки парсинга
+            'duplicates': []  # Дубликаты (уже существует)
+        }
+
+    def run(self, files):
+        items = []
+        for file in files:
+            file.seek(0)
+            items.append((file.read(), file.name))
+        parsed = parse_certificates(items)
+
+        # Правила выбора совпадают с _find_employee_by_name, кандидаты загружаются одним запросом
+        employee_index = EmployeeNameMatcher()
+        employee_index.prefetch(cert_data.get('subject_name') for cert_data, error in parsed if error is None)
+        existing = CertificateKeyIndex()
+        today = timezone.now().date()
+
+        pending = []  # (подпись, содержимое файла, новое имя файла, запись результата)
+        new_signatures = {}  # ключи новых подписей этой загрузки
+        batch_duplicates = []
+        updates = {}  # id существующей подписи -> (дата окончания, статус)
+        update_results = {}
+        for (content, original_filename), (cert_data, error) in zip(items, parsed):
+            if error is not None:
+                self.results['errors'].append({'filename': original_filename, 'error': error})
+                continue
+
+            subject_name = cert_data.get('subject_name') or ''
+            employee = employee_index.find(subject_name)
+            if not employee:
+                self.results['skipped'].append({
+                    'filename': original_filename,
+                    'subject_name': subject_name,
+                    'certificate_serial': cert_data.get('certificate_serial', 'N/A'),
+                    'reason': 'Сотрудник не найден в базе данных'
+                })
+                continue
+
+            expiry_date = cert_data['expiry_date']
+            serial_key = normalize_certificate_key(cert_data['certificate_serial'])
+            thumbprint_key = normalize_certificate_key(cert_data['certificate_alias'])
+            existing_id = existing.find(serial_key, thumbprint_key)
+            duplicate = {
+                'filename': original_filename,
+                'employee': str(employee),
+                'certificate_serial': cert_data['certificate_serial'],
+                'existing_id': existing_id
+            }
+            if existing_id is not None:
+                if self.update_existing and existing_id not in updates:
+                    updates[existing_id] = (expiry_date, certificate_status(expiry_date, today))
+                    update_results[existing_id] = duplicate
+                else:
+                    self.results['duplicates'].append(duplicate)
+                continue
+            batch_signature = new_signatures.get(serial_key) or new_signatures.get(thumbprint_key)
+            if batch_signature is not None:
+                # Повтор внутри загрузки - дубликат первого файла, id известен после сохранения
+                self.results['duplicates'].append(duplicate)
+                batch_duplicates.append((duplicate, batch_signature))
+                continue
+
+            signature = DigitalSignature(
+                employee=employee,
+                certificate_type=self.certificate_type,
+                certificate_serial=cert_data['certificate_serial'],
+                certificate_alias=cert_data['certificate_alias'],
+                expiry_date=expiry_date,
+                status=certificate_status(expiry_date, today),
+                notes=f"Сертификат выдан: {subject_name}"
+            )
+            signature.fill_keys()
+            new_filename = generate_certificate_filename(employee, expiry_date, original_filename)
+            new_signatures[serial_key] = signature
+            if thumbprint_key:
+                new_signatures[thumbprint_key] = signature
+            pending.append((signature, content, new_filename, {
+                'filename': original_filename,
+                'employee': str(employee),
+                'certificate_serial': cert_data['certificate_serial'],
+                'new_filename': new_filename
+            }))
+
+        changed = self._save(pending, updates)
+        for existing_id, result in update_results.items():
+            result['signature_id'] = existing_id
+            # Срок и статус не изменились - повторная загрузка того же сертификата
+            self.results['updated' if existing_id in changed else 'duplicates'].append(result)
+        for duplicate, signature in batch_duplicates:
+            duplicate['existing_id'] = signature.pk
+        return self.results
+
+    def _save(self, pending, updates):
+        saved_files = []
+        try:
+            with transaction.atomic():
+                for signature, content, new_filename, _ in pending:
+                    signature.certificate_file.save(new_filename, ContentFile(content), save=False)
+                    saved_files.append(signature.certificate_file.name)
+                DigitalSignature.objects.bulk_create([item[0] for item in pending], batch_size=BULK_BATCH_SIZE)
+                changed = update_certificates(updates)
+        except Exception:
+            storage = DigitalSignature._meta.get_field('certificate_file').storage
+            for name in saved_files:
+                storage.delete(name)
+            raise
+
+        for signature, _, _, result in pending:
+            result['signature_id'] = signature.pk
+            self.results['success'].append(result)
+        return changed
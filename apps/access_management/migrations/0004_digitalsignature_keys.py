@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:56
+
+from django.db import migrations, models
+
+import apps.access_management.models
+
+
+normalize_certificate_key = apps.access_management.models.normalize_certificate_key
+
+
+def fill_certificate_keys(apps, schema_editor):
+    """
+    Ключи для существующих подписей. Если нормализованный номер или отпечаток
+    повторяется, ключ получает самая ранняя запись, у остальных он остается пустым.
+    Такие дубликаты отбираются в админ-панели фильтром "Дубликат до введения ключей"
+    и разбираются вручную; пока номер и отпечаток не изменены, ключ при сохранении
+    остается пустым (см. DigitalSignature.certificate_keys).
+    """
+    DigitalSignature = apps.get_model('access_management', 'DigitalSignature')
+    signatures = list(
+        DigitalSignature.objects.order_by('created_at', 'pk').only('id', 'certificate_serial', 'certificate_alias')
+    )
+    seen_serials = set()
+    seen_thumbprints = set()
+    for signature in signatures:
+        serial_key = normalize_certificate_key(signature.certificate_serial)
+        thumbprint_key = normalize_certificate_key(signature.certificate_alias)
+        signature.serial_key = serial_key if serial_key not in seen_serials else ''
+        signature.thumbprint_key = thumbprint_key if thumbprint_key not in seen_thumbprints else ''
+        seen_serials.add(serial_key)
+        seen_thumbprints.add(thumbprint_key)
+    DigitalSignature.objects.bulk_update(signatures, ['serial_key', 'thumbprint_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_management', '0003_move_certificate_type_to_reference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalsignature',
+            name='serial_key',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Ключ серийного номера'),
+        ),
+        migrations.AddField(
+            model_name='digitalsignature',
+            name='thumbprint_key',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Ключ отпечатка'),
+        ),
+        migrations.RunPython(fill_certificate_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='digitalsignature',
+            constraint=models.UniqueConstraint(condition=models.Q(('serial_key', ''), _negated=True), fields=('serial_key',), name='access_signature_serial_key_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='digitalsignature',
+            constraint=models.UniqueConstraint(condition=models.Q(('thumbprint_key', ''), _negated=True), fields=('thumbprint_key',), name='access_signature_thumbprint_key_uniq'),
+        ),
+    ]
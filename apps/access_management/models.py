@@ -13,6 +13,11 @@ def validate_file_size(value):
         )
 
 
+def normalize_certificate_key(value):
+    """Серийный номер или отпечаток для сравнения: без пробелов, в верхнем регистре"""
+    return ''.join((value or '').split()).upper()
+
+
 class SystemAccess(models.Model):
     """Доступ сотрудника к информационной системе"""
     
@@ -108,6 +113,9 @@ class DigitalSignature(models.Model):
         max_length=200,
         verbose_name='Отпечаток сертификата (alias)'
     )
+    # Нормализованные серийный номер и отпечаток для поиска дубликатов (заполняются при сохранении)
+    serial_key = models.CharField(max_length=200, blank=True, editable=False, verbose_name='Ключ серийного номера')
+    thumbprint_key = models.CharField(max_length=200, blank=True, editable=False, verbose_name='Ключ отпечатка')
     expiry_date = models.DateField(verbose_name='Дата окончания срока действия')
     carrier_serial = models.CharField(
         max_length=200,
@@ -141,10 +149,77 @@ class DigitalSignature(models.Model):
         verbose_name = 'Цифровая подпись'
         verbose_name_plural = 'Цифровые подписи'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['serial_key'], condition=~models.Q(serial_key=''), name='access_signature_serial_key_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['thumbprint_key'], condition=~models.Q(thumbprint_key=''), name='access_signature_thumbprint_key_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.employee} - {self.certificate_serial}"
     
+    # Ключ и поле, из которого он вычисляется
+    KEY_FIELDS = (('serial_key', 'certificate_serial'), ('thumbprint_key', 'certificate_alias'))
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Загруженные значения: по ним определяются старые дубликаты с пустым ключом
+        instance._loaded_keys = {
+            key_field: (instance.__dict__.get(source_field), instance.__dict__.get(key_field))
+            for key_field, source_field in cls.KEY_FIELDS
+        }
+        return instance
+    
+    def certificate_keys(self):
+        """
+        Ключи, которые будут сохранены: нормализованные номер и отпечаток.
+        У дубликатов, оставшихся от данных до введения ключей (миграция 0004), ключ
+        остается пустым, пока не изменен номер или отпечаток, чтобы такие записи
+        можно было редактировать (примечания, статус) без нарушения уникальности.
+        """
+        loaded = getattr(self, '_loaded_keys', {})
+        keys = {}
+        for key_field, source_field in self.KEY_FIELDS:
+            value = getattr(self, source_field)
+            loaded_value, loaded_key = loaded.get(key_field, (None, None))
+            if loaded_key == '' and loaded_value is not None and value == loaded_value:
+                keys[key_field] = ''
+            else:
+                keys[key_field] = normalize_certificate_key(value)
+        return keys
+    
+    def fill_keys(self):
+        for key_field, key in self.certificate_keys().items():
+            setattr(self, key_field, key)
+    
+    def clean(self):
+        """
+        Серийный номер и отпечаток уникальны (без учета регистра и пробелов).
+        Ключи не редактируются в формах, поэтому условные ограничения уникальности
+        по ним формы не проверяют - проверка выполняется здесь.
+        """
+        super().clean()
+        others = DigitalSignature.objects.exclude(pk=self.pk) if self.pk else DigitalSignature.objects.all()
+        keys = self.certificate_keys()
+        errors = {}
+        if keys['serial_key'] and others.filter(serial_key=keys['serial_key']).exists():
+            errors['certificate_serial'] = 'Сертификат с таким серийным номером уже существует'
+        if keys['thumbprint_key'] and others.filter(thumbprint_key=keys['thumbprint_key']).exists():
+            errors['certificate_alias'] = 'Сертификат с таким отпечатком уже существует'
+        if errors:
+            raise ValidationError(errors)
+    
+    def save(self, *args, **kwargs):
+        self.fill_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'serial_key', 'thumbprint_key'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_expired(self):
         """Проверка истечения срока действия"""
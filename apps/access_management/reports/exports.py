@@ -1,84 +1,123 @@
 import csv
-from django.http import HttpResponse
+import tempfile
+from itertools import chain, islice
+from django.http import FileResponse, StreamingHttpResponse
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
 
 
+# Количество строк, по которым оценивается ширина колонок Excel
+EXCEL_WIDTH_SAMPLE_SIZE = 200
+
+# Временный файл Excel держится в памяти до этого размера, затем сбрасывается на диск
+EXCEL_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+
+def non_empty(items):
+    """
+    Итератор по тем же элементам или None, если элементов нет.
+    Позволяет проверить потоковые данные отчета до начала выгрузки.
+    """
+    items = iter(items)
+    for first in items:
+        return chain([first], items)
+    return None
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает записанную строку вместо хранения"""
+    def write(self, value):
+        return value
+
+
 def export_to_csv(data, filename, headers, row_generator):
     """
-    Экспорт данных в CSV
+    Потоковый экспорт данных в CSV
+    
+    Строки формируются по мере отдачи ответа; данные отчетов читаются из БД
+    пачками (iter_* в reports/utils.py), поэтому весь отчет в памяти не собирается.
     
     Args:
-        data: данные для экспорта
+        data: данные для экспорта (список или генератор)
         filename: имя файла
         headers: список заголовков колонок
         row_generator: функция-генератор строк (принимает элемент данных, возвращает список значений)
     """
-    response = HttpResponse(content_type='text/csv; charset=utf-8-sig')
-    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    writer = csv.writer(Echo())
     
-    writer = csv.writer(response)
-    writer.writerow(headers)
-    
-    for item in data:
-        row = row_generator(item)
-        writer.writerow(row)
+    def stream():
+        # BOM, чтобы Excel корректно определял кодировку UTF-8
+        yield '\ufeff' + writer.writerow(headers)
+        for item in data:
+            yield writer.writerow(row_generator(item))
     
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
     return response
 
 
 def export_to_excel(data, filename, headers, row_generator, sheet_name='Отчет'):
     """
-    Экспорт данных в Excel
+    Экспорт данных в Excel в режиме write-only
+    
+    Строки пишутся в книгу по мере генерации (книга write-only сбрасывает их во
+    временный файл), ширина колонок оценивается по первым EXCEL_WIDTH_SAMPLE_SIZE строкам.
     
     Args:
-        data: данные для экспорта
+        data: данные для экспорта (список или генератор)
         filename: имя файла
         headers: список заголовков колонок
         row_generator: функция-генератор строк
         sheet_name: название листа
     """
-    wb = Workbook()
-    ws = wb.active
-    ws.title = sheet_name
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
     
-    # Стили для заголовков
+    # Общие стили (один объект на всю книгу)
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF")
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    data_alignment = Alignment(vertical='top')
     
-    # Заголовки
+    rows = (row_generator(item) for item in data)
+    sample = list(islice(rows, EXCEL_WIDTH_SAMPLE_SIZE))
+    
+    # Ширина колонок задается до записи строк (требование write-only режима)
     for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
+        max_length = len(str(header))
+        for row_data in sample:
+            if col_num <= len(row_data) and row_data[col_num - 1] is not None:
+                max_length = max(max_length, len(str(row_data[col_num - 1])))
+        ws.column_dimensions[get_column_letter(col_num)].width = min(max_length + 2, 50)
+    
+    # Заголовки
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.fill = header_fill
         cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
     
     # Данные
-    for row_num, item in enumerate(data, 2):
-        row_data = row_generator(item)
-        for col_num, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row_num, column=col_num, value=value)
-            cell.alignment = Alignment(vertical='top')
+    for row_data in chain(sample, rows):
+        row_cells = []
+        for value in row_data:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.alignment = data_alignment
+            row_cells.append(cell)
+        ws.append(row_cells)
     
-    # Автоматическая ширина колонок
-    for col_num in range(1, len(headers) + 1):
-        column_letter = get_column_letter(col_num)
-        max_length = 0
-        for row in ws[column_letter]:
-            try:
-                if len(str(row.value)) > max_length:
-                    max_length = len(str(row.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    output = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_SIZE)
+    wb.save(output)
+    output.seek(0)
     
-    response = HttpResponse(
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
-    
-    wb.save(response)
-    return response
-
@@ -1,4 +1,5 @@
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
 from apps.access_management.models import SystemAccess, DigitalSignature
@@ -19,13 +20,90 @@ def get_employee_department(employee):
     return current_post.department if current_post else None
 
 
-def get_system_accesses_by_department(system_id, status='active', department_id=None):
+def get_current_posts(employee_ids):
     """
-    Получить доступы к системе, сгруппированные по подразделениям
+    Получить текущие занятые должности сотрудников одним запросом
+    
+    Args:
+        employee_ids: список ID сотрудников или подзапрос (values('employee_id'))
     
     Returns:
-        dict: {department: [accesses]}
+        dict: {employee_id: Posts} (с подгруженными postname и department)
+    """
+    posts = Posts.objects.filter(
+        employee_id__in=employee_ids,
+        status=Posts.STATUS_OCCUPIED,
+        is_active=True
+    ).select_related('postname', 'department').order_by('-pk')
+    
+    # При нескольких занятых позициях остается позиция с наименьшим ID,
+    # как в get_employee_department()
+    return {post.employee_id: post for post in posts}
+
+
+# Название группы для сотрудников без текущей должности
+NO_DEPARTMENT = "Не указано"
+
+# Размер пачки при потоковой выгрузке отчетов (строки QuerySet и должности сотрудников пачки)
+REPORT_CHUNK_SIZE = 2000
+
+
+def current_department_name(employee_ref='employee_id'):
+    """
+    Выражение для annotate: название подразделения текущей должности сотрудника
+    (та же позиция, что выбирает get_current_posts) или NO_DEPARTMENT
+    """
+    posts = Posts.objects.filter(
+        employee_id=OuterRef(employee_ref),
+        status=Posts.STATUS_OCCUPIED,
+        is_active=True
+    ).order_by('pk').values('department__name')[:1]
+    return Coalesce(Subquery(posts), Value(NO_DEPARTMENT))
+
+
+def iter_with_current_posts(queryset, employee_attr='employee_id', chunk_size=None):
     """
+    Потоковый обход QuerySet через iterator(): пары (объект, текущая должность сотрудника).
+    Должности загружаются одним запросом на пачку, в памяти держится одна пачка.
+    """
+    chunk_size = chunk_size or REPORT_CHUNK_SIZE
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield from _with_current_posts(batch, employee_attr)
+            batch = []
+    yield from _with_current_posts(batch, employee_attr)
+
+
+def _with_current_posts(batch, employee_attr):
+    if not batch:
+        return
+    posts = get_current_posts({getattr(obj, employee_attr) for obj in batch})
+    for obj in batch:
+        yield obj, posts.get(getattr(obj, employee_attr))
+
+
+def _grouped_item(key, obj, post, employee):
+    department = post.department if post else None
+    return {
+        key: obj,
+        'department': department,
+        'department_name': department.name if department else NO_DEPARTMENT,
+        'employee': employee,
+        'post': post,
+    }
+
+
+def _group_by_department(items):
+    result = {}
+    for item in items:
+        result.setdefault(item['department_name'], []).append(item)
+    return result
+
+
+def system_accesses_queryset(system_id, status='active', department_id=None):
+    """Доступы к системе для отчета по активным доступам"""
     accesses = SystemAccess.objects.filter(
         system_id=system_id,
         status=status
@@ -37,43 +115,37 @@ def get_system_accesses_by_department(system_id, status='active', department_id=
             employee__posts__department_id=department_id,
             employee__posts__status=Posts.STATUS_OCCUPIED
         )
-    
-    # Группировка по подразделениям
-    result = {}
-    for access in accesses:
-        department = get_employee_department(access.employee)
-        dept_name = department.name if department else "Не указано"
-        
-        if dept_name not in result:
-            result[dept_name] = []
-        
-        post = Posts.objects.filter(
-            employee=access.employee,
-            status=Posts.STATUS_OCCUPIED,
-            is_active=True
-        ).select_related('postname', 'department').first()
-        
-        result[dept_name].append({
-            'access': access,
-            'department': department,
-            'employee': access.employee,
-            'post': post
-        })
-    
-    return result
+    return accesses
 
 
-def get_expiring_accesses(days=40, status_filter=None):
+def get_system_accesses_by_department(system_id, status='active', department_id=None):
     """
-    Получить доступы, требующие актуализации или истекающие
-    
-    Args:
-        days: количество дней для определения "истекающих"
-        status_filter: список типов фильтров (None = все требующие внимания)
+    Получить доступы к системе, сгруппированные по подразделениям
     
     Returns:
-        list: список доступов с дополнительной информацией
+        dict: {department: [accesses]}
     """
+    accesses = system_accesses_queryset(system_id, status, department_id)
+    posts = get_current_posts(accesses.values('employee_id'))
+    
+    # Группировка по подразделениям
+    return _group_by_department(
+        _grouped_item('access', access, posts.get(access.employee_id), access.employee)
+        for access in accesses
+    )
+
+
+def iter_system_accesses_by_department(system_id, status='active', department_id=None):
+    """Элементы get_system_accesses_by_department по порядку подразделений, потоково (для выгрузки)"""
+    accesses = system_accesses_queryset(system_id, status, department_id).annotate(
+        department_name=current_department_name()
+    ).order_by('department_name', *SystemAccess._meta.ordering, 'pk')
+    for access, post in iter_with_current_posts(accesses):
+        yield _grouped_item('access', access, post, access.employee)
+
+
+def expiring_accesses_queryset(days=40, status_filter=None):
+    """Доступы, требующие актуализации или истекающие; None, если не выбран ни один тип"""
     today = timezone.now().date()
     future_date = today + timedelta(days=days)
     
@@ -101,46 +173,64 @@ def get_expiring_accesses(days=40, status_filter=None):
         )
     
     if not q_objects:
-        return []
+        return None
     
-    accesses = SystemAccess.objects.filter(q_objects).select_related(
+    return SystemAccess.objects.filter(q_objects).select_related(
         'employee', 'system'
     )
-    
-    result = []
-    for access in accesses:
-        department = get_employee_department(access.employee)
-        post = Posts.objects.filter(
-            employee=access.employee,
-            status=Posts.STATUS_OCCUPIED,
-            is_active=True
-        ).select_related('postname', 'department').first()
-        
-        # Расчет дней до/после блокировки
-        days_diff = None
-        if access.access_blocked_date:
-            days_diff = (access.access_blocked_date - today).days
-        
-        result.append({
-            'access': access,
-            'department': department,
-            'employee': access.employee,
-            'post': post,
-            'days_diff': days_diff,
-            'abs_days_diff': abs(days_diff) if days_diff is not None else None,
-            'is_expired': days_diff < 0 if days_diff is not None else False
-        })
-    
-    return result
 
 
-def get_employees_with_signature(status='active', cert_type_id=None, department_id=None):
+def _expiring_access_item(access, post, today):
+    department = post.department if post else None
+    
+    # Расчет дней до/после блокировки
+    days_diff = None
+    if access.access_blocked_date:
+        days_diff = (access.access_blocked_date - today).days
+    
+    return {
+        'access': access,
+        'department': department,
+        'employee': access.employee,
+        'post': post,
+        'days_diff': days_diff,
+        'abs_days_diff': abs(days_diff) if days_diff is not None else None,
+        'is_expired': days_diff < 0 if days_diff is not None else False
+    }
+
+
+def get_expiring_accesses(days=40, status_filter=None):
     """
-    Получить сотрудников с активной цифровой подписью, сгруппированных по подразделениям
+    Получить доступы, требующие актуализации или истекающие
+    
+    Args:
+        days: количество дней для определения "истекающих"
+        status_filter: список типов фильтров (None = все требующие внимания)
     
     Returns:
-        dict: {department: [signatures]}
+        list: список доступов с дополнительной информацией
     """
+    accesses = expiring_accesses_queryset(days, status_filter)
+    if accesses is None:
+        return []
+    
+    today = timezone.now().date()
+    posts = get_current_posts(accesses.values('employee_id'))
+    return [_expiring_access_item(access, posts.get(access.employee_id), today) for access in accesses]
+
+
+def iter_expiring_accesses(days=40, status_filter=None):
+    """Элементы get_expiring_accesses потоково (для выгрузки)"""
+    accesses = expiring_accesses_queryset(days, status_filter)
+    if accesses is None:
+        return
+    today = timezone.now().date()
+    for access, post in iter_with_current_posts(accesses):
+        yield _expiring_access_item(access, post, today)
+
+
+def signatures_queryset(status='active', cert_type_id=None, department_id=None):
+    """Цифровые подписи для отчета по сотрудникам с подписью"""
     signatures = DigitalSignature.objects.filter(status=status).select_related(
         'employee', 'certificate_type'
     )
@@ -153,38 +243,36 @@ def get_employees_with_signature(status='active', cert_type_id=None, department_
             employee__posts__department_id=department_id,
             employee__posts__status=Posts.STATUS_OCCUPIED
         )
-    
-    result = {}
-    for signature in signatures:
-        department = get_employee_department(signature.employee)
-        dept_name = department.name if department else "Не указано"
-        
-        if dept_name not in result:
-            result[dept_name] = []
-        
-        post = Posts.objects.filter(
-            employee=signature.employee,
-            status=Posts.STATUS_OCCUPIED,
-            is_active=True
-        ).select_related('postname', 'department').first()
-        
-        result[dept_name].append({
-            'signature': signature,
-            'department': department,
-            'employee': signature.employee,
-            'post': post
-        })
-    
-    return result
+    return signatures
 
 
-def get_employees_without_signature(department_id=None, active_only=True):
+def get_employees_with_signature(status='active', cert_type_id=None, department_id=None):
     """
-    Получить сотрудников без активной цифровой подписи
+    Получить сотрудников с активной цифровой подписью, сгруппированных по подразделениям
     
     Returns:
-        dict: {department: [employees]}
+        dict: {department: [signatures]}
     """
+    signatures = signatures_queryset(status, cert_type_id, department_id)
+    posts = get_current_posts(signatures.values('employee_id'))
+    
+    return _group_by_department(
+        _grouped_item('signature', signature, posts.get(signature.employee_id), signature.employee)
+        for signature in signatures
+    )
+
+
+def iter_employees_with_signature(status='active', cert_type_id=None, department_id=None):
+    """Элементы get_employees_with_signature по порядку подразделений, потоково (для выгрузки)"""
+    signatures = signatures_queryset(status, cert_type_id, department_id).annotate(
+        department_name=current_department_name()
+    ).order_by('department_name', *DigitalSignature._meta.ordering, 'pk')
+    for signature, post in iter_with_current_posts(signatures):
+        yield _grouped_item('signature', signature, post, signature.employee)
+
+
+def employees_without_signature_queryset(department_id=None, active_only=True):
+    """Сотрудники без активной цифровой подписи"""
     # Найти сотрудников по статусу
     if active_only:
         # Только активные сотрудники (исключаем уволенных и временно отсутствующих)
@@ -204,39 +292,37 @@ def get_employees_without_signature(department_id=None, active_only=True):
         status=DigitalSignature.STATUS_ACTIVE
     ).values_list('employee_id', flat=True)
     
-    employees = employees.exclude(id__in=employees_with_signature)
-    
-    # Группировка по подразделениям
-    result = {}
-    for employee in employees:
-        department = get_employee_department(employee)
-        dept_name = department.name if department else "Не указано"
-        
-        if dept_name not in result:
-            result[dept_name] = []
-        
-        post = Posts.objects.filter(
-            employee=employee,
-            status=Posts.STATUS_OCCUPIED,
-            is_active=True
-        ).select_related('postname', 'department').first()
-        
-        result[dept_name].append({
-            'employee': employee,
-            'department': department,
-            'post': post
-        })
-    
-    return result
+    return employees.exclude(id__in=employees_with_signature)
 
 
-def get_expiring_signatures(days=40, active_only=True, department_id=None):
+def get_employees_without_signature(department_id=None, active_only=True):
     """
-    Получить сертификаты, срок действия которых истекает в ближайшие N дней
+    Получить сотрудников без активной цифровой подписи
     
     Returns:
-        list: список подписей с дополнительной информацией
+        dict: {department: [employees]}
     """
+    employees = employees_without_signature_queryset(department_id, active_only)
+    posts = get_current_posts(employees.values('id'))
+    
+    # Группировка по подразделениям
+    return _group_by_department(
+        _grouped_item('employee', employee, posts.get(employee.id), employee)
+        for employee in employees
+    )
+
+
+def iter_employees_without_signature(department_id=None, active_only=True):
+    """Элементы get_employees_without_signature по порядку подразделений, потоково (для выгрузки)"""
+    employees = employees_without_signature_queryset(department_id, active_only).annotate(
+        department_name=current_department_name('pk')
+    ).order_by('department_name', *Employees._meta.ordering, 'pk')
+    for employee, post in iter_with_current_posts(employees, employee_attr='id'):
+        yield _grouped_item('employee', employee, post, employee)
+
+
+def expiring_signatures_queryset(days=40, active_only=True, department_id=None):
+    """Сертификаты, срок действия которых истекает в ближайшие N дней"""
     today = timezone.now().date()
     future_date = today + timedelta(days=days)
     
@@ -254,26 +340,34 @@ def get_expiring_signatures(days=40, active_only=True, department_id=None):
             employee__posts__status=Posts.STATUS_OCCUPIED
         )
     
-    signatures = signatures.select_related('employee', 'certificate_type')
-    
-    result = []
-    for signature in signatures:
-        department = get_employee_department(signature.employee)
-        post = Posts.objects.filter(
-            employee=signature.employee,
-            status=Posts.STATUS_OCCUPIED,
-            is_active=True
-        ).select_related('postname', 'department').first()
-        
-        days_diff = (signature.expiry_date - today).days
-        
-        result.append({
-            'signature': signature,
-            'department': department,
-            'employee': signature.employee,
-            'post': post,
-            'days_diff': days_diff
-        })
+    return signatures.select_related('employee', 'certificate_type')
+
+
+def _expiring_signature_item(signature, post, today):
+    return {
+        'signature': signature,
+        'department': post.department if post else None,
+        'employee': signature.employee,
+        'post': post,
+        'days_diff': (signature.expiry_date - today).days
+    }
+
+
+def get_expiring_signatures(days=40, active_only=True, department_id=None):
+    """
+    Получить сертификаты, срок действия которых истекает в ближайшие N дней
     
-    return result
+    Returns:
+        list: список подписей с дополнительной информацией
+    """
+    today = timezone.now().date()
+    signatures = expiring_signatures_queryset(days, active_only, department_id)
+    posts = get_current_posts(signatures.values('employee_id'))
+    return [_expiring_signature_item(signature, posts.get(signature.employee_id), today) for signature in signatures]
+
 
+def iter_expiring_signatures(days=40, active_only=True, department_id=None):
+    """Элементы get_expiring_signatures потоково (для выгрузки)"""
+    today = timezone.now().date()
+    for signature, post in iter_with_current_posts(expiring_signatures_queryset(days, active_only, department_id)):
+        yield _expiring_signature_item(signature, post, today)
@@ -13,9 +13,17 @@ from .utils import (
     get_expiring_accesses,
     get_employees_with_signature,
     get_employees_without_signature,
-    get_expiring_signatures
+    get_expiring_signatures,
+    iter_system_accesses_by_department,
+    iter_expiring_accesses,
+    iter_employees_with_signature,
+    iter_employees_without_signature,
+    iter_expiring_signatures
 )
-from .exports import export_to_csv, export_to_excel
+from .exports import export_to_csv, export_to_excel, non_empty
+
+
+EXPORT_FORMATS = ('csv', 'excel')
 
 
 class ReportsHomeView(LoginRequiredMixin, View):
@@ -29,43 +37,42 @@ class SystemAccessActiveReportView(LoginRequiredMixin, View):
     def get(self, request):
         form = SystemAccessActiveReportForm(request.GET)
         data = None
+        format_type = request.GET.get('format', 'html')
         
         if form.is_valid():
             system_id = form.cleaned_data['system'].id
             status = form.cleaned_data['status']
             department_id = form.cleaned_data['department'].id if form.cleaned_data['department'] else None
             
+            # Выгрузка читает данные из БД пачками, не собирая отчет в памяти
+            if format_type in EXPORT_FORMATS:
+                items = non_empty(iter_system_accesses_by_department(system_id, status, department_id))
+                if items is not None:
+                    return self._export(items, format_type, form.cleaned_data.get('system'))
+            
             data = get_system_accesses_by_department(system_id, status, department_id)
         
-        format_type = request.GET.get('format', 'html')
-        
-        if format_type == 'csv' and data:
-            return self._export_csv(data, form.cleaned_data.get('system'))
-        elif format_type == 'excel' and data:
-            return self._export_excel(data, form.cleaned_data.get('system'))
-        
         context = {
             'form': form,
             'data': data,
         }
         return render(request, 'access_management/reports/system_access_active.html', context)
     
-    def _export_csv(self, data, system):
+    def _export(self, items, format_type, system):
         headers = ['Подразделение', 'ФИО', 'Должность', 'Логин', 'Дата получения', 'Статус', 'Дата блокировки']
         
-        rows = []
-        for dept_name, items in sorted(data.items()):
+        def rows():
             for item in items:
                 post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
-                rows.append({
-                    'department': dept_name,
+                yield {
+                    'department': item['department_name'],
                     'employee': str(item['employee']),
                     'post': post_name,
                     'login': item['access'].login,
                     'granted_date': item['access'].access_granted_date.strftime('%d.%m.%Y'),
                     'status': item['access'].get_status_display(),
                     'blocked_date': item['access'].access_blocked_date.strftime('%d.%m.%Y') if item['access'].access_blocked_date else "—"
-                })
+                }
         
         def row_gen(item):
             return [
@@ -79,38 +86,11 @@ class SystemAccessActiveReportView(LoginRequiredMixin, View):
             ]
         
         filename = f"active_accesses_{system.name.replace(' ', '_') if system else 'all'}"
-        return export_to_csv(rows, filename, headers, row_gen)
-    
-    def _export_excel(self, data, system):
-        headers = ['Подразделение', 'ФИО', 'Должность', 'Логин', 'Дата получения', 'Статус', 'Дата блокировки']
-        
-        rows = []
-        for dept_name, items in sorted(data.items()):
-            for item in items:
-                post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
-                rows.append({
-                    'department': dept_name,
-                    'employee': str(item['employee']),
-                    'post': post_name,
-                    'login': item['access'].login,
-                    'granted_date': item['access'].access_granted_date.strftime('%d.%m.%Y'),
-                    'status': item['access'].get_status_display(),
-                    'blocked_date': item['access'].access_blocked_date.strftime('%d.%m.%Y') if item['access'].access_blocked_date else "—"
-                })
         
-        def row_gen(item):
-            return [
-                item['department'],
-                item['employee'],
-                item['post'],
-                item['login'],
-                item['granted_date'],
-                item['status'],
-                item['blocked_date']
-            ]
-        
-        filename = f"active_accesses_{system.name.replace(' ', '_') if system else 'all'}"
-        return export_to_excel(rows, filename, headers, row_gen, sheet_name='Активные доступы')
+        if format_type == 'csv':
+            return export_to_csv(rows(), filename, headers, row_gen)
+        else:
+            return export_to_excel(rows(), filename, headers, row_gen, sheet_name='Активные доступы')
 
 
 class SystemAccessExpiringReportView(LoginRequiredMixin, View):
@@ -118,50 +98,51 @@ class SystemAccessExpiringReportView(LoginRequiredMixin, View):
     def get(self, request):
         form = SystemAccessExpiringReportForm(request.GET)
         data = None
+        format_type = request.GET.get('format', 'html')
         
         if form.is_valid():
             report_types = form.cleaned_data['report_type']
             days = form.cleaned_data['days']
             
+            if format_type in EXPORT_FORMATS:
+                items = non_empty(iter_expiring_accesses(days, report_types))
+                if items is not None:
+                    return self._export(items, format_type)
+            
             data = get_expiring_accesses(days, report_types)
         
-        format_type = request.GET.get('format', 'html')
-        
-        if format_type in ['csv', 'excel'] and data:
-            return self._export(data, format_type)
-        
         context = {
             'form': form,
             'data': data,
         }
         return render(request, 'access_management/reports/system_access_expiring.html', context)
     
-    def _export(self, data, format_type):
+    def _export(self, items, format_type):
         headers = ['Подразделение', 'ФИО', 'Должность', 'Система', 'Логин', 'Статус', 'Дата получения', 'Дата блокировки', 'Дней до/после']
         
-        rows = []
-        for item in data:
-            dept_name = item['department'].name if item['department'] else "Не указано"
-            post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
-            
-            days_str = "—"
-            if item['days_diff'] is not None:
-                if item['is_expired']:
-                    days_str = f"Просрочено: {abs(item['days_diff'])}"
-                else:
-                    days_str = f"Дней до: {item['days_diff']}"
-            
-            rows.append({
-                'department': dept_name,
-                'employee': str(item['employee']),
-                'post': post_name,
-                'system': item['access'].system.name,
-                'login': item['access'].login,
-                'status': item['access'].get_status_display(),
-                'granted_date': item['access'].access_granted_date.strftime('%d.%m.%Y'),
-                'blocked_date': item['access'].access_blocked_date.strftime('%d.%m.%Y') if item['access'].access_blocked_date else "—",
-                'days': days_str
-            })
+        def rows():
+            for item in items:
+                dept_name = item['department'].name if item['department'] else "Не указано"
+                post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
+                
+                days_str = "—"
+                if item['days_diff'] is not None:
+                    if item['is_expired']:
+                        days_str = f"Просрочено: {abs(item['days_diff'])}"
+                    else:
+                        days_str = f"Дней до: {item['days_diff']}"
+                
+                yield {
+                    'department': dept_name,
+                    'employee': str(item['employee']),
+                    'post': post_name,
+                    'system': item['access'].system.name,
+                    'login': item['access'].login,
+                    'status': item['access'].get_status_display(),
+                    'granted_date': item['access'].access_granted_date.strftime('%d.%m.%Y'),
+                    'blocked_date': item['access'].access_blocked_date.strftime('%d.%m.%Y') if item['access'].access_blocked_date else "—",
+                    'days': days_str
+                }
         
         def row_gen(item):
             return [
@@ -179,9 +160,9 @@ class SystemAccessExpiringReportView(LoginRequiredMixin, View):
         filename = "expiring_accesses"
         
         if format_type == 'csv':
-            return export_to_csv(rows, filename, headers, row_gen)
+            return export_to_csv(rows(), filename, headers, row_gen)
         else:
-            return export_to_excel(rows, filename, headers, row_gen, sheet_name='Истекающие доступы')
+            return export_to_excel(rows(), filename, headers, row_gen, sheet_name='Истекающие доступы')
 
 
 class DigitalSignatureActiveReportView(LoginRequiredMixin, View):
@@ -189,30 +170,30 @@ class DigitalSignatureActiveReportView(LoginRequiredMixin, View):
     def get(self, request):
         form = DigitalSignatureActiveReportForm(request.GET)
         data = None
+        format_type = request.GET.get('format', 'html')
         
         if form.is_valid():
             status = form.cleaned_data['status']
             cert_type_id = form.cleaned_data['cert_type'].id if form.cleaned_data['cert_type'] else None
             department_id = form.cleaned_data['department'].id if form.cleaned_data['department'] else None
             
+            if format_type in EXPORT_FORMATS:
+                items = non_empty(iter_employees_with_signature(status, cert_type_id, department_id))
+                if items is not None:
+                    return self._export(items, format_type)
+            
             data = get_employees_with_signature(status, cert_type_id, department_id)
         
-        format_type = request.GET.get('format', 'html')
-        
-        if format_type in ['csv', 'excel'] and data:
-            return self._export(data, format_type)
-        
         context = {
             'form': form,
             'data': data,
         }
         return render(request, 'access_management/reports/digital_signature_active.html', context)
     
-    def _export(self, data, format_type):
+    def _export(self, items, format_type):
         headers = ['Подразделение', 'ФИО', 'Должность', 'Тип сертификата', 'Серийный номер', 'Отпечаток', 'Дата окончания', 'Статус']
         
-        rows = []
-        for dept_name, items in sorted(data.items()):
+        def rows():
             for item in items:
                 post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
                 is_expired = item['signature'].is_expired
@@ -220,8 +201,8 @@ class DigitalSignatureActiveReportView(LoginRequiredMixin, View):
                 if is_expired:
                     status_str += " (истек)"
                 
-                rows.append({
-                    'department': dept_name,
+                yield {
+                    'department': item['department_name'],
                     'employee': str(item['employee']),
                     'post': post_name,
                     'cert_type': item['signature'].certificate_type.name,
@@ -229,7 +210,7 @@ class DigitalSignatureActiveReportView(LoginRequiredMixin, View):
                     'alias': item['signature'].certificate_alias,
                     'expiry': item['signature'].expiry_date.strftime('%d.%m.%Y'),
                     'status': status_str
-                })
+                }
         
         def row_gen(item):
             return [
@@ -246,9 +227,9 @@ class DigitalSignatureActiveReportView(LoginRequiredMixin, View):
         filename = "signatures_active"
         
         if format_type == 'csv':
-            return export_to_csv(rows, filename, headers, row_gen)
+            return export_to_csv(rows(), filename, headers, row_gen)
         else:
-            return export_to_excel(rows, filename, headers, row_gen, sheet_name='Подписи активные')
+            return export_to_excel(rows(), filename, headers, row_gen, sheet_name='Подписи активные')
 
 
 class DigitalSignatureMissingReportView(LoginRequiredMixin, View):
@@ -256,39 +237,39 @@ class DigitalSignatureMissingReportView(LoginRequiredMixin, View):
     def get(self, request):
         form = DigitalSignatureMissingReportForm(request.GET)
         data = None
+        format_type = request.GET.get('format', 'html')
         
         if form.is_valid():
             department_id = form.cleaned_data['department'].id if form.cleaned_data['department'] else None
             active_only = form.cleaned_data['active_only']
             
+            if format_type in EXPORT_FORMATS:
+                items = non_empty(iter_employees_without_signature(department_id, active_only))
+                if items is not None:
+                    return self._export(items, format_type)
+            
             data = get_employees_without_signature(department_id, active_only)
         
-        format_type = request.GET.get('format', 'html')
-        
-        if format_type in ['csv', 'excel'] and data:
-            return self._export(data, format_type)
-        
         context = {
             'form': form,
             'data': data,
         }
         return render(request, 'access_management/reports/digital_signature_missing.html', context)
     
-    def _export(self, data, format_type):
+    def _export(self, items, format_type):
         headers = ['Подразделение', 'ФИО', 'Должность', 'Email', 'Телефон']
         
-        rows = []
-        for dept_name, items in sorted(data.items()):
+        def rows():
             for item in items:
                 post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
                 
-                rows.append({
-                    'department': dept_name,
+                yield {
+                    'department': item['department_name'],
                     'employee': str(item['employee']),
                     'post': post_name,
                     'email': item['employee'].email or "—",
-                    'phone': item['employee'].phone or "—"
-                })
+                    'phone': item['employee'].work_phone or item['employee'].mobile_phone or "—"
+                }
         
         def row_gen(item):
             return [
@@ -302,9 +283,9 @@ class DigitalSignatureMissingReportView(LoginRequiredMixin, View):
         filename = "employees_without_signature"
         
         if format_type == 'csv':
-            return export_to_csv(rows, filename, headers, row_gen)
+            return export_to_csv(rows(), filename, headers, row_gen)
         else:
-            return export_to_excel(rows, filename, headers, row_gen, sheet_name='Сотрудники без подписи')
+            return export_to_excel(rows(), filename, headers, row_gen, sheet_name='Сотрудники без подписи')
 
 
 class DigitalSignatureExpiringReportView(LoginRequiredMixin, View):
@@ -312,43 +293,44 @@ class DigitalSignatureExpiringReportView(LoginRequiredMixin, View):
     def get(self, request):
         form = DigitalSignatureExpiringReportForm(request.GET)
         data = None
+        format_type = request.GET.get('format', 'html')
         
         if form.is_valid():
             days = form.cleaned_data['days']
             active_only = form.cleaned_data['active_only']
             department_id = form.cleaned_data['department'].id if form.cleaned_data['department'] else None
             
+            if format_type in EXPORT_FORMATS:
+                items = non_empty(iter_expiring_signatures(days, active_only, department_id))
+                if items is not None:
+                    return self._export(items, format_type)
+            
             data = get_expiring_signatures(days, active_only, department_id)
         
-        format_type = request.GET.get('format', 'html')
-        
-        if format_type in ['csv', 'excel'] and data:
-            return self._export(data, format_type)
-        
         context = {
             'form': form,
             'data': data,
         }
         return render(request, 'access_management/reports/digital_signature_expiring.html', context)
     
-    def _export(self, data, format_type):
+    def _export(self, items, format_type):
         headers = ['Подразделение', 'ФИО', 'Должность', 'Тип сертификата', 'Серийный номер', 'Дата окончания', 'Дней до истечения', 'Статус']
         
-        rows = []
-        for item in data:
-            dept_name = item['department'].name if item['department'] else "Не указано"
-            post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
-            
-            rows.append({
-                'department': dept_name,
-                'employee': str(item['employee']),
-                'post': post_name,
-                'cert_type': item['signature'].certificate_type.name,
-                'serial': item['signature'].certificate_serial,
-                'expiry': item['signature'].expiry_date.strftime('%d.%m.%Y'),
-                'days': item['days_diff'],
-                'status': item['signature'].get_status_display()
-            })
+        def rows():
+            for item in items:
+                dept_name = item['department'].name if item['department'] else "Не указано"
+                post_name = item['post'].postname.name if item['post'] and item['post'].postname else "—"
+                
+                yield {
+                    'department': dept_name,
+                    'employee': str(item['employee']),
+                    'post': post_name,
+                    'cert_type': item['signature'].certificate_type.name,
+                    'serial': item['signature'].certificate_serial,
+                    'expiry': item['signature'].expiry_date.strftime('%d.%m.%Y'),
+                    'days': item['days_diff'],
+                    'status': item['signature'].get_status_display()
+                }
         
         def row_gen(item):
             return [
@@ -365,7 +347,7 @@ class DigitalSignatureExpiringReportView(LoginRequiredMixin, View):
         filename = "signatures_expiring"
         
         if format_type == 'csv':
-            return export_to_csv(rows, filename, headers, row_gen)
+            return export_to_csv(rows(), filename, headers, row_gen)
         else:
-            return export_to_excel(rows, filename, headers, row_gen, sheet_name='Истекающие сертификаты')
+            return export_to_excel(rows(), filename, headers, row_gen, sheet_name='Истекающие сертификаты')
 
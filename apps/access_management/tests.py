@@ -1,2 +1,244 @@
-# Тесты не требуются согласно плану
+import csv
+import io
+from datetime import date
+from unittest import mock
 
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.hr.models import Employees, Posts
+from apps.reference.models import CertificateType, Departments, Postname
+from .admin import DigitalSignatureAdmin
+from .forms import DigitalSignatureForm
+from .models import DigitalSignature
+from .reports import utils as report_utils
+from .utils.html_certificate_parser import iter_certificate_html, parse_certificate_html
+
+
+def _cert_item(cert_type, number, owner_name, expiry, css_class='cert-item active'):
+    """Блок сертификата в разметке портала УЦ ФК (части передаются как есть, с тегами)"""
+    return (
+        f'<div class="{css_class}">'
+        f'<div class="cert-item-content contWidth1"><div><div><b>{cert_type}</b><br></div><div>{number}</div></div></div>'
+        f'<div class="cert-item-content contWidth2"><div class="owner-name">{owner_name}<i>Должность</i></div></div>'
+        f'<div class="cert-item-content-right"><table>'
+        f'<tr><td>Действует с</td><td><b>01.01.2024</b></td></tr>'
+        f'<tr><td>Действует по</td><td>{expiry}</td></tr>'
+        f'</table></div>'
+        f'</div>'
+    )
+
+
+# Выгрузка с характерными для портала отклонениями разметки; ожидаемый результат
+# сверен с прежним разбором через BeautifulSoup (html.parser)
+GOLDEN_HTML = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Сертификаты</title>'
+    '<script>var tpl = "<div class=\'cert-item\'>";</script></head><body><div class="list">'
+    # Обычный блок
+    + _cert_item('Сертификат должностного лица', '№ 204F 8298 3C5F FDA9',
+                 '<b>Иванов Иван Иванович</b>', '<b>31.12.2025</b>')
+    # <br> внутри номера и лишний </br>; текст соседних строк склеивается без пробела
+    + _cert_item('Сертификат юридического лица', '№ 0114 E409<br>885C</br> 7520',
+                 '<b>Петрова Анна<br/>Сергеевна</b>', '<b>15.06.2026</b>', css_class='active cert-item ')
+    # Незакрытые теги: закрываются закрывающим тегом родителя, текст до него входит в элемент
+    + _cert_item('Сертификат должностного лица', '№ D81F 0EDE 7181 E032',
+                 '<b>Ёлкин Пётр Семёнович<p>примечание', '<b>01.02.2027', css_class='cert-item')
+    # Некорректная дата: блок пропускается
+    + _cert_item('Сертификат должностного лица', '№ 3333 5F2F 97C0 3DE5',
+                 '<b>Сидоров Сидор</b>', '<b>31.02.2025</b>')
+    # Комментарии, сущности и скрипт внутри блока
+    + _cert_item('Сертификат юридического лица', '№ 917D<!-- пробел --> FFAC C965 11AD',
+                 '<b>ООО &laquo;Ромашка&raquo;</b><script>var a = "<b>1</b>";</script>', '<b>&#50;8.02.2028</b>')
+    + '</div></body></html>'
+)
+
+GOLDEN_CERTIFICATES = [
+    {
+        'certificate_number': '204F82983C5FFDA9',
+        'certificate_type_text': 'Сертификат должностного лица',
+        'owner_name': 'Иванов Иван Иванович',
+        'expiry_date': date(2025, 12, 31),
+    },
+    {
+        'certificate_number': '0114E409885C7520',
+        'certificate_type_text': 'Сертификат юридического лица',
+        'owner_name': 'Петрова АннаСергеевна',
+        'expiry_date': date(2026, 6, 15),
+    },
+    {
+        'certificate_number': 'D81F0EDE7181E032',
+        'certificate_type_text': 'Сертификат должностного лица',
+        'owner_name': 'Ёлкин Пётр СемёновичпримечаниеДолжность',
+        'expiry_date': date(2027, 2, 1),
+    },
+    {
+        'certificate_number': '917DFFACC96511AD',
+        'certificate_type_text': 'Сертификат юридического лица',
+        'owner_name': 'ООО «Ромашка»',
+        'expiry_date': date(2028, 2, 28),
+    },
+]
+
+
+class CertificateHTMLParserTests(SimpleTestCase):
+    """Потоковый разбор HTML-выгрузки сертификатов по эталонной выгрузке"""
+
+    def test_golden_utf8(self):
+        result = parse_certificate_html(io.BytesIO(GOLDEN_HTML.encode('utf-8')))
+        self.assertEqual(result, GOLDEN_CERTIFICATES)
+
+    def test_golden_cp1251(self):
+        result = parse_certificate_html(io.BytesIO(GOLDEN_HTML.encode('cp1251')))
+        self.assertEqual(result, GOLDEN_CERTIFICATES)
+
+    def test_text_file(self):
+        result = parse_certificate_html(io.StringIO(GOLDEN_HTML))
+        self.assertEqual(result, GOLDEN_CERTIFICATES)
+
+    def test_chunk_boundaries(self):
+        # Малые части разрывают теги, многобайтные символы и текст внутри <b>
+        for encoding in ('utf-8', 'cp1251'):
+            content = GOLDEN_HTML.encode(encoding)
+            for chunk_size in (1, 2, 7, 64, 1000):
+                with self.subTest(encoding=encoding, chunk_size=chunk_size):
+                    result = list(iter_certificate_html(io.BytesIO(content), chunk_size=chunk_size))
+                    self.assertEqual(result, GOLDEN_CERTIFICATES)
+
+    def test_text_split_between_chunks(self):
+        owner_name = 'Константинопольский Константин Константинович'
+        content = _cert_item('Сертификат должностного лица', '№ 0001', f'<b>{owner_name}</b>', '<b>01.03.2030</b>')
+        content = content.encode('utf-8')
+        split_at = content.index(owner_name.encode('utf-8')) + 11  # посреди символа
+
+        result = list(iter_certificate_html(io.BytesIO(content), chunk_size=split_at))
+
+        self.assertEqual([item['owner_name'] for item in result], [owner_name])
+
+    def test_truncated_file(self):
+        # Выгрузка оборвана: последний блок не закрыт, но данные в нем полные
+        content = GOLDEN_HTML[:GOLDEN_HTML.rindex('</div></body></html>')]
+        content = content[:content.rindex('</div>')]
+        result = parse_certificate_html(io.BytesIO(content.encode('utf-8')))
+        self.assertEqual(result, GOLDEN_CERTIFICATES)
+
+
+class LegacyDuplicateSignatureTests(TestCase):
+    """Редактирование дубликатов, оставшихся без ключей после миграции 0004"""
+
+    def setUp(self):
+        self.employee = Employees.objects.create(
+            last_name='Иванов', first_name='Иван', birth_date=date(1980, 1, 1), gender='M'
+        )
+        self.certificate_type = CertificateType.objects.create(name='Тип')
+        self.original = self._create_signature('01 AB', 'FF 01')
+        # Дубликат по серийному номеру: при миграции ключ номера остался пустым
+        self.duplicate = self._create_signature('02 CD', 'FF 02')
+        DigitalSignature.objects.filter(pk=self.duplicate.pk).update(certificate_serial='01ab', serial_key='')
+        self.duplicate = DigitalSignature.objects.get(pk=self.duplicate.pk)
+
+    def _create_signature(self, serial, alias):
+        return DigitalSignature.objects.create(
+            employee=self.employee, certificate_type=self.certificate_type, certificate_serial=serial,
+            certificate_alias=alias, expiry_date=date(2030, 1, 1),
+        )
+
+    def _data(self, **overrides):
+        data = {
+            'employee': self.employee.pk,
+            'certificate_type': self.certificate_type.pk,
+            'certificate_serial': self.duplicate.certificate_serial,
+            'certificate_alias': self.duplicate.certificate_alias,
+            'expiry_date': '2030-01-01',
+            'status': DigitalSignature.STATUS_REVOKED,
+            'notes': 'Дубликат',
+        }
+        data.update(overrides)
+        return data
+
+    def _admin_form(self, data):
+        model_admin = DigitalSignatureAdmin(DigitalSignature, AdminSite())
+        request = RequestFactory().post('/')
+        request.user = get_user_model().objects.create_superuser('admin', password='x')
+        return model_admin.get_form(request, self.duplicate)(data=data, instance=self.duplicate)
+
+    def test_edit_without_changing_serial_keeps_key_blank(self):
+        for form in (DigitalSignatureForm(data=self._data(), instance=self.duplicate), self._admin_form(self._data())):
+            with self.subTest(form=type(form).__name__):
+                self.assertTrue(form.is_valid(), form.errors)
+                signature = form.save()
+                signature.refresh_from_db()
+                self.assertEqual(signature.notes, 'Дубликат')
+                self.assertEqual(signature.serial_key, '')
+                self.assertEqual(signature.thumbprint_key, 'FF02')
+
+    def test_duplicate_serial_is_a_validation_error(self):
+        data = self._data(certificate_serial='01 ab ')
+        for form in (DigitalSignatureForm(data=data, instance=self.duplicate), self._admin_form(data)):
+            with self.subTest(form=type(form).__name__):
+                self.assertFalse(form.is_valid())
+                self.assertIn('certificate_serial', form.errors)
+
+    def test_changed_serial_fills_key(self):
+        form = DigitalSignatureForm(data=self._data(certificate_serial='03 ef'), instance=self.duplicate)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().serial_key, '03EF')
+
+
+class ReportExportStreamingTests(TestCase):
+    """Потоковая выгрузка отчетов пачками из QuerySet.iterator()"""
+
+    def setUp(self):
+        postname = Postname.objects.create(name='Специалист', code='P1')
+        departments = [
+            Departments.objects.create(name=name, code=code)
+            for name, code in (('Бухгалтерия', 'D1'), ('Отдел кадров', 'D2'))
+        ]
+        for index in range(7):
+            employee = Employees.objects.create(
+                last_name=f'Сотрудник{index}', first_name='Иван', birth_date=date(1980, 1, 1), gender='M'
+            )
+            # Сотрудник без должности попадает в группу NO_DEPARTMENT
+            if index < 6:
+                Posts.objects.create(
+                    postname=postname, department=departments[index % 2], employee=employee,
+                    status=Posts.STATUS_OCCUPIED,
+                )
+        self.client.force_login(get_user_model().objects.create_user('user', password='x'))
+
+    def test_stream_matches_grouped_report(self):
+        grouped = report_utils.get_employees_without_signature()
+        expected = [
+            (name, item['employee'].pk, item['post'] and item['post'].pk)
+            for name, items in sorted(grouped.items()) for item in items
+        ]
+
+        with mock.patch.object(report_utils, 'REPORT_CHUNK_SIZE', 3):
+            # Сотрудники читаются пачками по 3, должности - одним запросом на пачку
+            with self.assertNumQueries(1 + 3):
+                items = list(report_utils.iter_employees_without_signature())
+
+        self.assertEqual(
+            [(item['department_name'], item['employee'].pk, item['post'] and item['post'].pk) for item in items],
+            expected,
+        )
+        self.assertEqual(items[3]['department_name'], report_utils.NO_DEPARTMENT)
+
+    def test_csv_export(self):
+        url = reverse('access:report_signature_missing')
+        with mock.patch.object(report_utils, 'REPORT_CHUNK_SIZE', 2):
+            response = self.client.get(url, {'format': 'csv'})
+            content = b''.join(response.streaming_content).decode('utf-8-sig')
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1 + 7)
+        self.assertEqual([row[0] for row in rows[1:]], ['Бухгалтерия'] * 3 + ['Не указано'] + ['Отдел кадров'] * 3)
+
+    def test_empty_export_renders_report(self):
+        Employees.objects.update(status=Employees.STATUS_DISMISSED)
+        response = self.client.get(
+            reverse('access:report_signature_missing'), {'format': 'csv', 'active_only': 'on'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
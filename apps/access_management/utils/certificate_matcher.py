@@ -2,9 +2,10 @@
 Утилита для сопоставления данных сертификатов с существующими записями в БД
 """
 from typing import Optional
+from apps.hr.matching import EmployeeNameMatcher
 from apps.hr.models import Employees
 from apps.reference.models import CertificateType
-from apps.access_management.models import DigitalSignature
+from apps.access_management.models import DigitalSignature, normalize_certificate_key
 
 
 def get_certificate_type_by_text(type_text: str) -> Optional[CertificateType]:
@@ -33,59 +34,26 @@ def get_certificate_type_by_text(type_text: str) -> Optional[CertificateType]:
         return None
 
 
-def match_employee_by_name(full_name: str) -> Optional[Employees]:
+def match_employee_by_name(full_name: str, matcher: Optional[EmployeeNameMatcher] = None) -> Optional[Employees]:
     """
     Ищет сотрудника по полному ФИО
     
     Args:
         full_name: Полное ФИО в формате "Фамилия Имя Отчество"
+        matcher: EmployeeNameMatcher(exact=True) с заранее загруженными кандидатами
+                 (для импорта списка ФИО одним запросом)
     
     Returns:
         Объект Employees, если найден один сотрудник
         None, если не найден или найдено несколько
     """
-    try:
-        # Нормализуем ФИО (убираем лишние пробелы)
-        full_name = ' '.join(full_name.split())
-        
-        # Разбиваем ФИО на части
-        name_parts = full_name.split()
-        
-        if len(name_parts) < 2:
-            # Минимум фамилия и имя
-            return None
-        
-        last_name = name_parts[0].strip()
-        first_name = name_parts[1].strip()
-        middle_name = name_parts[2].strip() if len(name_parts) > 2 else ''
-        
-        # Поиск с учетом регистра и пробелов
-        query = Employees.objects.filter(
-            last_name__iexact=last_name,
-            first_name__iexact=first_name
-        )
-        
-        # Если есть отчество, добавляем его в фильтр
-        if middle_name:
-            query = query.filter(middle_name__iexact=middle_name)
-        else:
-            # Если отчества нет, ищем записи с пустым отчеством
-            query = query.filter(middle_name__in=['', None])
-        
-        # Получаем результаты
-        employees = list(query)
-        
-        if len(employees) == 1:
-            return employees[0]
-        elif len(employees) == 0:
-            return None
-        else:
-            # Найдено несколько сотрудников - возвращаем None
-            # (в будущем можно добавить логику выбора)
-            return None
-    
-    except Exception:
-        return None
+    matcher = matcher or EmployeeNameMatcher(exact=True)
+    employees = matcher.find_all(full_name)
+    if len(employees) == 1:
+        return employees[0]
+    # Не найден или найдено несколько сотрудников
+    # (в будущем можно добавить логику выбора)
+    return None
 
 
 def check_duplicate_certificate(certificate_serial: str) -> bool:
@@ -98,17 +66,8 @@ def check_duplicate_certificate(certificate_serial: str) -> bool:
     Returns:
         True, если дубликат найден, False если нет
     """
-    try:
-        # Нормализуем номер (убираем пробелы, приводим к верхнему регистру)
-        certificate_serial = certificate_serial.strip().upper().replace(' ', '')
-        
-        # Ищем точное совпадение
-        exists = DigitalSignature.objects.filter(
-            certificate_serial__iexact=certificate_serial
-        ).exists()
-        
-        return exists
-    except Exception:
-        # При ошибке считаем, что дубликата нет
+    certificate_key = normalize_certificate_key(certificate_serial)
+    if not certificate_key:
         return False
-
+    # Поиск по индексированному нормализованному номеру
+    return DigitalSignature.objects.filter(serial_key=certificate_key).exists()
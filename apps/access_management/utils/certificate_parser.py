@@ -3,10 +3,14 @@
 Извлекает информацию из X.509 сертификатов для автоматического заполнения модели DigitalSignature
 """
 import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, Optional, Tuple
 from io import BytesIO
 
+from django.conf import settings
+
 try:
     from cryptography import x509
     from cryptography.hazmat.backends import default_backend
@@ -187,6 +191,124 @@ def _extract_certificate_data(cert: x509.Certificate) -> Dict[str, any]:
     }
 
 
+# Поля результата разбора, которые хранятся в кэше
+CACHED_CERTIFICATE_FIELDS = (
+    'certificate_serial', 'certificate_alias', 'expiry_date', 'valid_from', 'subject_name', 'issuer_name',
+)
+
+
+def certificate_digest(file_content: bytes) -> str:
+    """SHA-256 содержимого файла - ключ кэша разбора"""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+class CertificateParseCache:
+    """
+    Кэш результатов разбора сертификатов по SHA-256 содержимого файла.
+
+    Один и тот же файл разбирается при предпросмотре в форме, при сохранении формы
+    и при массовой загрузке; повторно cryptography не вызывается.
+    Хранится в памяти процесса с вытеснением давно не использованных записей (LRU)
+    и, если задан CERTIFICATE_PARSE_SHARED_CACHE (алиас из CACHES), в общем кэше
+    Django, доступном всем процессам.
+    """
+
+    def __init__(self, max_size: int = None, shared_cache_alias: str = None):
+        self._max_size = max_size
+        self._shared_cache_alias = shared_cache_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self) -> int:
+        if self._max_size is None:
+            return getattr(settings, 'CERTIFICATE_PARSE_CACHE_SIZE', 1024)
+        return self._max_size
+
+    def _shared_cache(self):
+        alias = self._shared_cache_alias or getattr(settings, 'CERTIFICATE_PARSE_SHARED_CACHE', None)
+        if not alias:
+            return None
+        from django.core.cache import caches
+        return caches[alias]
+
+    @staticmethod
+    def _shared_key(digest: str) -> str:
+        return f'certificate_parse:{digest}'
+
+    def get(self, digest: str) -> Optional[Dict[str, any]]:
+        """Данные сертификата из кэша (копия) или None"""
+        with self._lock:
+            data = self._entries.get(digest)
+            if data is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return dict(data)
+
+        shared = self._shared_cache()
+        data = shared.get(self._shared_key(digest)) if shared is not None else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._store(digest, data)
+        return dict(data)
+
+    def set(self, digest: str, data: Dict[str, any]):
+        data = {field: data.get(field) for field in CACHED_CERTIFICATE_FIELDS}
+        with self._lock:
+            self._store(digest, data)
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set(self._shared_key(digest), data, getattr(settings, 'CERTIFICATE_PARSE_SHARED_CACHE_TIMEOUT', None))
+
+    def _store(self, digest: str, data: Dict[str, any]):
+        self._entries[digest] = data
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+            }
+
+
+certificate_parse_cache = CertificateParseCache()
+
+
+def parse_certificate_cached(file_content: bytes, filename: str = None) -> Dict[str, any]:
+    """
+    Разбор сертификата через кэш (см. CertificateParseCache).
+    Возвращает поля CACHED_CERTIFICATE_FIELDS, без subject_attributes.
+    """
+    digest = certificate_digest(file_content)
+    data = certificate_parse_cache.get(digest)
+    if data is None:
+        data = parse_certificate_file(file_content, filename)
+        certificate_parse_cache.set(digest, data)
+        data = {field: data.get(field) for field in CACHED_CERTIFICATE_FIELDS}
+    return data
+
+
 def parse_certificate_from_django_file(file_field) -> Dict[str, any]:
     """
     Удобная функция для парсинга файла из Django FileField
@@ -195,7 +317,7 @@ def parse_certificate_from_django_file(file_field) -> Dict[str, any]:
         file_field: Django FileField или InMemoryUploadedFile
     
     Returns:
-        Словарь с извлеченными данными (см. parse_certificate_file)
+        Словарь с извлеченными данными (см. parse_certificate_cached)
     """
     if not file_field:
         raise CertificateParseError("Файл не предоставлен")
@@ -211,7 +333,7 @@ def parse_certificate_from_django_file(file_field) -> Dict[str, any]:
             content = f.read()
         filename = str(file_field)
     
-    return parse_certificate_file(content, filename)
+    return parse_certificate_cached(content, filename)
 
 
 def get_certificate_thumbprint(file_content: bytes) -> str:
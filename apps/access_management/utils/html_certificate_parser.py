@@ -1,10 +1,34 @@
 """
 Утилита для парсинга HTML-файлов с информацией о сертификатах
 Извлекает данные о сертификатах из HTML-страницы портала УЦ ФК
+
+Файл читается частями и разбирается потоково (html.parser.HTMLParser): дерево
+элементов строится только для текущего блока div.cert-item и отбрасывается после
+извлечения данных, поэтому расход памяти не зависит от размера выгрузки.
+Правила разбора разметки (закрытие тегов, пустые элементы, текст) повторяют
+BeautifulSoup с html.parser, которым файл разбирался раньше.
 """
+import codecs
+import logging
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Элементы без содержимого: закрываются сразу после открывающего тега
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+])
+
+# Текст этих элементов не входит в текст родительских элементов
+NON_TEXT_ELEMENTS = frozenset(['script', 'style'])
 
 
 class HTMLParseError(Exception):
@@ -12,13 +36,221 @@ class HTMLParseError(Exception):
     pass
 
 
+class _Element:
+    """Элемент дерева блока cert-item: имя тега, классы и дочерние элементы/строки"""
+    __slots__ = ('name', 'classes', 'children')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.classes = (dict(attrs).get('class') or '').split()
+        self.children = []
+
+    def descendants(self):
+        """Вложенные элементы в порядке документа"""
+        stack = [child for child in reversed(self.children) if isinstance(child, _Element)]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(child for child in reversed(element.children) if isinstance(child, _Element))
+
+    def find(self, name, class_=None) -> Optional['_Element']:
+        for element in self.descendants():
+            if element.name == name and (class_ is None or class_ in element.classes):
+                return element
+        return None
+
+    def find_all(self, name) -> List['_Element']:
+        return [element for element in self.descendants() if element.name == name]
+
+    def get_text(self) -> str:
+        """Текст элемента как BeautifulSoup get_text(strip=True)"""
+        parts = []
+        stack = list(reversed(self.children))
+        while stack:
+            child = stack.pop()
+            if isinstance(child, _Element):
+                stack.extend(reversed(child.children))
+            else:
+                text = child.strip()
+                if text:
+                    parts.append(text)
+        return ''.join(parts)
+
+
+class _CertificateHTMLParser(HTMLParser):
+    """
+    Потоковый разбор: вне блоков cert-item хранятся только имена открытых тегов,
+    внутри блока строится дерево. Закрытые блоки накапливаются в self.items.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # Открытые теги: имя (вне блока) или _Element (внутри блока cert-item)
+        self._stack = []
+        self._item_start = None  # позиция корня текущего блока в стеке
+        self._closed_void = Counter()  # пустые элементы, явный закрывающий тег которых нужно пропустить
+        self.items = []
+
+    def handle_starttag(self, tag, attrs):
+        self._push(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._pop_to(tag)
+            self._closed_void[tag] += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._push(tag, attrs)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag):
+        if self._closed_void[tag]:
+            # </br> после <br> уже обработан
+            self._closed_void[tag] -= 1
+            return
+        self._pop_to(tag)
+
+    def handle_data(self, data):
+        if self._item_start is None:
+            return
+        parent = self._stack[-1]
+        if parent.name in NON_TEXT_ELEMENTS:
+            return
+        # Текст, пришедший частями (на границе прочитанных блоков), склеивается в одну строку
+        if parent.children and isinstance(parent.children[-1], str):
+            parent.children[-1] += data
+        else:
+            parent.children.append(data)
+
+    def _push(self, tag, attrs):
+        if self._item_start is None:
+            if tag == 'div' and 'cert-item' in (dict(attrs).get('class') or '').split():
+                self._item_start = len(self._stack)
+                self._stack.append(_Element(tag, attrs))
+            else:
+                self._stack.append(tag)
+            return
+        element = _Element(tag, attrs)
+        self._stack[-1].children.append(element)
+        self._stack.append(element)
+
+    def _pop_to(self, tag):
+        """Закрывает теги до последнего открытого с этим именем (как BeautifulSoup); иначе тег игнорируется"""
+        for index in range(len(self._stack) - 1, -1, -1):
+            entry = self._stack[index]
+            if (entry.name if isinstance(entry, _Element) else entry) == tag:
+                break
+        else:
+            return
+        if self._item_start is not None and index <= self._item_start:
+            root = self._stack[self._item_start]
+            # Вложенные блоки cert-item (если есть) следуют за внешним в порядке документа
+            self.items.append(root)
+            self.items.extend(
+                element for element in root.descendants()
+                if element.name == 'div' and 'cert-item' in element.classes
+            )
+            self._item_start = None
+        del self._stack[index:]
+
+    def close(self):
+        super().close()
+        # Незакрытые до конца файла теги закрываются, как при построении полного дерева
+        if self._stack:
+            entry = self._stack[0]
+            self._pop_to(entry.name if isinstance(entry, _Element) else entry)
+
+    def pop_items(self) -> List[_Element]:
+        items, self.items = self.items, []
+        return items
+
+
+def _read_chunks(html_file, chunk_size):
+    if hasattr(html_file, 'read'):
+        html_file.seek(0)
+        while True:
+            chunk = html_file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        # Если это путь к файлу
+        with open(html_file, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def _detect_encoding(html_file, chunk_size):
+    """
+    Кодировка файла за один проход без загрузки в память: UTF-8, если весь файл
+    корректен в UTF-8, иначе windows-1251, иначе UTF-8 с пропуском ошибок.
+    Для файлов, возвращающих строки, декодирование не требуется (None).
+    """
+    candidates = {'utf-8': codecs.getincrementaldecoder('utf-8')(), 'windows-1251': codecs.getincrementaldecoder('windows-1251')()}
+    for chunk in _read_chunks(html_file, chunk_size):
+        if isinstance(chunk, str):
+            return None, None
+        for encoding, decoder in list(candidates.items()):
+            try:
+                decoder.decode(chunk)
+            except UnicodeDecodeError:
+                del candidates[encoding]
+        if not candidates:
+            break
+    for encoding, decoder in list(candidates.items()):
+        try:
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            del candidates[encoding]
+    for encoding in ('utf-8', 'windows-1251'):
+        if encoding in candidates:
+            return encoding, 'strict'
+    return 'utf-8', 'ignore'
+
+
+def iter_certificate_html(html_file, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Потоково разбирает HTML-файл и выдает сертификаты по мере чтения
+    (формат словарей - см. parse_certificate_html)
+
+    Raises:
+        HTMLParseError: Если не удалось распарсить файл
+    """
+    try:
+        encoding, errors = _detect_encoding(html_file, chunk_size)
+        decoder = codecs.getincrementaldecoder(encoding)(errors) if encoding else None
+        parser = _CertificateHTMLParser()
+        found = 0
+        for chunk in _read_chunks(html_file, chunk_size):
+            parser.feed(decoder.decode(chunk) if decoder else chunk)
+            for cert_item in parser.pop_items():
+                found += 1
+                cert_data = _extract_certificate_data(cert_item)
+                if cert_data:
+                    yield cert_data
+        if decoder:
+            parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+        for cert_item in parser.pop_items():
+            found += 1
+            cert_data = _extract_certificate_data(cert_item)
+            if cert_data:
+                yield cert_data
+        logger.debug(f'Найдено блоков cert-item: {found}')
+    except HTMLParseError:
+        raise
+    except Exception as e:
+        raise HTMLParseError(f"Ошибка при парсинге HTML-файла: {str(e)}")
+
+
 def parse_certificate_html(html_file) -> List[Dict]:
     """
     Парсит HTML-файл и извлекает список сертификатов
-    
+
     Args:
         html_file: Django FileField или файловый объект с HTML-контентом
-    
+
     Returns:
         Список словарей с данными о сертификатах:
         [{
@@ -27,230 +259,130 @@ def parse_certificate_html(html_file) -> List[Dict]:
             'owner_name': str,  # "Фамилия Имя Отчество"
             'expiry_date': datetime.date,  # из строки "DD.MM.YYYY"
         }, ...]
-    
+
     Raises:
         HTMLParseError: Если не удалось распарсить файл
     """
-    try:
-        # Читаем содержимое файла
-        if hasattr(html_file, 'read'):
-            html_file.seek(0)
-            content = html_file.read()
-            # Если это байты, пробуем декодировать
-            if isinstance(content, bytes):
-                # Пробуем разные кодировки
-                try:
-                    content = content.decode('utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        content = content.decode('windows-1251')
-                    except UnicodeDecodeError:
-                        content = content.decode('utf-8', errors='ignore')
-        else:
-            # Если это путь к файлу
-            try:
-                with open(html_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                with open(html_file, 'r', encoding='windows-1251') as f:
-                    content = f.read()
-        
-        # Парсим HTML
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Находим все блоки сертификатов
-        # Используем CSS селектор для более надежного поиска
-        # Ищем div с классом cert-item (может быть с дополнительными классами, например "active")
-        cert_items = soup.select('div.cert-item')
-        
-        # Если не нашли через CSS селектор, пробуем через find_all
-        if not cert_items:
-            def has_cert_item_class(class_list):
-                if not class_list:
-                    return False
-                if isinstance(class_list, list):
-                    return 'cert-item' in class_list
-                return 'cert-item' in str(class_list)
-            cert_items = soup.find_all('div', class_=has_cert_item_class)
-        
-        certificates = []
-        
-        # Логируем количество найденных блоков для отладки
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.debug(f'Найдено блоков cert-item: {len(cert_items)}')
-        
-        for idx, cert_item in enumerate(cert_items):
-            try:
-                cert_data = _extract_certificate_data(cert_item)
-                if cert_data:
-                    certificates.append(cert_data)
-                else:
-                    logger.debug(f'Блок {idx}: данные не извлечены (вернулся None)')
-            except Exception as e:
-                # Пропускаем записи с ошибками, но продолжаем обработку
-                logger.debug(f'Блок {idx}: ошибка при извлечении данных: {str(e)}')
-                continue
-        
-        return certificates
-    
-    except Exception as e:
-        raise HTMLParseError(f"Ошибка при парсинге HTML-файла: {str(e)}")
+    return list(iter_certificate_html(html_file))
 
 
 def _extract_certificate_data(cert_item) -> Optional[Dict]:
     """
     Извлекает данные о сертификате из одного блока
-    
+
     Args:
-        cert_item: BeautifulSoup элемент с классом 'cert-item'
-    
+        cert_item: элемент div с классом 'cert-item'
+
     Returns:
         Словарь с данными или None, если данные некорректны
     """
     try:
         # Тип сертификата и номер сертификата
         # Путь: div.cert-item-content.contWidth1 > div > div (первый div содержит тип, второй - номер)
-        # Используем CSS селектор для поиска элемента с классом contWidth1
-        cont_width1 = cert_item.select_one('div.contWidth1')
-        if not cont_width1:
-            # Пробуем через find_all с проверкой класса
-            def has_contwidth1_class(class_list):
-                if not class_list:
-                    return False
-                if isinstance(class_list, list):
-                    return 'contWidth1' in class_list
-                return 'contWidth1' in str(class_list)
-            cont_width1 = cert_item.find('div', class_=has_contwidth1_class)
-        
+        cont_width1 = cert_item.find('div', 'contWidth1')
         if not cont_width1:
             return None
-        
+
         # Находим внутренний div
         inner_div = cont_width1.find('div')
         if not inner_div:
             return None
-        
+
         # Тип сертификата находится в первом div внутри inner_div
         type_div = inner_div.find('div')
         if not type_div:
             return None
-        
+
         type_b = type_div.find('b')
         if not type_b:
             return None
-        
-        cert_type_text = type_b.get_text(strip=True)
+
+        cert_type_text = type_b.get_text()
         if not cert_type_text:
             return None
-        
+
         # Номер сертификата находится во втором div внутри inner_div
         cert_number_divs = inner_div.find_all('div')
         if len(cert_number_divs) < 2:
             return None
-        
-        cert_number_div = cert_number_divs[1]
-        cert_number_text = cert_number_div.get_text(strip=True)
-        
+
+        cert_number_text = cert_number_divs[1].get_text()
+
         # Извлекаем номер после "№"
         if '№' in cert_number_text:
             cert_number = cert_number_text.split('№', 1)[1].strip()
         else:
             cert_number = cert_number_text.strip()
-        
+
         # Удаляем пробелы из номера
         cert_number = cert_number.replace(' ', '')
-        
+
         if not cert_number:
             return None
-        
+
         # ФИО владельца
         # Путь: div.cert-item-content.contWidth2 > div.owner-name > b (первый элемент)
-        # Используем CSS селектор для поиска элемента с классом contWidth2
-        cont_width2 = cert_item.select_one('div.contWidth2')
-        if not cont_width2:
-            # Пробуем через find_all с проверкой класса
-            def has_contwidth2_class(class_list):
-                if not class_list:
-                    return False
-                if isinstance(class_list, list):
-                    return 'contWidth2' in class_list
-                return 'contWidth2' in str(class_list)
-            cont_width2 = cert_item.find('div', class_=has_contwidth2_class)
-        
+        cont_width2 = cert_item.find('div', 'contWidth2')
         if not cont_width2:
             return None
-        
-        owner_name_div = cont_width2.find('div', class_='owner-name')
+
+        owner_name_div = cont_width2.find('div', 'owner-name')
         if not owner_name_div:
             return None
-        
+
         owner_name_b = owner_name_div.find('b')
         if not owner_name_b:
             return None
-        
-        owner_name = owner_name_b.get_text(strip=True)
+
+        owner_name = owner_name_b.get_text()
         if not owner_name:
             return None
-        
+
         # Дата окончания срока действия
         # Путь: div.cert-item-content-right > table > tr:nth-child(3) > td > b
-        # Используем CSS селектор для поиска элемента с классом cert-item-content-right
-        cert_content_right = cert_item.select_one('div.cert-item-content-right')
-        if not cert_content_right:
-            # Пробуем через find_all с проверкой класса
-            def has_content_right_class(class_list):
-                if not class_list:
-                    return False
-                if isinstance(class_list, list):
-                    return 'cert-item-content-right' in class_list
-                return 'cert-item-content-right' in str(class_list)
-            cert_content_right = cert_item.find('div', class_=has_content_right_class)
-        
+        cert_content_right = cert_item.find('div', 'cert-item-content-right')
         if not cert_content_right:
             return None
-        
+
         table = cert_content_right.find('table')
         if not table:
             return None
-        
+
         # Ищем строку таблицы, в которой содержится последняя жирная дата
         rows = table.find_all('tr')
         if not rows:
             return None
-        
+
         expiry_b = None
         for row in reversed(rows):
-            cells = row.find_all('td')
-            for cell in reversed(cells or []):
+            for cell in reversed(row.find_all('td')):
                 expiry_b = cell.find('b')
-                if expiry_b and expiry_b.get_text(strip=True):
+                if expiry_b and expiry_b.get_text():
                     break
-            if expiry_b and expiry_b.get_text(strip=True):
+            if expiry_b and expiry_b.get_text():
                 break
-        
+
         if not expiry_b:
             return None
-        
-        expiry_date_text = expiry_b.get_text(strip=True)
+
+        expiry_date_text = expiry_b.get_text()
         if not expiry_date_text:
             return None
-        
+
         # Парсим дату из формата "DD.MM.YYYY"
         try:
             expiry_date = datetime.strptime(expiry_date_text, '%d.%m.%Y').date()
         except ValueError:
             # Если не удалось распарсить, пропускаем запись
             return None
-        
+
         return {
             'certificate_number': cert_number,
             'certificate_type_text': cert_type_text,
             'owner_name': owner_name,
             'expiry_date': expiry_date,
         }
-    
+
     except Exception:
         # При любой ошибке возвращаем None
         return None
-
@@ -8,22 +8,21 @@ from django.http import FileResponse, JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from .models import SystemAccess, DigitalSignature
+from .models import SystemAccess, DigitalSignature, normalize_certificate_key
 from .forms import SystemAccessForm, DigitalSignatureForm, BulkCertificateUploadForm, CertificateImportForm
+from .importers import BulkCertificateImporter, CertificateKeyIndex, update_certificates
+from apps.hr.matching import EmployeeNameMatcher
 from apps.hr.models import Employees
 from apps.reference.models import CertificateType
 from .utils.certificate_parser import (
     parse_certificate_from_django_file, 
-    CertificateParseError,
-    generate_certificate_filename
+    CertificateParseError
 )
 from .utils.html_certificate_parser import parse_certificate_html, HTMLParseError
 from .utils.certificate_matcher import (
     get_certificate_type_by_text,
-    match_employee_by_name,
-    check_duplicate_certificate
+    match_employee_by_name
 )
-from django.core.files.base import ContentFile
 from django.db import transaction
 
 
@@ -280,53 +279,9 @@ def _find_employee_by_name(subject_name):
     Returns:
         Employees объект или None, если не найден
     """
-    if not subject_name:
-        return None
-    
-    # Нормализуем строку: убираем лишние пробелы
-    subject_name = ' '.join(subject_name.split())
-    
-    # Разбиваем на части
-    name_parts = subject_name.split()
-    
-    if len(name_parts) < 2:
-        return None
-    
-    last_name = name_parts[0]
-    first_name = name_parts[1]
-    middle_name = name_parts[2] if len(name_parts) >= 3 else ''
-    
-    # Сначала ищем точное совпадение с отчеством (если оно есть)
-    if middle_name:
-        employee = Employees.objects.filter(
-            last_name__iexact=last_name,
-            first_name__iexact=first_name,
-            middle_name__iexact=middle_name
-        ).first()
-        if employee:
-            return employee
-    
-    # Если не нашли с отчеством или отчества нет, ищем по фамилии и имени
-    # Если есть отчество в сертификате, предпочитаем сотрудника с совпадающим отчеством
-    employees = Employees.objects.filter(
-        last_name__iexact=last_name,
-        first_name__iexact=first_name
-    )
-    
-    if middle_name:
-        # Если есть отчество в сертификате, ищем сотрудника с совпадающим отчеством
-        for emp in employees:
-            if emp.middle_name and emp.middle_name.lower() == middle_name.lower():
-                return emp
-        # Если не нашли с совпадающим отчеством, возвращаем первого найденного
-        return employees.first()
-    else:
-        # Если отчества нет в сертификате, предпочитаем сотрудника без отчества
-        for emp in employees:
-            if not emp.middle_name or emp.middle_name.strip() == '':
-                return emp
-        # Если все сотрудники имеют отчество, возвращаем первого
-        return employees.first()
+    # При наличии отчества предпочтительно полное совпадение, иначе первый по фамилии и имени;
+    # без отчества предпочтителен сотрудник без отчества
+    return EmployeeNameMatcher().find(subject_name)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -474,111 +429,16 @@ class BulkCertificateUploadView(LoginRequiredMixin, View):
                     'form': form
                 })
         
-        # Результаты обработки
-        results = {
-            'success': [],  # Успешно загружено
-            'skipped': [],  # Пропущено (сотрудник не найден)
-            'errors': [],   # Ошибки парсинга
-            'duplicates': []  # Дубликаты (уже существует)
-        }
-        
-        today = timezone.now().date()
-        
-        # Обрабатываем каждый файл
-        for file in files:
-            original_filename = file.name
-            try:
-                # Парсим сертификат
-                cert_data = parse_certificate_from_django_file(file)
-                
-                # Определяем статус
-                expiry_date = cert_data['expiry_date']
-                days_until_expiry = (expiry_date - today).days
-                
-                if expiry_date < today:
-                    status = DigitalSignature.STATUS_NEEDS_UPDATE
-                elif days_until_expiry <= 30:
-                    status = DigitalSignature.STATUS_NEEDS_UPDATE
-                else:
-                    status = DigitalSignature.STATUS_ACTIVE
-                
-                # Ищем сотрудника по ФИО
-                subject_name = cert_data.get('subject_name', '')
-                employee = None
-                if subject_name:
-                    employee = _find_employee_by_name(subject_name)
-                
-                if not employee:
-                    # Сотрудник не найден - пропускаем
-                    results['skipped'].append({
-                        'filename': original_filename,
-                        'subject_name': subject_name,
-                        'certificate_serial': cert_data.get('certificate_serial', 'N/A'),
-                        'reason': 'Сотрудник не найден в базе данных'
-                    })
-                    continue
-                
-                # Проверяем на дубликаты по серийному номеру
-                existing = DigitalSignature.objects.filter(
-                    certificate_serial=cert_data['certificate_serial']
-                ).first()
-                
-                if existing:
-                    results['duplicates'].append({
-                        'filename': original_filename,
-                        'employee': str(employee),
-                        'certificate_serial': cert_data['certificate_serial'],
-                        'existing_id': existing.pk
-                    })
-                    continue
-                
-                # Генерируем имя файла
-                new_filename = generate_certificate_filename(
-                    employee, 
-                    expiry_date, 
-                    original_filename
-                )
-                
-                # Создаем запись DigitalSignature
-                signature = DigitalSignature(
-                    employee=employee,
-                    certificate_type=certificate_type,
-                    certificate_serial=cert_data['certificate_serial'],
-                    certificate_alias=cert_data['certificate_alias'],
-                    expiry_date=expiry_date,
-                    status=status,
-                    notes=f"Сертификат выдан: {subject_name}"
-                )
-                
-                # Сохраняем файл с новым именем
-                file.seek(0)  # Возвращаемся в начало файла
-                file_content = file.read()
-                signature.certificate_file.save(
-                    new_filename,
-                    ContentFile(file_content),
-                    save=False
-                )
-                
-                signature.save()
-                
-                results['success'].append({
-                    'filename': original_filename,
-                    'employee': str(employee),
-                    'certificate_serial': cert_data['certificate_serial'],
-                    'signature_id': signature.pk,
-                    'new_filename': new_filename
-                })
-                
-            except CertificateParseError as e:
-                results['errors'].append({
-                    'filename': original_filename,
-                    'error': str(e)
-                })
-            except Exception as e:
-                results['errors'].append({
-                    'filename': original_filename,
-                    'error': f'Неожиданная ошибка: {str(e)}'
-                })
+        # Разбор в пуле процессов, сопоставление и проверка дубликатов в памяти, запись одной транзакцией
+        try:
+            results = BulkCertificateImporter(
+                certificate_type, update_existing=form.cleaned_data.get('update_existing')
+            ).run(files)
+        except Exception as e:
+            messages.error(request, f'Ошибка при сохранении сертификатов: {str(e)}')
+            return render(request, 'access_management/bulk_certificate_upload.html', {
+                'form': form
+            })
         
         # Сохраняем результаты в сессии для отображения на странице результатов
         request.session['bulk_upload_results'] = results
@@ -605,11 +465,13 @@ class BulkCertificateUploadResultsView(LoginRequiredMixin, View):
             'results': results,
             'total_files': (
                 len(results['success']) + 
+                len(results.get('updated', [])) + 
                 len(results['skipped']) + 
                 len(results['errors']) + 
                 len(results['duplicates'])
             ),
             'success_count': len(results['success']),
+            'updated_count': len(results.get('updated', [])),
             'skipped_count': len(results['skipped']),
             'errors_count': len(results['errors']),
             'duplicates_count': len(results['duplicates'])
@@ -641,10 +503,12 @@ class CertificateImportView(LoginRequiredMixin, View):
         
         html_file = form.cleaned_data['html_file']
         override_certificate_type = form.cleaned_data.get('certificate_type')
+        update_existing = form.cleaned_data.get('update_existing')
         
         # Результаты импорта
         results = {
             'imported': [],  # Успешно импортировано
+            'updated': [],  # Обновлены срок действия и статус существующих
             'skipped_employee_not_found': [],  # Сотрудник не найден
             'skipped_duplicate': [],  # Дубликат
             'skipped_type_not_found': [],  # Тип сертификата не найден
@@ -679,6 +543,15 @@ class CertificateImportView(LoginRequiredMixin, View):
         
         # Список для массового создания
         signatures_to_create = []
+        # Сотрудники по ФИО из файла одним запросом
+        employee_matcher = EmployeeNameMatcher(exact=True)
+        employee_matcher.prefetch(cert_data['owner_name'] for cert_data in certificates)
+        # Существующие номера одним запросом; номера этого файла - для повторов внутри файла
+        existing = CertificateKeyIndex()
+        seen_keys = set()
+        updates = {}  # id существующей подписи -> (дата окончания, статус)
+        update_results = {}
+        today = timezone.now().date()
         
         # Обрабатываем каждый сертификат
         for cert_data in certificates:
@@ -697,7 +570,7 @@ class CertificateImportView(LoginRequiredMixin, View):
                         continue
                 
                 # Ищем сотрудника по ФИО
-                employee = match_employee_by_name(cert_data['owner_name'])
+                employee = match_employee_by_name(cert_data['owner_name'], employee_matcher)
                 if not employee:
                     results['skipped_employee_not_found'].append({
                         'certificate_number': cert_data['certificate_number'],
@@ -705,21 +578,31 @@ class CertificateImportView(LoginRequiredMixin, View):
                     })
                     continue
                 
+                # Определяем статус
+                if cert_data['expiry_date'] < today:
+                    status = DigitalSignature.STATUS_NEEDS_UPDATE
+                else:
+                    status = DigitalSignature.STATUS_ACTIVE
+                
                 # Проверяем дубликат
-                if check_duplicate_certificate(cert_data['certificate_number']):
+                serial_key = normalize_certificate_key(cert_data['certificate_number'])
+                existing_id = existing.find(serial_key)
+                if existing_id is not None and update_existing and existing_id not in updates:
+                    updates[existing_id] = (cert_data['expiry_date'], status)
+                    update_results[existing_id] = {
+                        'certificate_number': cert_data['certificate_number'],
+                        'owner_name': cert_data['owner_name'],
+                        'employee': str(employee),
+                        'expiry_date': cert_data['expiry_date'],
+                    }
+                    continue
+                if existing_id is not None or serial_key in seen_keys:
                     results['skipped_duplicate'].append({
                         'certificate_number': cert_data['certificate_number'],
                         'owner_name': cert_data['owner_name'],
                     })
                     continue
-                
-                # Определяем статус
-                from django.utils import timezone
-                today = timezone.now().date()
-                if cert_data['expiry_date'] < today:
-                    status = DigitalSignature.STATUS_NEEDS_UPDATE
-                else:
-                    status = DigitalSignature.STATUS_ACTIVE
+                seen_keys.add(serial_key)
                 
                 # Создаем объект для массового создания
                 signature = DigitalSignature(
@@ -731,6 +614,7 @@ class CertificateImportView(LoginRequiredMixin, View):
                     status=status,
                     notes=f'Импортировано из HTML-файла: {html_file.name}'
                 )
+                signature.fill_keys()
                 signatures_to_create.append(signature)
                 
                 results['imported'].append({
@@ -750,20 +634,36 @@ class CertificateImportView(LoginRequiredMixin, View):
                 continue
         
         # Массовое создание записей в транзакции
-        if signatures_to_create:
+        if signatures_to_create or updates:
             try:
                 with transaction.atomic():
                     DigitalSignature.objects.bulk_create(signatures_to_create)
-                messages.success(
-                    request,
-                    f'Успешно импортировано {len(signatures_to_create)} сертификатов.'
-                )
+                    changed = update_certificates(updates)
             except Exception as e:
                 messages.error(
                     request,
                     f'Ошибка при сохранении в базу данных: {str(e)}'
                 )
                 return render(request, self.template_name, {'form': form})
+            for existing_id, result in update_results.items():
+                if existing_id in changed:
+                    results['updated'].append(result)
+                else:
+                    # Срок и статус не изменились - повторный импорт той же записи
+                    results['skipped_duplicate'].append({
+                        'certificate_number': result['certificate_number'],
+                        'owner_name': result['owner_name'],
+                    })
+            if signatures_to_create:
+                messages.success(
+                    request,
+                    f'Успешно импортировано {len(signatures_to_create)} сертификатов.'
+                )
+            if results['updated']:
+                messages.success(
+                    request,
+                    f'Обновлено {len(results["updated"])} сертификатов.'
+                )
         
         # Формируем контекст для отображения результатов
         context = {
@@ -771,6 +671,7 @@ class CertificateImportView(LoginRequiredMixin, View):
             'results': results,
             'total_found': len(certificates),
             'imported_count': len(results['imported']),
+            'updated_count': len(results['updated']),
             'skipped_employee_count': len(results['skipped_employee_not_found']),
             'skipped_duplicate_count': len(results['skipped_duplicate']),
             'skipped_type_count': len(results['skipped_type_not_found']),
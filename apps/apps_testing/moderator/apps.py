@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ModeratorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.apps_testing.moderator'
+
+    def ready(self):
+        import apps.apps_testing.moderator.signals  # noqa
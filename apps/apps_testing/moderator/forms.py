@@ -38,6 +38,10 @@ class TestForm(forms.ModelForm):
 class QuestionSetForm(forms.ModelForm):
     csv_file = forms.FileField(required=False, help_text='CSV с разделителем ; : вопрос; ответ1; ответ2; ответ3; ответ4; номер правильного ответа (1-4)')
     has_header = forms.BooleanField(required=False, initial=True, label='CSV содержит заголовок')
+    update_existing = forms.BooleanField(
+        required=False, label='Обновлять совпадающие вопросы',
+        help_text='Вопросы с тем же текстом и вариантами ответа не дублируются; при отметке у них обновляется правильный ответ'
+    )
     class Meta:
         model = QuestionSet
         fields = '__all__' # title, description
@@ -203,6 +207,35 @@ class QuestionErrorAnalyticsForm(forms.Form):
                 pass
 
 
+class ItemAnalysisForm(forms.Form):
+    test = forms.ModelChoiceField(
+        queryset=Test.objects.all(), required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    question_set = forms.ModelChoiceField(
+        queryset=QuestionSet.objects.all(), required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    start_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    end_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        if not cleaned.get('test') and not cleaned.get('question_set'):
+            raise forms.ValidationError('Выберите тест или набор вопросов.')
+        start = cleaned.get('start_date')
+        end = cleaned.get('end_date')
+        if start and end and start > end:
+            self.add_error('end_date', 'Дата окончания раньше даты начала.')
+        return cleaned
+
+
 class ResultsFilterForm(forms.Form):
     date_from = forms.DateField(
         required=False,
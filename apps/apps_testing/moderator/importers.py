@@ -0,0 +1,134 @@
+"""
+Импорт вопросов в набор из CSV.
+
+Файл разбирается за один проход, для каждой строки считается хэш содержимого
+(нормализованный текст вопроса и варианты ответа, см. Question.content_hash).
+Хэши вопросов набора загружаются одним запросом; строки, совпадающие с уже
+существующими вопросами, пропускаются или обновляются, новые вопросы
+добавляются через bulk_create пачками. Повторная загрузка того же банка
+вопросов не создает дубликатов.
+"""
+import csv
+
+from django.db import transaction
+
+from apps.apps_testing.tests.models import Question, question_content_hash
+from apps.apps_testing.tests.utils import invalidate_question_pools, invalidate_question_content
+
+
+BULK_BATCH_SIZE = 1000
+
+# Поля, которые обновляются у существующего вопроса с тем же хэшем
+QUESTION_UPDATE_FIELDS = ['text', 'option_1', 'option_2', 'option_3', 'option_4', 'correct_option']
+
+
+def decode_csv(content_bytes):
+    """Декодирует загруженный CSV: UTF-8 (с BOM или без), затем cp1251"""
+    try:
+        return content_bytes.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        try:
+            return content_bytes.decode('cp1251')
+        except UnicodeDecodeError:
+            return content_bytes.decode('utf-8', errors='ignore')
+
+
+class QuestionCSVImporter:
+    """
+    Импортер вопросов набора из CSV (разделитель ';'):
+    вопрос; ответ1; ответ2; ответ3; ответ4; номер правильного ответа (1-4).
+
+    Использование:
+        importer = QuestionCSVImporter(question_set, update_existing=False)
+        importer.run(lines, has_header=True)
+        importer.counts  # {'created': N, 'updated': N, 'skipped': N, 'duplicates': N}
+        importer.errors  # список сообщений об ошибках по строкам
+
+    update_existing - обновлять у совпавших вопросов правильный ответ и написание
+    текста/вариантов; без него совпавшие строки пропускаются.
+    """
+
+    def __init__(self, question_set, update_existing=False):
+        self.question_set = question_set
+        self.update_existing = update_existing
+        self.errors = []
+        self.counts = {'created': 0, 'updated': 0, 'skipped': 0, 'duplicates': 0}
+
+    def parse(self, lines, has_header=True):
+        """Разбор и проверка строк в памяти: {хэш: данные вопроса}, повторы внутри файла отбрасываются"""
+        reader = csv.reader(lines, delimiter=';')
+        if has_header:
+            next(reader, None)
+
+        rows = {}
+        for row_num, row in enumerate(reader, start=2 if has_header else 1):
+            # Пустые строки пропускаются
+            if not row or all(str(cell).strip() == '' for cell in row):
+                continue
+            if len(row) < 6:
+                self.errors.append(f"Строка {row_num}: ожидается 6 столбцов, получено {len(row)}")
+                continue
+            text, option_1, option_2, option_3, option_4 = (cell.strip() for cell in row[:5])
+            try:
+                correct_option = int(row[5])
+            except (ValueError, TypeError):
+                correct_option = None
+            if correct_option not in (1, 2, 3, 4):
+                self.errors.append(f"Строка {row_num}: номер правильного ответа должен быть от 1 до 4")
+                continue
+            if not text:
+                self.errors.append(f"Строка {row_num}: пустой текст вопроса")
+                continue
+
+            content_hash = question_content_hash(text, option_1, option_2, option_3, option_4)
+            if content_hash in rows:
+                self.counts['duplicates'] += 1
+                continue
+            rows[content_hash] = {
+                'text': text,
+                'option_1': option_1,
+                'option_2': option_2,
+                'option_3': option_3,
+                'option_4': option_4,
+                'correct_option': correct_option,
+            }
+        return rows
+
+    def run(self, lines, has_header=True):
+        rows = self.parse(lines, has_header)
+        if not rows:
+            return self.counts
+
+        # Хэши вопросов набора одним запросом; поля для сравнения нужны только при обновлении
+        fields = ['id', 'content_hash', *QUESTION_UPDATE_FIELDS] if self.update_existing else ['id', 'content_hash']
+        existing = {
+            question.content_hash: question
+            for question in Question.objects.filter(question_set=self.question_set).only(*fields)
+        }
+
+        to_create = []
+        to_update = []
+        for content_hash, data in rows.items():
+            question = existing.get(content_hash)
+            if question is None:
+                to_create.append(Question(question_set=self.question_set, content_hash=content_hash, **data))
+            elif self.update_existing and any(getattr(question, field) != value for field, value in data.items()):
+                for field, value in data.items():
+                    setattr(question, field, value)
+                to_update.append(question)
+            else:
+                self.counts['skipped'] += 1
+
+        with transaction.atomic():
+            Question.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+            Question.objects.bulk_update(to_update, QUESTION_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+
+        # bulk_create/bulk_update не отправляют сигналы, кэш сбрасывается явно
+        if to_create or to_update:
+            invalidate_question_pools()
+        for question in to_update:
+            invalidate_question_content(question.pk)
+
+        self.counts['created'] = len(to_create)
+        self.counts['updated'] = len(to_update)
+        return self.counts
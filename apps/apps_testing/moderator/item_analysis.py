@@ -0,0 +1,164 @@
+"""
+Анализ качества заданий (item analysis) для теста или набора вопросов.
+
+Ответы загружаются одним запросом и раскладываются в матрицу сессия × вопрос,
+все показатели считаются векторно на NumPy:
+- индекс трудности - доля правильных ответов на вопрос;
+- точечно-бисериальная корреляция ответа на вопрос с общим баллом сессии (дискриминативность);
+- частоты выбора вариантов option_1..option_4 и пропусков;
+- надежность теста по формуле Кьюдера-Ричардсона (KR-20).
+
+Вопрос считается показанным в сессии, если он есть в порядке вопросов сессии
+(TestSession.selected_questions['order']); вопрос без сохраненного ответа считается
+пропущенным. Так как вопросы в сессиях выбираются случайно, матрица может быть неполной: показатели
+вопроса считаются только по сессиям, где он был показан, а KR-20 - по среднему числу
+вопросов в сессии (для полной матрицы совпадает с классической формулой).
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from apps.apps_testing.tests.models import Question, TestSession, UserAnswer
+
+
+class ItemAnalysisError(Exception):
+    """Ошибка при расчете анализа заданий"""
+    pass
+
+
+def load_responses(test=None, question_set=None, start_date=None, end_date=None):
+    """
+    Показанные вопросы сессий с результатом: список кортежей
+    (session_id, question_id, selected_option, correct_option), selected_option = None
+    для пропущенного вопроса. Три запроса: сессии, ответы, правильные варианты.
+    """
+    sessions = TestSession.objects.filter(result__isnull=False)
+    if test is not None:
+        sessions = sessions.filter(test=test)
+    if start_date:
+        sessions = sessions.filter(result__created_at__date__gte=start_date)
+    if end_date:
+        sessions = sessions.filter(result__created_at__date__lte=end_date)
+
+    answers = UserAnswer.objects.filter(session__in=sessions)
+    questions = Question.objects.all()
+    if question_set is not None:
+        answers = answers.filter(question__question_set=question_set)
+        questions = questions.filter(question_set=question_set)
+
+    orders = list(sessions.values_list('id', 'selected_questions'))
+    selected = {
+        (session_id, question_id): selected_option
+        for session_id, question_id, selected_option in answers.values_list('session_id', 'question_id', 'selected_option')
+    }
+    presented = []
+    for session_id, selected_questions in orders:
+        for question_id in (selected_questions or {}).get('order', []):
+            presented.append((session_id, int(question_id)))
+    # Ответы на вопросы, которых нет в порядке сессии (например, порядок изменен вручную)
+    presented_keys = set(presented)
+    presented.extend(key for key in selected if key not in presented_keys)
+
+    # Удаленные вопросы и вопросы других наборов отбрасываются
+    correct_options = dict(
+        questions.filter(id__in={question_id for _, question_id in presented}).values_list('id', 'correct_option')
+    )
+    return [
+        (session_id, question_id, selected.get((session_id, question_id)), correct_options[question_id])
+        for session_id, question_id in presented
+        if question_id in correct_options
+    ]
+
+
+def analyze_items(responses):
+    """
+    Считает показатели по списку ответов (см. load_responses).
+
+    Возвращает словарь:
+        sessions - количество сессий;
+        kr20 - надежность KR-20 (None, если посчитать нельзя);
+        items - список показателей по вопросам: question_id, presented, difficulty,
+                discrimination, option_frequencies (доли вариантов 1..4), skipped_rate.
+    """
+    if np is None:
+        raise ItemAnalysisError(
+            "Библиотека numpy не установлена. "
+            "Установите её: pip install numpy"
+        )
+    if not responses:
+        return {'sessions': 0, 'kr20': None, 'items': []}
+
+    data = np.array(
+        [(s, q, opt or 0, correct) for s, q, opt, correct in responses],
+        dtype=np.int64,
+    )
+    # Номера вариантов вне 1..4 (ответы, сохраненные до проверки на сервере) считаются пропуском
+    data[:, 2] = np.where((data[:, 2] >= 1) & (data[:, 2] <= 4), data[:, 2], 0)
+    session_ids, rows = np.unique(data[:, 0], return_inverse=True)
+    question_ids, cols = np.unique(data[:, 1], return_inverse=True)
+    n_sessions, n_items = len(session_ids), len(question_ids)
+
+    presented = np.zeros((n_sessions, n_items), dtype=bool)
+    presented[rows, cols] = True
+    scores = np.zeros((n_sessions, n_items), dtype=np.float64)
+    scores[rows, cols] = data[:, 2] == data[:, 3]
+
+    # Частоты вариантов: 0 - пропуск, 1..4 - выбранный вариант
+    option_counts = np.zeros((n_items, 5), dtype=np.int64)
+    np.add.at(option_counts, (cols, data[:, 2]), 1)
+
+    presented_count = presented.sum(axis=0)
+    difficulty = scores.sum(axis=0) / presented_count
+    totals = scores.sum(axis=1)
+
+    # Точечно-бисериальная корреляция по сессиям, где вопрос был показан
+    mask = presented.astype(np.float64)
+    mean_total = (mask * totals[:, None]).sum(axis=0) / presented_count
+    centered_total = (totals[:, None] - mean_total) * mask
+    centered_score = (scores - difficulty) * mask
+    covariance = (centered_total * centered_score).sum(axis=0)
+    denominator = np.sqrt((centered_total ** 2).sum(axis=0) * (centered_score ** 2).sum(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = np.where(denominator > 0, covariance / denominator, np.nan)
+
+    # KR-20 по среднему числу вопросов в сессии
+    kr20 = None
+    items_per_session = presented.sum(axis=1).mean()
+    total_variance = totals.var()
+    if n_sessions > 1 and items_per_session > 1 and total_variance > 0:
+        item_variance = (difficulty * (1 - difficulty)).mean() * items_per_session
+        kr20 = float(items_per_session / (items_per_session - 1) * (1 - item_variance / total_variance))
+
+    frequencies = option_counts / presented_count[:, None]
+    items = []
+    for index, question_id in enumerate(question_ids):
+        items.append({
+            'question_id': int(question_id),
+            'presented': int(presented_count[index]),
+            'difficulty': float(difficulty[index]),
+            'discrimination': None if np.isnan(discrimination[index]) else float(discrimination[index]),
+            'option_frequencies': [float(value) for value in frequencies[index, 1:]],
+            'skipped_rate': float(frequencies[index, 0]),
+        })
+    return {'sessions': n_sessions, 'kr20': kr20, 'items': items}
+
+
+def item_analysis_report(test=None, question_set=None, start_date=None, end_date=None):
+    """Анализ заданий с текстами вопросов для отображения модератору."""
+    report = analyze_items(load_responses(test, question_set, start_date, end_date))
+    questions = Question.objects.select_related('question_set').in_bulk(
+        [item['question_id'] for item in report['items']]
+    )
+    for item in report['items']:
+        question = questions[item['question_id']]
+        item['question'] = question
+        item['options'] = [
+            {'text': text, 'frequency': frequency, 'is_correct': number == question.correct_option}
+            for number, (text, frequency) in enumerate(
+                zip([question.option_1, question.option_2, question.option_3, question.option_4], item['option_frequencies']),
+                start=1,
+            )
+        ]
+    report['items'].sort(key=lambda item: item['difficulty'])
+    return report
@@ -0,0 +1,135 @@
+"""
+Экспорт результатов тестирования в PDF.
+
+- HTML отчетов готовится в процессе запроса (шаблон и данные из БД),
+  PDF рендерится WeasyPrint в пуле процессов (pdf_render, запуск через spawn);
+  таблица стилей разбирается один раз на процесс и переиспользуется.
+- Готовые PDF кэшируются на диске (вне MEDIA_ROOT) по id результата и
+  TestResult.created_at, поэтому повторная выгрузка (в том числе одиночная)
+  не рендерит файл заново; при удалении результата его PDF удаляются.
+- Пакетная выгрузка отдается zip-архивом в потоковом режиме; число результатов
+  в одной выгрузке ограничено RESULT_PDF_BATCH_LIMIT.
+"""
+import multiprocessing
+import os
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from apps.apps_testing.tests.models import UserAnswer
+from .pdf_render import init_worker, render_to_file
+
+
+PDF_STYLESHEET_PATH = str(settings.BASE_DIR / 'static/css/pdf_styles.css')
+PDF_CACHE_DIR = Path(getattr(settings, 'RESULT_PDF_CACHE_DIR', settings.BASE_DIR / 'var' / 'result_pdf'))
+PDF_BATCH_LIMIT = getattr(settings, 'RESULT_PDF_BATCH_LIMIT', 500)
+PDF_EXPORT_WORKERS = getattr(settings, 'RESULT_PDF_EXPORT_WORKERS', None) or os.cpu_count() or 1
+
+def cache_path(result):
+    """Путь к PDF в кэше: меняется, если результат был пересоздан."""
+    return PDF_CACHE_DIR / f'result_{result.pk}_{result.created_at:%Y%m%d%H%M%S%f}.pdf'
+
+
+def delete_cached_pdfs(result_pk):
+    """Удаляет из кэша все PDF результата (в том числе для прежних created_at)."""
+    for path in PDF_CACHE_DIR.glob(f'result_{result_pk}_*.pdf'):
+        path.unlink(missing_ok=True)
+
+
+def download_name(result):
+    return f'result_{result.pk}.pdf'
+
+
+def render_result_html(result, incorrect_answers):
+    return render_to_string('apps_testing/pdf/test_result_report.html', {
+        'result': result,
+        'incorrect_answers': incorrect_answers,
+        'incorrect_answers_count': result.answered_questions - result.correct_answers,
+    })
+
+
+def get_result_pdf_path(result):
+    """Путь к PDF результата; при отсутствии в кэше рендерит его в текущем процессе."""
+    path = cache_path(result)
+    if not path.exists():
+        incorrect_answers = result.session.answers.filter(is_correct=False).select_related('question')
+        render_to_file(render_result_html(result, incorrect_answers), path, PDF_STYLESHEET_PATH)
+    return path
+
+
+def _pending_renders(results):
+    """HTML для результатов, которых нет в кэше. Неправильные ответы загружаются одним запросом."""
+    missing = [result for result in results if not cache_path(result).exists()]
+    if not missing:
+        return []
+
+    incorrect_answers = defaultdict(list)
+    answers = UserAnswer.objects.filter(
+        session_id__in=[result.session_id for result in missing], is_correct=False
+    ).select_related('question').order_by('pk')
+    for answer in answers:
+        incorrect_answers[answer.session_id].append(answer)
+
+    return [
+        (result, render_result_html(result, incorrect_answers[result.session_id]))
+        for result in missing
+    ]
+
+
+class _StreamBuffer:
+    """Буфер для zipfile, содержимое которого забирается по частям при потоковой отдаче."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_results_zip(results):
+    """
+    Генератор zip-архива с PDF результатов для StreamingHttpResponse.
+    Закэшированные PDF отдаются сразу, остальные - по мере готовности в пуле процессов.
+    """
+    results = list(results)
+    pending = _pending_renders(results)
+    pending_ids = {result.pk for result, _ in pending}
+
+    buffer = _StreamBuffer()
+    # PDF уже сжат, поэтому файлы добавляются без сжатия
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for result in results:
+            if result.pk not in pending_ids:
+                archive.write(cache_path(result), download_name(result))
+                yield buffer.pop()
+
+        if pending:
+            workers = min(PDF_EXPORT_WORKERS, len(pending))
+            # Воркеры запускаются через spawn: fork многопоточного процесса веб-сервера небезопасен
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(PDF_STYLESHEET_PATH,),
+            ) as executor:
+                futures = {
+                    executor.submit(render_to_file, html_string, str(cache_path(result)), PDF_STYLESHEET_PATH): result
+                    for result, html_string in pending
+                }
+                for future in as_completed(futures):
+                    archive.write(future.result(), download_name(futures[future]))
+                    yield buffer.pop()
+    yield buffer.pop()
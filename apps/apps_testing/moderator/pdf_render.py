@@ -0,0 +1,42 @@
+"""
+Рендеринг PDF через WeasyPrint для экспорта результатов (см. pdf_export).
+
+Модуль не зависит от Django и импортирует WeasyPrint только при рендеринге:
+функции выполняются в воркерах пула, запущенных через spawn (без копирования
+состояния многопоточного процесса веб-сервера), а импорт приложения не требует
+установленного WeasyPrint.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+
+# Разобранная таблица стилей текущего процесса (запроса или воркера пула)
+_stylesheet = None
+_stylesheet_path = None
+
+
+def _get_stylesheet(stylesheet_path):
+    global _stylesheet, _stylesheet_path
+    if _stylesheet is None or _stylesheet_path != stylesheet_path:
+        from weasyprint import CSS
+        _stylesheet = CSS(filename=stylesheet_path)
+        _stylesheet_path = stylesheet_path
+    return _stylesheet
+
+
+def init_worker(stylesheet_path):
+    """Инициализация воркера пула: стили разбираются один раз на процесс."""
+    _get_stylesheet(stylesheet_path)
+
+
+def render_to_file(html_string, path, stylesheet_path):
+    """Рендерит PDF и атомарно записывает его в кэш."""
+    from weasyprint import HTML
+    pdf_file = HTML(string=html_string).write_pdf(stylesheets=[_get_stylesheet(stylesheet_path)])
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as tmp:
+        tmp.write(pdf_file)
+    os.replace(tmp.name, path)
+    return str(path)
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.apps_testing.tests.models import TestResult
+from .pdf_export import delete_cached_pdfs
+
+
+@receiver(post_delete, sender=TestResult)
+def delete_result_pdfs(sender, instance, **kwargs):
+    """Удаление PDF результата из кэша после фиксации транзакции удаления"""
+    result_pk = instance.pk
+    transaction.on_commit(lambda: delete_cached_pdfs(result_pk))
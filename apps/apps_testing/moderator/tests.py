@@ -1,3 +1,63 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from apps.apps_testing.tests.models import QuestionSet, Question, Test, TestSession, UserAnswer
+from .item_analysis import analyze_items
+
+
+class ItemAnalysisTests(SimpleTestCase):
+    """Расчет показателей заданий по ответам"""
+
+    def test_out_of_range_options_count_as_skipped(self):
+        # (session_id, question_id, selected_option, correct_option)
+        responses = [
+            (1, 10, 1, 1),
+            (2, 10, 7, 1),
+            (3, 10, -1, 1),
+            (4, 10, None, 1),
+            (1, 11, 2, 2),
+            (2, 11, 3, 2),
+            (3, 11, 2, 2),
+            (4, 11, 4, 2),
+        ]
+
+        report = analyze_items(responses)
+
+        first = report['items'][0]
+        self.assertEqual(first['question_id'], 10)
+        self.assertEqual(first['presented'], 4)
+        self.assertEqual(first['difficulty'], 0.25)
+        self.assertEqual(first['option_frequencies'], [0.25, 0.0, 0.0, 0.0])
+        self.assertEqual(first['skipped_rate'], 0.75)
+
+
+class SaveAnswerValidationTests(TestCase):
+    """Номер варианта ответа проверяется при сохранении"""
+
+    def setUp(self):
+        question_set = QuestionSet.objects.create(title='Набор', description='Набор')
+        self.question = Question.objects.create(
+            question_set=question_set, text='Вопрос', option_1='1', option_2='2', option_3='3', option_4='4',
+            correct_option=1,
+        )
+        test = Test.objects.create(title='Тест', password='x', time_limit=30, questions_per_set=1)
+        self.session = TestSession.objects.create(
+            test=test, first_name='Иван', last_name='Иванов', session_key='key', start_time=timezone.now(),
+            selected_questions={'order': [self.question.pk]},
+        )
+        client_session = self.client.session
+        client_session['test_session_id'] = self.session.pk
+        client_session.save()
+
+    def test_out_of_range_option_is_rejected(self):
+        url = reverse('testing:ajax_save_answer')
+        for selected_option in ('5', '0', '-1'):
+            with self.subTest(selected_option=selected_option):
+                response = self.client.post(url, {'question_id': self.question.pk, 'selected_option': selected_option})
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserAnswer.objects.exists())
+
+        response = self.client.post(url, {'question_id': self.question.pk, 'selected_option': '4'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserAnswer.objects.get().selected_option, 4)
@@ -32,7 +32,9 @@ urlpatterns = [
     path('results/', views.ResultListView.as_view(), name='result_list'),
     path('results/<int:pk>/delete/', views.ResultDeleteView.as_view(), name='result_delete'),
     path('results/<int:result_id>/pdf/', views.export_result_pdf, name='export_pdf'),
+    path('results/pdf/', views.ResultPDFBatchExportView.as_view(), name='export_pdf_batch'),
 
     # Analytics
     path('analytics/question-errors/', views.QuestionErrorAnalyticsView.as_view(), name='question_error_analytics'),
+    path('analytics/item-analysis/', views.ItemAnalysisView.as_view(), name='item_analysis'),
 ]
@@ -1,18 +1,22 @@
 # apps_testing/moderator/views.py
+import io
 import logging
 
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, DetailView
+from django.contrib import messages
 from django.contrib.auth.views import LoginView
-from django.http import HttpResponse
-from django.db.models import Count
-from django.template.loader import render_to_string
-from weasyprint import HTML, CSS
-from django.conf import settings
-
-from apps.apps_testing.tests.models import Test, QuestionSet, Question, TestResult, UserAnswer
-from .forms import TestForm, QuestionSetForm, QuestionForm, ModeratorLoginForm, QuestionErrorAnalyticsForm, ResultsFilterForm
+from django.http import FileResponse, StreamingHttpResponse
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.views import View
+
+from apps.apps_testing.tests.models import Test, QuestionSet, Question, TestResult, QuestionDailyStats
+from .forms import TestForm, QuestionSetForm, QuestionForm, ModeratorLoginForm, QuestionErrorAnalyticsForm, ResultsFilterForm, ItemAnalysisForm
+from .importers import QuestionCSVImporter, decode_csv
+from .item_analysis import item_analysis_report, ItemAnalysisError
+from .pdf_export import get_result_pdf_path, download_name, iter_results_zip, PDF_BATCH_LIMIT
 from .mixins import ModeratorRequiredMixin, LogCreateUpdateMixin, LogDeleteMixin
 
 
@@ -39,65 +43,49 @@ class QuestionSetListView(ModeratorRequiredMixin, ListView):
     context_object_name = 'qsets'
 
 
-class QuestionSetCreateView(ModeratorRequiredMixin, LogCreateUpdateMixin, CreateView):
-    model = QuestionSet
-    form_class = QuestionSetForm
-    template_name = 'apps_testing/moderator/question_set_form.html'
-    success_url = reverse_lazy('moderator:qset_list')
+class QuestionCSVImportMixin:
+    """Импорт вопросов из CSV, приложенного к форме набора (создание и редактирование набора)"""
 
     def form_valid(self, form):
         response = super().form_valid(form)
         csv_file = form.cleaned_data.get('csv_file')
-        has_header = form.cleaned_data.get('has_header')
         if csv_file:
-            import csv, io
-            content_bytes = csv_file.read()
-            try:
-                decoded = content_bytes.decode('utf-8-sig')
-            except UnicodeDecodeError:
-                try:
-                    decoded = content_bytes.decode('cp1251')
-                except UnicodeDecodeError:
-                    decoded = content_bytes.decode('utf-8', errors='ignore')
-            reader = csv.reader(io.StringIO(decoded), delimiter=';')
-            if has_header:
-                try:
-                    next(reader)
-                except StopIteration:
-                    reader = []
-
-            created = 0
-            for row in reader:
-                # Skip empty lines
-                if not row or all((str(cell).strip() == '' for cell in row)):
-                    continue
-                if len(row) < 6:
-                    continue
-                question_text = row[0].strip()
-                option_1 = row[1].strip()
-                option_2 = row[2].strip()
-                option_3 = row[3].strip()
-                option_4 = row[4].strip()
-                try:
-                    correct_option = int(row[5])
-                except (ValueError, TypeError):
-                    continue
-                if correct_option not in (1, 2, 3, 4):
-                    continue
-                Question.objects.create(
-                    question_set=self.object,
-                    text=question_text,
-                    option_1=option_1,
-                    option_2=option_2,
-                    option_3=option_3,
-                    option_4=option_4,
-                    correct_option=correct_option,
+            importer = QuestionCSVImporter(self.object, update_existing=form.cleaned_data.get('update_existing'))
+            counts = importer.run(io.StringIO(decode_csv(csv_file.read())), has_header=form.cleaned_data.get('has_header'))
+            logger = logging.getLogger('moderator_actions')
+            logger.info(
+                f"Модератор '{self.request.user.username}' импортировал вопросы в набор '{self.object}': "
+                f"добавлено {counts['created']}, обновлено {counts['updated']}, пропущено {counts['skipped']}, "
+                f"повторов в файле {counts['duplicates']}, ошибок {len(importer.errors)}"
+            )
+
+            if counts['created'] or counts['updated']:
+                messages.success(
+                    self.request,
+                    f"Импорт вопросов: добавлено {counts['created']}, обновлено {counts['updated']}"
+                )
+            if counts['skipped'] or counts['duplicates']:
+                messages.info(
+                    self.request,
+                    f"Пропущено существующих вопросов: {counts['skipped']}, повторов в файле: {counts['duplicates']}"
                 )
-                created += 1
+            errors = importer.errors
+            if errors:
+                for error in errors[:20]:
+                    messages.warning(self.request, error)
+                if len(errors) > 20:
+                    messages.warning(self.request, f'... и еще {len(errors) - 20} ошибок')
         return response
 
 
-class QuestionSetUpdateView(ModeratorRequiredMixin, LogCreateUpdateMixin, UpdateView):
+class QuestionSetCreateView(ModeratorRequiredMixin, LogCreateUpdateMixin, QuestionCSVImportMixin, CreateView):
+    model = QuestionSet
+    form_class = QuestionSetForm
+    template_name = 'apps_testing/moderator/question_set_form.html'
+    success_url = reverse_lazy('moderator:qset_list')
+
+
+class QuestionSetUpdateView(ModeratorRequiredMixin, LogCreateUpdateMixin, QuestionCSVImportMixin, UpdateView):
     model = QuestionSet
     form_class = QuestionSetForm
     template_name = 'apps_testing/moderator/question_set_form.html'
@@ -196,6 +184,35 @@ class TestDeleteView(ModeratorRequiredMixin, LogDeleteMixin, DeleteView):
 
 
 # --- Управление Результатами ---
+def filter_results(queryset, form):
+    """Фильтрует результаты по форме ResultsFilterForm (список результатов и пакетный экспорт в PDF)."""
+    if form.is_valid():
+        date_from = form.cleaned_data.get('date_from')
+        date_to = form.cleaned_data.get('date_to')
+        participant = form.cleaned_data.get('participant')
+        test = form.cleaned_data.get('test')
+        ip_address = form.cleaned_data.get('ip_address')
+        department = form.cleaned_data.get('department')
+
+        if date_from:
+            queryset = queryset.filter(created_at__date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(created_at__date__lte=date_to)
+        if participant:
+            queryset = queryset.filter(
+                session__last_name__icontains=participant
+            ) | queryset.filter(
+                session__first_name__icontains=participant
+            )
+        if test:
+            queryset = queryset.filter(session__test=test)
+        if ip_address:
+            queryset = queryset.filter(session__ip_address__icontains=ip_address)
+        if department:
+            queryset = queryset.filter(session__department=department)
+    return queryset
+
+
 class ResultListView(ModeratorRequiredMixin, ListView):
     model = TestResult
     template_name = 'apps_testing/moderator/result_list.html'
@@ -204,32 +221,7 @@ class ResultListView(ModeratorRequiredMixin, ListView):
 
     def get_queryset(self):
         queryset = super().get_queryset().select_related('session', 'session__test')
-        form = ResultsFilterForm(self.request.GET or None)
-        if form.is_valid():
-            date_from = form.cleaned_data.get('date_from')
-            date_to = form.cleaned_data.get('date_to')
-            participant = form.cleaned_data.get('participant')
-            test = form.cleaned_data.get('test')
-            ip_address = form.cleaned_data.get('ip_address')
-            department = form.cleaned_data.get('department')
-
-            if date_from:
-                queryset = queryset.filter(created_at__date__gte=date_from)
-            if date_to:
-                queryset = queryset.filter(created_at__date__lte=date_to)
-            if participant:
-                queryset = queryset.filter(
-                    session__last_name__icontains=participant
-                ) | queryset.filter(
-                    session__first_name__icontains=participant
-                )
-            if test:
-                queryset = queryset.filter(session__test=test)
-            if ip_address:
-                queryset = queryset.filter(session__ip_address__icontains=ip_address)
-            if department:
-                queryset = queryset.filter(session__department=department)
-        return queryset
+        return filter_results(queryset, ResultsFilterForm(self.request.GET or None))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -246,20 +238,10 @@ class ResultDeleteView(ModeratorRequiredMixin, LogDeleteMixin, DeleteView):
 # --- Экспорт в PDF ---
 def export_result_pdf(request, result_id):
     result = get_object_or_404(TestResult.objects.select_related('session__test'), pk=result_id)
-    incorrect_answers = result.session.answers.filter(is_correct=False).select_related('question')
-    incorrect_answers_count = result.answered_questions - result.correct_answers
+    pdf_path = get_result_pdf_path(result)
 
-    html_string = render_to_string('apps_testing/pdf/test_result_report.html', {
-        'result': result,
-        'incorrect_answers': incorrect_answers,
-        'incorrect_answers_count': incorrect_answers_count,
-    })
-
-    css = CSS(settings.BASE_DIR / 'static/css/pdf_styles.css')
-    pdf_file = HTML(string=html_string).write_pdf(stylesheets=[css])
-
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="result_{result.id}.pdf"'
+    response = FileResponse(open(pdf_path, 'rb'), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{download_name(result)}"'
 
     logger = logging.getLogger('moderator_actions')
     logger.info(f"Модератор '{request.user.username}' экспортировал в PDF результат {result.id}")
@@ -267,6 +249,51 @@ def export_result_pdf(request, result_id):
     return response
 
 
+class ResultPDFBatchExportView(ModeratorRequiredMixin, View):
+    """
+    Пакетный экспорт результатов в PDF одним zip-архивом.
+    POST - отмеченные в списке результаты (result_ids), GET - результаты по фильтру списка
+    (требуется хотя бы одно условие фильтра). Не более PDF_BATCH_LIMIT результатов за раз.
+    """
+
+    def get(self, request):
+        form = ResultsFilterForm(request.GET or None)
+        if not form.is_valid() or not any(form.cleaned_data.values()):
+            messages.error(request, 'Для выгрузки PDF по фильтру задайте хотя бы одно условие фильтра.')
+            return self._back_to_list(request.GET.urlencode())
+        queryset = TestResult.objects.select_related('session', 'session__test').order_by('-created_at')
+        return self._export(request, filter_results(queryset, form), request.GET.urlencode())
+
+    def post(self, request):
+        next_query = request.POST.get('next_query', '')
+        result_ids = [value for value in request.POST.getlist('result_ids') if value.isdigit()]
+        if not result_ids:
+            return self._back_to_list(next_query)
+        queryset = TestResult.objects.select_related('session', 'session__test').filter(pk__in=result_ids)
+        return self._export(request, queryset.order_by('-created_at'), next_query)
+
+    def _back_to_list(self, query):
+        return redirect(f"{reverse('moderator:result_list')}?{query}")
+
+    def _export(self, request, queryset, next_query):
+        # Берется на один результат больше лимита, чтобы не считать все результаты отдельным запросом
+        results = list(queryset[:PDF_BATCH_LIMIT + 1])
+        if len(results) > PDF_BATCH_LIMIT:
+            messages.error(
+                request,
+                f'Слишком много результатов для выгрузки PDF: не более {PDF_BATCH_LIMIT} за раз. Уточните фильтр.'
+            )
+            return self._back_to_list(next_query)
+
+        response = StreamingHttpResponse(iter_results_zip(results), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="results_{timezone.localtime():%Y%m%d_%H%M}.zip"'
+
+        logger = logging.getLogger('moderator_actions')
+        logger.info(f"Модератор '{request.user.username}' экспортировал в PDF результаты: {len(results)} шт.")
+
+        return response
+
+
 class QuestionErrorAnalyticsView(ModeratorRequiredMixin, TemplateView):
     template_name = 'apps_testing/moderator/question_error_analytics.html'
 
@@ -281,42 +308,50 @@ class QuestionErrorAnalyticsView(ModeratorRequiredMixin, TemplateView):
             qset = form.cleaned_data['question_set']
             include_all_sets = form.cleaned_data.get('include_all_sets')
 
-            # Получаем все результаты (как в ResultListView)
-            # Это определяет, какие сессии имеют результаты и доступны в списке результатов
-            results_queryset = TestResult.objects.select_related('session', 'session__test')
-            
-            # Получаем ID всех сессий, которые имеют результаты
-            # Только ответы из этих сессий будут учитываться в аналитике
-            session_ids_with_results = list(results_queryset.values_list('session_id', flat=True))
-            
-            # Если нет сессий с результатами, возвращаем пустой список
-            if not session_ids_with_results:
-                context['form'] = form
-                context['rankings'] = []
-                return context
-
-            # Фильтруем ответы только из сессий, которые имеют результаты
-            answers = UserAnswer.objects.filter(
-                answered_at__date__gte=start,
-                answered_at__date__lte=end,
-                is_correct=False,
-                session_id__in=session_ids_with_results,  # Фильтруем только сессии с результатами
-            ).select_related('question', 'session__test', 'question__question_set')
+            # Статистика предагрегирована по дням (QuestionDailyStats) и содержит только
+            # ответы из сессий с результатами; ошибкой считается неправильный или пустой ответ
+            stats = QuestionDailyStats.objects.filter(date__gte=start, date__lte=end)
 
             if test:
-                answers = answers.filter(session__test=test)
+                stats = stats.filter(test=test)
                 if include_all_sets:
                     # Limit to any question set attached to the selected test
-                    answers = answers.filter(question__question_set__in=test.question_sets.all())
+                    stats = stats.filter(question__question_set__in=test.question_sets.all())
             if qset and not include_all_sets:
-                answers = answers.filter(question__question_set=qset)
+                stats = stats.filter(question__question_set=qset)
 
             rankings = (
-                answers.values('question_id', 'question__text', 'question__question_set__title')
-                .annotate(incorrect_count=Count('id'))
+                stats.values('question_id', 'question__text', 'question__question_set__title')
+                .annotate(incorrect_count=Sum(F('incorrect') + F('skipped')))
+                .filter(incorrect_count__gt=0)
                 .order_by('-incorrect_count', 'question_id')
             )
 
         context['form'] = form
         context['rankings'] = rankings
         return context
+
+
+class ItemAnalysisView(ModeratorRequiredMixin, TemplateView):
+    """Анализ заданий: трудность, дискриминативность, частоты вариантов и KR-20"""
+    template_name = 'apps_testing/moderator/item_analysis.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = ItemAnalysisForm(self.request.GET or None)
+        report = None
+        error = None
+        if form.is_valid():
+            try:
+                report = item_analysis_report(
+                    test=form.cleaned_data['test'],
+                    question_set=form.cleaned_data['question_set'],
+                    start_date=form.cleaned_data['start_date'],
+                    end_date=form.cleaned_data['end_date'],
+                )
+            except ItemAnalysisError as e:
+                error = str(e)
+        context['form'] = form
+        context['report'] = report
+        context['error'] = error
+        return context
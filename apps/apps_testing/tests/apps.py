@@ -5,3 +5,6 @@ from django.apps import AppConfig
 class TestsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.apps_testing.tests'
+
+    def ready(self):
+        import apps.apps_testing.tests.signals  # noqa
@@ -0,0 +1,83 @@
+"""
+Завершение сессий тестирования, время которых истекло.
+
+Сессия с истекшим лимитом времени раньше подсчитывалась только при следующем
+запросе тестируемого; брошенные сессии оставались без результата. Команда
+находит такие сессии и подсчитывает результаты пачками.
+
+Сессии без времени начала (тест не открывался) не завершаются: отсчет времени
+для них еще не начат, см. expired_sessions.
+
+Пример:
+    python manage.py finalize_expired_sessions
+    python manage.py finalize_expired_sessions --loop --interval 30
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.utils import timezone
+
+from apps.apps_testing.tests.utils import expired_sessions, calculate_results_for_sessions
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Подсчитывает результаты незавершенных сессий тестирования с истекшим временем'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Количество сессий в одной пачке')
+        parser.add_argument('--loop', action='store_true', help='Работать непрерывно, проверяя сессии с интервалом')
+        parser.add_argument('--interval', type=int, default=60, help='Интервал между проверками в режиме --loop (секунды)')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self._sweep(options['batch_size'])
+            return
+
+        try:
+            while True:
+                try:
+                    self._sweep(options['batch_size'])
+                except DatabaseError as e:
+                    # Ошибка одной проверки (блокировка, конфликт с параллельным подсчетом) не останавливает цикл:
+                    # пачка откатывается целиком и будет обработана при следующей проверке
+                    logger.exception('Ошибка при завершении истекших сессий')
+                    self.stderr.write(f'Ошибка при завершении истекших сессий: {e}')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено.')
+
+    def _sweep(self, batch_size):
+        started = time.perf_counter()
+        now = timezone.now()
+        finalized = 0
+        batches = 0
+
+        while True:
+            batch = list(
+                expired_sessions(now).select_related('test')
+                .only('id', 'start_time', 'selected_questions', 'test__time_limit')
+                .order_by('start_time')[:batch_size]
+            )
+            if not batch:
+                break
+            created = calculate_results_for_sessions(batch)
+            finalized += created
+            batches += 1
+            # Полная пачка без новых результатов (например, сессии уже подсчитаны другим процессом
+            # и только отмечены завершенными) - остаток обрабатывается следующей проверкой
+            if len(batch) < batch_size or not created:
+                break
+
+        elapsed = time.perf_counter() - started
+        if not finalized:
+            self.stdout.write(f'{now:%Y-%m-%d %H:%M:%S}: истекших сессий нет')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{now:%Y-%m-%d %H:%M:%S}: завершено сессий: {finalized} за {elapsed:.2f} с '
+            f'({finalized / elapsed:.0f} сессий/с, пачек: {batches})'
+        ))
@@ -0,0 +1,25 @@
+"""
+Полный пересчет статистики вопросов по дням (QuestionDailyStats).
+
+В обычном режиме статистика пополняется при подсчете результатов сессии;
+команда нужна после ручных правок ответов или правильных вариантов вопросов.
+
+Пример:
+    python manage.py rebuild_question_stats
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.apps_testing.tests.utils import rebuild_question_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику ответов на вопросы по дням для аналитики модератора'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = rebuild_question_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Статистика пересчитана: {created} строк за {time.perf_counter() - started:.2f} с'
+        ))
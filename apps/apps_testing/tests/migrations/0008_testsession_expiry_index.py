@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0007_alter_testsession_start_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['test', 'start_time'], name='tests_session_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+import apps.apps_testing.tests.models
+
+
+generate_session_seed = apps.apps_testing.tests.models.generate_session_seed
+
+
+def fill_session_seeds(apps, schema_editor):
+    """Каждой существующей сессии - собственное зерно (default вычислился бы один раз на все строки)"""
+    TestSession = apps.get_model('tests', 'TestSession')
+    sessions = list(TestSession.objects.only('id'))
+    for session in sessions:
+        session.seed = generate_session_seed()
+    TestSession.objects.bulk_update(sessions, ['seed'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0008_testsession_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='seed',
+            field=models.BigIntegerField(null=True, verbose_name='Зерно перемешивания'),
+        ),
+        migrations.RunPython(fill_session_seeds, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='testsession',
+            name='seed',
+            field=models.BigIntegerField(default=generate_session_seed, verbose_name='Зерно перемешивания'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+
+
+def fill_question_stats(apps, schema_editor):
+    """Начальное заполнение статистики по уже подсчитанным сессиям (как rebuild_question_stats)"""
+    UserAnswer = apps.get_model('tests', 'UserAnswer')
+    QuestionDailyStats = apps.get_model('tests', 'QuestionDailyStats')
+    rows = (
+        UserAnswer.objects.filter(session__result__isnull=False)
+        .annotate(date=TruncDate('answered_at'))
+        .values('question_id', 'date', test_id=F('session__test_id'))
+        .annotate(
+            attempts=Count('id', filter=Q(selected_option__isnull=False)),
+            incorrect=Count('id', filter=Q(selected_option__isnull=False, is_correct=False)),
+            skipped=Count('id', filter=Q(selected_option__isnull=True)),
+        )
+        .order_by()
+    )
+    QuestionDailyStats.objects.bulk_create((QuestionDailyStats(**row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0009_testsession_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Количество ответов')),
+                ('incorrect', models.PositiveIntegerField(default=0, verbose_name='Количество неправильных ответов')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Количество пропусков')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tests.question', verbose_name='Вопрос')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_daily_stats', to='tests.test', verbose_name='Тест')),
+            ],
+            options={
+                'verbose_name': 'Статистика вопроса за день',
+                'verbose_name_plural': 'Статистика вопросов по дням',
+                'indexes': [models.Index(fields=['date'], name='tests_question_stats_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('question', 'test', 'date'), name='tests_question_daily_stats_unique')],
+            },
+        ),
+        migrations.RunPython(fill_question_stats, migrations.RunPython.noop),
+    ]
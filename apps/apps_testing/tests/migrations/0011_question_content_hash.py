@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:09
+
+from django.db import migrations, models
+
+import apps.apps_testing.tests.models
+
+
+question_content_hash = apps.apps_testing.tests.models.question_content_hash
+
+
+def fill_content_hashes(apps, schema_editor):
+    """Хэш содержимого для существующих вопросов (Question.save в миграции не вызывается)"""
+    Question = apps.get_model('tests', 'Question')
+    questions = list(Question.objects.only('id', 'text', 'option_1', 'option_2', 'option_3', 'option_4'))
+    for question in questions:
+        question.content_hash = question_content_hash(
+            question.text, question.option_1, question.option_2, question.option_3, question.option_4
+        )
+    Question.objects.bulk_update(questions, ['content_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0010_questiondailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хэш содержимого'),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['question_set', 'content_hash'], name='tests_question_hash_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
 # apps_testing/tests/models.py
+import hashlib
+import random
+import secrets
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -18,6 +22,17 @@ class QuestionSet(models.Model):
         verbose_name_plural = "Наборы вопросов"
 
 # 2. Модель Question (Вопрос)
+def normalize_question_part(value):
+    """Нормализация текста для сравнения вопросов: регистр, ё/е и пробелы не учитываются"""
+    return ' '.join((value or '').casefold().replace('ё', 'е').split())
+
+
+def question_content_hash(text, option_1, option_2, option_3, option_4):
+    """SHA-256 нормализованного текста вопроса и вариантов ответа (порядок вариантов учитывается)"""
+    parts = [normalize_question_part(part) for part in (text, option_1, option_2, option_3, option_4)]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
 class Question(models.Model):
     question_set = models.ForeignKey(QuestionSet, on_delete=models.CASCADE, related_name='questions', verbose_name="Набор вопросов")
     text = models.TextField(verbose_name="Текст вопроса")
@@ -26,15 +41,29 @@ class Question(models.Model):
     option_3 = models.CharField(max_length=500, verbose_name="Вариант ответа 3")
     option_4 = models.CharField(max_length=500, verbose_name="Вариант ответа 4")
     correct_option = models.IntegerField(choices=[(1, 'Вариант 1'), (2, 'Вариант 2'), (3, 'Вариант 3'), (4, 'Вариант 4')], verbose_name="Правильный ответ")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Хэш содержимого")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.text[:50]
 
+    def compute_content_hash(self):
+        return question_content_hash(self.text, self.option_1, self.option_2, self.option_3, self.option_4)
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content_hash' not in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
     class Meta:
         app_label = 'tests'
         verbose_name = "Вопрос"
         verbose_name_plural = "Вопросы"
+        indexes = [
+            models.Index(fields=['question_set', 'content_hash'], name='tests_question_hash_idx'),
+        ]
 
 # 3. Модель Test (Тест)
 class Test(models.Model):
@@ -56,6 +85,11 @@ class Test(models.Model):
         verbose_name = "Вопрос"
         verbose_name_plural = "Вопросы" 
 
+def generate_session_seed():
+    """Случайное зерно сессии для порядка вопросов и перестановки вариантов ответов."""
+    return secrets.randbits(62)
+
+
 # 4. Модель TestSession (Сессия тестирования)
 class TestSession(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='sessions')
@@ -70,10 +104,21 @@ class TestSession(models.Model):
     is_completed = models.BooleanField(default=False)
     selected_questions = models.JSONField(verbose_name="Список ID выбранных вопросов") # { 'order': [id1, id2, ...] }
     ip_address = models.CharField(max_length=45, null=True, blank=True, verbose_name="IP-адрес")
+    seed = models.BigIntegerField(default=generate_session_seed, verbose_name="Зерно перемешивания")
 
     def get_full_name(self):
         return f"{self.last_name} {self.first_name} {self.middle_name}".strip()
 
+    def option_order(self, question_id):
+        """
+        Порядок вариантов ответа, в котором вопрос показывается в этой сессии.
+        Зависит только от зерна сессии и ID вопроса, поэтому одинаков при каждой загрузке.
+        """
+        order = [1, 2, 3, 4]
+        random.Random(f'{self.seed}:{question_id}').shuffle(order)
+        return order
+
+
     def __str__(self):
         return f"Сессия {self.id} для {self.test.title} от {self.get_full_name()}"
 
@@ -81,6 +126,10 @@ class TestSession(models.Model):
         app_label = 'tests'
         verbose_name = "Сессия тестирования"
         verbose_name_plural = "Сессии тестирования"
+        indexes = [
+            # Поиск незавершенных сессий с истекшим временем (finalize_expired_sessions)
+            models.Index(fields=['test', 'start_time'], condition=models.Q(is_completed=False), name='tests_session_expiry_idx'),
+        ]
 
 # 5. Модель UserAnswer (Ответ пользователя)
 class UserAnswer(models.Model):
@@ -116,3 +165,31 @@ class TestResult(models.Model):
         app_label = 'tests'
         verbose_name = "Результат теста"
         verbose_name_plural = "Результаты тестов"
+
+# 7. Модель QuestionDailyStats (Статистика ответов на вопрос за день)
+class QuestionDailyStats(models.Model):
+    """
+    Предагрегированная статистика ответов: один ряд на вопрос, тест и день ответа.
+    Пополняется при подсчете результатов сессии (calculate_test_results), уменьшается
+    при удалении результата, полностью пересчитывается командой rebuild_question_stats.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='daily_stats', verbose_name="Вопрос")
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='question_daily_stats', verbose_name="Тест")
+    date = models.DateField(verbose_name="Дата")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Количество ответов")
+    incorrect = models.PositiveIntegerField(default=0, verbose_name="Количество неправильных ответов")
+    skipped = models.PositiveIntegerField(default=0, verbose_name="Количество пропусков")
+
+    def __str__(self):
+        return f"Статистика вопроса {self.question_id} за {self.date}"
+
+    class Meta:
+        app_label = 'tests'
+        verbose_name = "Статистика вопроса за день"
+        verbose_name_plural = "Статистика вопросов по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'test', 'date'], name='tests_question_daily_stats_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='tests_question_stats_date_idx'),
+        ]
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Question, QuestionSet, Test, TestResult
+from .utils import invalidate_question_pools, invalidate_question_content, subtract_question_stats
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=QuestionSet)
+@receiver(post_delete, sender=QuestionSet)
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def invalidate_question_pools_on_change(sender, **kwargs):
+    """Сброс кэша пулов вопросов при изменении вопросов, наборов или тестов"""
+    invalidate_question_pools()
+
+
+@receiver(m2m_changed, sender=Test.question_sets.through)
+def invalidate_question_pools_on_sets_change(sender, action, **kwargs):
+    """Сброс кэша пулов вопросов при изменении состава наборов теста"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_question_pools()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_content_on_change(sender, instance, **kwargs):
+    """Сброс кэша текста и вариантов вопроса"""
+    invalidate_question_content(instance.pk)
+
+
+@receiver(pre_delete, sender=TestResult)
+def subtract_question_stats_on_result_delete(sender, instance, **kwargs):
+    """Статистика вопросов учитывает только сессии с результатом: ответы удаляемого результата вычитаются"""
+    subtract_question_stats([instance.session_id])
@@ -1,3 +1,102 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import QuestionSet, Question, Test, TestSession, TestResult, UserAnswer, QuestionDailyStats
+from .utils import calculate_test_results, rebuild_question_stats
+
+
+class ExpiredSessionsTests(TestCase):
+    """Завершение сессий с истекшим временем (finalize_expired_sessions)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        question_set = QuestionSet.objects.create(title='Набор', description='Набор')
+        cls.question = Question.objects.create(
+            question_set=question_set, text='Вопрос', option_1='1', option_2='2', option_3='3', option_4='4',
+            correct_option=1,
+        )
+        cls.test = Test.objects.create(title='Тест', password='x', time_limit=30, questions_per_set=1)
+        cls.test.question_sets.set([question_set])
+
+    def _create_session(self, key, started_ago):
+        return TestSession.objects.create(
+            test=self.test, first_name='Иван', last_name='Иванов', session_key=key,
+            start_time=timezone.now() - started_ago,
+            selected_questions={'order': [self.question.pk]},
+        )
+
+    def test_session_with_result_is_completed_without_rescoring(self):
+        # Результат есть, но сессия не отмечена завершенной (прежний неатомарный подсчет)
+        scored = self._create_session('scored', timedelta(hours=3))
+        TestResult.objects.create(
+            session=scored, total_questions=1, answered_questions=1, correct_answers=1,
+            skipped_questions=0, percentage=Decimal(100),
+        )
+        expired = self._create_session('expired', timedelta(hours=2))
+        UserAnswer.objects.create(session=expired, question=self.question, selected_option=2)
+        active = self._create_session('active', timedelta(minutes=5))
+
+        # Пачка из одной сессии: подсчитанная сессия идет первой и не должна зациклить проверку
+        call_command('finalize_expired_sessions', batch_size=1, stdout=io.StringIO())
+        call_command('finalize_expired_sessions', batch_size=1, stdout=io.StringIO())
+
+        scored.refresh_from_db()
+        expired.refresh_from_db()
+        active.refresh_from_db()
+        self.assertTrue(scored.is_completed)
+        self.assertEqual(scored.end_time, scored.start_time + timedelta(minutes=30))
+        self.assertEqual(TestResult.objects.filter(session=scored).count(), 1)
+        self.assertTrue(expired.is_completed)
+        self.assertEqual(expired.result.correct_answers, 0)
+        self.assertFalse(active.is_completed)
+
+
+class QuestionStatsOnResultDeleteTests(TestCase):
+    """Статистика вопросов по дням при удалении результатов"""
+
+    def setUp(self):
+        question_set = QuestionSet.objects.create(title='Набор', description='Набор')
+        self.questions = [
+            Question.objects.create(
+                question_set=question_set, text=f'Вопрос {index}', option_1='1', option_2='2', option_3='3',
+                option_4='4', correct_option=1,
+            )
+            for index in range(2)
+        ]
+        self.test = Test.objects.create(title='Тест', password='x', time_limit=30, questions_per_set=2)
+        self.test.question_sets.set([question_set])
+
+    def _scored_session(self, key, selected_options):
+        session = TestSession.objects.create(
+            test=self.test, first_name='Иван', last_name='Иванов', session_key=key, start_time=timezone.now(),
+            selected_questions={'order': [question.pk for question in self.questions]},
+        )
+        for question, selected_option in zip(self.questions, selected_options):
+            UserAnswer.objects.create(session=session, question=question, selected_option=selected_option)
+        return calculate_test_results(session)
+
+    def _stats(self):
+        return sorted(
+            QuestionDailyStats.objects.values_list('question_id', 'test_id', 'date', 'attempts', 'incorrect', 'skipped')
+        )
+
+    def test_deleted_result_is_subtracted(self):
+        first = self._scored_session('first', [1, 2])
+        second = self._scored_session('second', [2, None])
+
+        second.delete()
+        stats = self._stats()
+        rebuild_question_stats()
+        self.assertEqual(stats, self._stats())
+        self.assertEqual(
+            [(attempts, incorrect, skipped) for *_, attempts, incorrect, skipped in stats],
+            [(1, 0, 0), (1, 1, 0)],
+        )
 
-# Create your tests here.
+        first.delete()
+        self.assertFalse(QuestionDailyStats.objects.exists())
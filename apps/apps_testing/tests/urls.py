@@ -13,6 +13,8 @@ urlpatterns = [
     path('test/result/<str:session_key>/', views.test_result, name='test_result'),
 
     # AJAX-эндпоинты
+    path('ajax/test-payload/', views.get_test_payload_ajax, name='ajax_test_payload'),
     path('ajax/get-question/', views.get_question_ajax, name='ajax_get_question'),
     path('ajax/save-answer/', views.save_answer_ajax, name='ajax_save_answer'),
+    path('ajax/save-answers/', views.save_answers_batch_ajax, name='ajax_save_answers'),
 ]
@@ -1,93 +1,416 @@
 # apps_testing/tests/utils.py
 import random
+import uuid
+from collections import defaultdict
+from datetime import timedelta
 from decimal import Decimal
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Min, OuterRef, Q
+from django.db.models.functions import Greatest, TruncDate
 from django.utils import timezone
-from .models import Test, Question, TestSession, TestResult, UserAnswer
+from .models import Test, Question, TestSession, TestResult, UserAnswer, QuestionDailyStats
 
 
-def generate_test_questions(test_id: int) -> list:
-    """Генерирует и перемешивает список ID вопросов для сессии."""
-    test = Test.objects.get(id=test_id)
-    question_ids = []
+QUESTION_POOL_CACHE_KEY = 'tests:question_pool'
+QUESTION_POOL_VERSION_KEY = 'tests:question_pool:version'
+QUESTION_POOL_CACHE_TIMEOUT = 60 * 60
+
+
+def _question_pool_version() -> str:
+    version = cache.get(QUESTION_POOL_VERSION_KEY)
+    if version is None:
+        cache.add(QUESTION_POOL_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(QUESTION_POOL_VERSION_KEY)
+    return version
+
+
+def invalidate_question_pools():
+    """
+    Сбрасывает кэш пулов вопросов всех тестов сменой версии.
+    Вызывается сигналами (apps_testing.tests.signals) и явно после массовых операций.
+    """
+    cache.set(QUESTION_POOL_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_question_pool(test_id: int) -> dict:
+    """
+    Пул вопросов теста: {'questions_per_set': N, 'sets': [[id вопросов набора], ...]}.
+    Хранится в кэше до изменения вопросов, наборов или состава наборов теста.
+    """
+    cache_key = f'{QUESTION_POOL_CACHE_KEY}:{_question_pool_version()}:{test_id}'
+    pool = cache.get(cache_key)
+    if pool is None:
+        test = Test.objects.get(id=test_id)
+        question_ids = defaultdict(list)
+        rows = Question.objects.filter(question_set__test=test).values_list('question_set_id', 'id').order_by('id')
+        for question_set_id, question_id in rows:
+            question_ids[question_set_id].append(question_id)
+        pool = {
+            'questions_per_set': test.questions_per_set,
+            'sets': [question_ids[set_id] for set_id in test.question_sets.values_list('id', flat=True)],
+        }
+        cache.set(cache_key, pool, QUESTION_POOL_CACHE_TIMEOUT)
+    return pool
+
 
-    # .prefetch_related() для оптимизации
-    question_sets = test.question_sets.prefetch_related('questions')
+def generate_test_questions(test_id: int, seed: int = None) -> list:
+    """
+    Генерирует и перемешивает список ID вопросов для сессии (по кэшированному пулу вопросов).
+    При заданном зерне (TestSession.seed) результат воспроизводим.
+    """
+    rng = random.Random(seed) if seed is not None else random
+    pool = get_question_pool(test_id)
+    question_ids = []
 
-    for q_set in question_sets:
-        # Получаем все ID вопросов для набора
-        all_question_ids = list(q_set.questions.values_list('id', flat=True))
+    for all_question_ids in pool['sets']:
         # Выбираем случайные вопросы, если их больше, чем требуется
-        count_to_select = min(len(all_question_ids), test.questions_per_set)
-        question_ids.extend(random.sample(all_question_ids, count_to_select))
+        count_to_select = min(len(all_question_ids), pool['questions_per_set'])
+        question_ids.extend(rng.sample(all_question_ids, count_to_select))
 
-    random.shuffle(question_ids)
+    rng.shuffle(question_ids)
     return question_ids
 
 
-def calculate_test_results(session: TestSession):
-    """Подсчитывает результаты теста и создает объект TestResult."""
-    if hasattr(session, 'result'):
-        # Результат уже был посчитан
-        return session.result
+QUESTION_CONTENT_CACHE_KEY = 'tests:question'
+QUESTION_CONTENT_CACHE_TIMEOUT = 60 * 60
 
-    # Перезагружаем сессию из базы данных, чтобы получить актуальный start_time
-    session.refresh_from_db()
 
-    total_questions = len(session.selected_questions.get('order', []))
+def get_questions_content(question_ids) -> dict:
+    """
+    Текст и варианты ответов вопросов для показа тестируемому: {id: {'text', 'options': {номер: текст}}}.
+    Берутся из кэша, в БД запрашиваются только отсутствующие; кэш вопроса сбрасывается сигналом при изменении.
+    """
+    keys = {f'{QUESTION_CONTENT_CACHE_KEY}:{question_id}': question_id for question_id in question_ids}
+    cached = cache.get_many(keys)
+    content = {keys[key]: value for key, value in cached.items()}
 
-    # select_related для оптимизации
-    user_answers = session.answers.select_related('question').all()
+    missing = [question_id for question_id in question_ids if question_id not in content]
+    if missing:
+        fresh = {}
+        for question in Question.objects.filter(id__in=missing):
+            fresh[question.id] = {
+                'text': question.text,
+                'options': {
+                    1: question.option_1,
+                    2: question.option_2,
+                    3: question.option_3,
+                    4: question.option_4,
+                },
+            }
+        cache.set_many(
+            {f'{QUESTION_CONTENT_CACHE_KEY}:{question_id}': value for question_id, value in fresh.items()},
+            QUESTION_CONTENT_CACHE_TIMEOUT,
+        )
+        content.update(fresh)
+    return content
 
-    answered_count = 0
-    correct_count = 0
 
-    for answer in user_answers:
-        if answer.selected_option is not None:
-            answered_count += 1
-            if answer.question.correct_option == answer.selected_option:
-                answer.is_correct = True
-                correct_count += 1
-            else:
-                answer.is_correct = False
-        answer.save()
+def invalidate_question_content(question_id: int):
+    cache.delete(f'{QUESTION_CONTENT_CACHE_KEY}:{question_id}')
+
+
+def build_question_item(session: TestSession, question_id: int, content: dict, selected_option=None) -> dict:
+    """Вопрос в том виде, в котором его видит тестируемый: варианты в порядке, заданном зерном сессии."""
+    return {
+        'question_id': question_id,
+        'text': content['text'],
+        'options': [(number, content['options'][number]) for number in session.option_order(question_id)],
+        'selected_option': selected_option,
+    }
 
-    skipped_count = total_questions - answered_count
 
+def _is_correct_expression():
+    """Выражение для UPDATE: совпадает ли выбранный вариант с правильным ответом вопроса."""
+    return Exists(Question.objects.filter(pk=OuterRef('question_id'), correct_option=OuterRef('selected_option')))
+
+
+def _build_result(session: TestSession, total_questions: int, answered_count: int, correct_count: int) -> TestResult:
     percentage = Decimal(0)
     if total_questions > 0:
         percentage = (Decimal(correct_count) / Decimal(total_questions)) * 100
 
-    result = TestResult.objects.create(
+    return TestResult(
         session=session,
         total_questions=total_questions,
         answered_questions=answered_count,
         correct_answers=correct_count,
-        skipped_questions=skipped_count,
+        skipped_questions=total_questions - answered_count,
         percentage=percentage
     )
 
-    # Устанавливаем start_time если он не был установлен
-    # Используем время первого ответа как fallback
-    end_time_now = timezone.now()
-    
-    if not session.start_time:
-        first_answer = session.answers.order_by('answered_at').first()
-        if first_answer and first_answer.answered_at:
-            # Используем время первого ответа
-            session.start_time = first_answer.answered_at
-        else:
+
+QUESTION_STATS_BATCH_SIZE = 1000
+# Повторы создания строк статистики при одновременном подсчете сессий
+QUESTION_STATS_UPSERT_ATTEMPTS = 3
+
+
+def aggregate_question_stats(answers):
+    """
+    Группирует ответы по вопросу, тесту и дню ответа.
+    Возвращает итератор словарей с полями question_id, test_id, date, attempts, incorrect, skipped.
+    """
+    return (
+        answers.annotate(date=TruncDate('answered_at'))
+        .values('question_id', 'date', test_id=F('session__test_id'))
+        .annotate(
+            attempts=Count('id', filter=Q(selected_option__isnull=False)),
+            incorrect=Count('id', filter=Q(selected_option__isnull=False, is_correct=False)),
+            skipped=Count('id', filter=Q(selected_option__isnull=True)),
+        )
+        .order_by()
+    )
+
+
+def add_question_stats(session_ids):
+    """
+    Добавляет ответы подсчитанных сессий в QuestionDailyStats.
+    Вызывается внутри транзакции подсчета результатов после обновления is_correct.
+
+    Существующие строки статистики блокируются (select_for_update) и увеличиваются.
+    Строки, которых еще нет, создаются в точке сохранения: если их одновременно
+    создала параллельная транзакция (нарушение уникальности question/test/date),
+    точка сохранения откатывается и строки перечитываются уже с блокировкой.
+    """
+    rows = list(aggregate_question_stats(UserAnswer.objects.filter(session_id__in=session_ids)))
+    if not rows:
+        return
+
+    for attempt in range(QUESTION_STATS_UPSERT_ATTEMPTS):
+        existing = {
+            (stats.question_id, stats.test_id, stats.date): stats
+            for stats in QuestionDailyStats.objects.select_for_update().filter(
+                question_id__in={row['question_id'] for row in rows},
+                test_id__in={row['test_id'] for row in rows},
+                date__in={row['date'] for row in rows},
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for row in rows:
+            stats = existing.get((row['question_id'], row['test_id'], row['date']))
+            if stats is None:
+                to_create.append(QuestionDailyStats(
+                    question_id=row['question_id'],
+                    test_id=row['test_id'],
+                    date=row['date'],
+                    attempts=row['attempts'],
+                    incorrect=row['incorrect'],
+                    skipped=row['skipped'],
+                ))
+            else:
+                stats.attempts += row['attempts']
+                stats.incorrect += row['incorrect']
+                stats.skipped += row['skipped']
+                to_update.append(stats)
+
+        try:
+            with transaction.atomic():
+                QuestionDailyStats.objects.bulk_create(to_create, batch_size=QUESTION_STATS_BATCH_SIZE)
+        except IntegrityError:
+            if attempt + 1 == QUESTION_STATS_UPSERT_ATTEMPTS:
+                raise
+            continue
+        break
+
+    QuestionDailyStats.objects.bulk_update(
+        to_update, ['attempts', 'incorrect', 'skipped'], batch_size=QUESTION_STATS_BATCH_SIZE
+    )
+
+
+def subtract_question_stats(session_ids):
+    """
+    Вычитает ответы сессий из QuestionDailyStats (при удалении результатов).
+    Вызывается до удаления ответов, в транзакции удаления; счетчики уменьшаются
+    UPDATE с F(), опустевшие строки удаляются, как если бы статистика была пересчитана.
+    """
+    rows = list(aggregate_question_stats(UserAnswer.objects.filter(session_id__in=session_ids)))
+    if not rows:
+        return
+
+    for row in rows:
+        QuestionDailyStats.objects.filter(
+            question_id=row['question_id'], test_id=row['test_id'], date=row['date']
+        ).update(
+            attempts=Greatest(F('attempts') - row['attempts'], 0),
+            incorrect=Greatest(F('incorrect') - row['incorrect'], 0),
+            skipped=Greatest(F('skipped') - row['skipped'], 0),
+        )
+    QuestionDailyStats.objects.filter(
+        question_id__in={row['question_id'] for row in rows},
+        test_id__in={row['test_id'] for row in rows},
+        date__in={row['date'] for row in rows},
+        attempts=0,
+        skipped=0,
+    ).delete()
+
+
+def rebuild_question_stats() -> int:
+    """
+    Полностью пересчитывает QuestionDailyStats по ответам всех сессий с результатом.
+    Возвращает количество созданных строк статистики.
+    """
+    answers = UserAnswer.objects.filter(session__result__isnull=False)
+    created = 0
+    with transaction.atomic():
+        QuestionDailyStats.objects.all().delete()
+        batch = []
+        for row in aggregate_question_stats(answers).iterator(chunk_size=QUESTION_STATS_BATCH_SIZE):
+            batch.append(QuestionDailyStats(**row))
+            if len(batch) >= QUESTION_STATS_BATCH_SIZE:
+                QuestionDailyStats.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        QuestionDailyStats.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def calculate_test_results(session: TestSession):
+    """
+    Подсчитывает результаты теста и создает объект TestResult.
+
+    Подсчет выполняется на стороне БД: один UPDATE проставляет is_correct всем ответам
+    сессии, один агрегирующий запрос считает отвеченные и правильные ответы.
+    Создание результата, пополнение статистики вопросов и завершение сессии
+    выполняются в одной транзакции.
+    """
+    if hasattr(session, 'result'):
+        # Результат уже был посчитан
+        return session.result
+
+    with transaction.atomic():
+        # Актуальное состояние сессии (start_time мог быть установлен другим запросом).
+        # Строка сессии блокируется: подсчет пачкой (calculate_results_for_sessions) блокирует ее так же
+        current = TestSession.objects.select_for_update().only('start_time', 'selected_questions').get(pk=session.pk)
+        existing = TestResult.objects.filter(session_id=session.pk).first()
+        if existing is not None:
+            return existing
+        total_questions = len(current.selected_questions.get('order', []))
+
+        session.answers.update(is_correct=_is_correct_expression())
+        stats = session.answers.aggregate(
+            answered=Count('id', filter=Q(selected_option__isnull=False)),
+            correct=Count('id', filter=Q(is_correct=True)),
+            first_answered_at=Min('answered_at'),
+        )
+
+        answered_count = stats['answered']
+        correct_count = stats['correct']
+
+        result = _build_result(session, total_questions, answered_count, correct_count)
+        try:
+            with transaction.atomic():
+                result.save()
+        except IntegrityError:
+            # Результат уже посчитан параллельным запросом (уникальность TestResult.session);
+            # статистику вопросов и сессию обновил тот же запрос
+            existing = TestResult.objects.filter(session_id=session.pk).first()
+            if existing is None:
+                raise
+            return existing
+        add_question_stats([session.pk])
+
+        # Устанавливаем start_time если он не был установлен
+        # Используем время первого ответа как fallback
+        end_time_now = timezone.now()
+        start_time = current.start_time
+        if not start_time:
             # Если нет ответов, используем текущее время минус 1 минута
             # чтобы гарантировать разумную разницу с end_time
-            from datetime import timedelta
-            session.start_time = end_time_now - timedelta(minutes=1)
-    
-    # Убеждаемся, что start_time раньше end_time (с запасом минимум 1 секунда)
-    if session.start_time >= end_time_now:
-        from datetime import timedelta
-        session.start_time = end_time_now - timedelta(seconds=1)
-    
-    session.is_completed = True
-    session.end_time = end_time_now
-    session.save()
+            start_time = stats['first_answered_at'] or end_time_now - timedelta(minutes=1)
+
+        # Убеждаемся, что start_time раньше end_time (с запасом минимум 1 секунда)
+        if start_time >= end_time_now:
+            start_time = end_time_now - timedelta(seconds=1)
+
+        TestSession.objects.filter(pk=session.pk).update(
+            start_time=start_time, end_time=end_time_now, is_completed=True
+        )
 
+    session.start_time = start_time
+    session.end_time = end_time_now
+    session.is_completed = True
     return result
+
+
+def expired_sessions(now=None):
+    """
+    Незавершенные сессии, время которых истекло (start_time + test.time_limit < now).
+    Условие строится отдельно для каждого теста (у каждого свой лимит времени), чтобы запрос использовал
+    частичный индекс по (test, start_time) для незавершенных сессий.
+
+    Сессии без start_time не истекают: время отсчитывается с загрузки теста или первого
+    вопроса, до этого ответов в сессии нет и тестируемый может начать тест позже.
+    """
+    now = now or timezone.now()
+    condition = Q()
+    limits = Test.objects.filter(sessions__is_completed=False).values_list('id', 'time_limit').distinct()
+    for test_id, time_limit in limits:
+        condition |= Q(test_id=test_id, start_time__lt=now - timedelta(minutes=time_limit))
+    if not condition:
+        return TestSession.objects.none()
+    return TestSession.objects.filter(condition, is_completed=False, start_time__isnull=False)
+
+
+def calculate_results_for_sessions(sessions) -> int:
+    """
+    Подсчитывает результаты для пачки истекших сессий теми же запросами, что и
+    calculate_test_results, но сразу для всех сессий пачки. Временем окончания
+    считается момент истечения лимита. Возвращает количество созданных результатов.
+
+    Сессии с уже созданным результатом только отмечаются завершенными.
+    """
+    sessions = {session.pk: session for session in sessions}
+    if not sessions:
+        return 0
+
+    with transaction.atomic():
+        # Сессии пачки блокируются до проверки: подсчет из запроса тестируемого
+        # (calculate_test_results) блокирует ту же строку и ждет окончания этой транзакции
+        pending = set(
+            TestSession.objects.select_for_update()
+            .filter(pk__in=list(sessions), is_completed=False)
+            .values_list('pk', flat=True)
+        )
+        # Сессии, для которых результат уже посчитан, не подсчитываются повторно, но отмечаются
+        # завершенными: иначе (результат есть, is_completed=False) они снова попадут в expired_sessions
+        scored = set(TestResult.objects.filter(session_id__in=pending).values_list('session_id', flat=True))
+        if scored:
+            completed = list(
+                TestSession.objects.filter(pk__in=scored).select_related('test')
+                .only('start_time', 'end_time', 'test__time_limit')
+            )
+            for session in completed:
+                if session.end_time is None:
+                    session.end_time = session.start_time + timedelta(minutes=session.test.time_limit)
+                session.is_completed = True
+            TestSession.objects.bulk_update(completed, ['end_time', 'is_completed'])
+        pending.difference_update(scored)
+        sessions = {session_id: session for session_id, session in sessions.items() if session_id in pending}
+        if not sessions:
+            return 0
+
+        answers = UserAnswer.objects.filter(session_id__in=sessions)
+        answers.update(is_correct=_is_correct_expression())
+        stats = {
+            row['session_id']: row
+            for row in answers.values('session_id').annotate(
+                answered=Count('id', filter=Q(selected_option__isnull=False)),
+                correct=Count('id', filter=Q(is_correct=True)),
+            )
+        }
+
+        results = []
+        for session_id, session in sessions.items():
+            row = stats.get(session_id, {'answered': 0, 'correct': 0})
+            total_questions = len(session.selected_questions.get('order', []))
+            results.append(_build_result(session, total_questions, row['answered'], row['correct']))
+            session.end_time = session.start_time + timedelta(minutes=session.test.time_limit)
+            session.is_completed = True
+
+        TestResult.objects.bulk_create(results)
+        add_question_stats(list(sessions))
+        TestSession.objects.bulk_update(sessions.values(), ['end_time', 'is_completed'])
+    return len(results)
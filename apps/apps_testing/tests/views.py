@@ -1,15 +1,20 @@
 # apps_testing/tests/views.py
-import random
+import hashlib
+import json
 import uuid
 from datetime import timedelta
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, Http404, HttpResponseBadRequest
+from django.http import JsonResponse, Http404, HttpResponseBadRequest, HttpResponseNotModified
 from django.urls import reverse
 from django.views.decorators.http import require_POST
+from django.db import transaction
 from django.utils import timezone
-from .models import Test, TestSession, Question, UserAnswer
+from .models import Test, TestSession, Question, UserAnswer, generate_session_seed
 from .forms import TestAccessForm, TestRegistrationForm
-from .utils import generate_test_questions, calculate_test_results
+from .utils import (
+    generate_test_questions, calculate_test_results,
+    get_questions_content, build_question_item,
+)
 
 
 def get_client_ip(request):
@@ -57,8 +62,9 @@ def test_register(request, test_id):
                 request.session.create()
             session_key = uuid.uuid4().hex
 
-            # Генерируем вопросы
-            question_ids = generate_test_questions(test.id)
+            # Генерируем вопросы: порядок определяется зерном сессии
+            seed = generate_session_seed()
+            question_ids = generate_test_questions(test.id, seed)
             if not question_ids:
                 # Обработка случая, когда вопросов нет
                 return render(request, 'apps_testing/tests/error.html', {'message': 'В этом тесте нет вопросов.'})
@@ -73,6 +79,7 @@ def test_register(request, test_id):
                 postname=data['postname'],
                 session_key=session_key,
                 selected_questions={'order': question_ids},
+                seed=seed,
                 ip_address=get_client_ip(request)
             )
 
@@ -154,29 +161,70 @@ def get_question_ajax(request):
         return JsonResponse({'error': 'Invalid question index'}, status=400)
 
     question_id = question_ids[q_index]
-    question = get_object_or_404(Question, id=question_id)
-
-    # Перемешиваем варианты ответов
-    options = [
-        (1, question.option_1),
-        (2, question.option_2),
-        (3, question.option_3),
-        (4, question.option_4),
-    ]
-    random.shuffle(options)
+    content = get_questions_content([question_id]).get(question_id)
+    if content is None:
+        raise Http404("Вопрос не найден.")
 
-    user_answer = UserAnswer.objects.filter(session=session, question=question).first()
+    user_answer = UserAnswer.objects.filter(session=session, question_id=question_id).first()
 
-    return JsonResponse({
+    # Порядок вариантов задается зерном сессии и не меняется при повторной загрузке
+    item = build_question_item(session, question_id, content, user_answer.selected_option if user_answer else None)
+    response = JsonResponse({
         'status': 'ok',
-        'question_id': question.id,
-        'text': question.text,
-        'options': options,
+        **item,
         'total_questions': len(question_ids),
         'current_index': q_index,
-        'selected_option': user_answer.selected_option if user_answer else None
     })
 
+    # Ответ воспроизводим, поэтому повторная загрузка того же вопроса отдается как 304
+    etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        not_modified = HttpResponseNotModified()
+        not_modified['ETag'] = etag
+        return not_modified
+    return response
+
+
+def get_test_payload_ajax(request):
+    """
+    Все вопросы сессии одним ответом: в порядке сессии, с вариантами в порядке сессии
+    и сохраненными ответами. Ответы клиента (save_answers_batch_ajax) проверяются по
+    данным сессии на сервере, поэтому содержимое обратно не принимается и не подписывается.
+    """
+    session, is_finished = get_session_and_check_time(request)
+    if is_finished:
+        return JsonResponse({'status': 'finished', 'result_url': reverse('testing:test_result', args=[session.session_key])})
+
+    # Устанавливаем start_time при загрузке теста (как при загрузке первого вопроса)
+    if not session.start_time:
+        now = timezone.now()
+        if TestSession.objects.filter(pk=session.pk, start_time__isnull=True).update(start_time=now):
+            session.start_time = now
+        else:
+            session.refresh_from_db(fields=['start_time'])
+
+    question_ids = session.selected_questions.get('order', [])
+    questions = get_questions_content(question_ids)
+    saved_answers = dict(
+        UserAnswer.objects.filter(session=session).values_list('question_id', 'selected_option')
+    )
+
+    items = [
+        build_question_item(session, question_id, questions[question_id], saved_answers.get(question_id))
+        for question_id in question_ids
+        if question_id in questions
+    ]
+
+    payload = {
+        'session_key': session.session_key,
+        'total_questions': len(items),
+        'server_end_time': (session.start_time + timedelta(minutes=session.test.time_limit)).isoformat(),
+        'questions': items,
+    }
+    return JsonResponse({'status': 'ok', 'payload': payload})
+
 
 @require_POST
 def save_answer_ajax(request):
@@ -195,6 +243,8 @@ def save_answer_ajax(request):
         selected_option = int(selected_option) if selected_option else None
     except (ValueError, TypeError):
         return HttpResponseBadRequest("Invalid selected_option")
+    if selected_option is not None and not 1 <= selected_option <= 4:
+        return HttpResponseBadRequest("Invalid selected_option")
 
     question = get_object_or_404(Question, id=question_id)
 
@@ -207,6 +257,62 @@ def save_answer_ajax(request):
     return JsonResponse({'status': 'ok', 'message': 'Answer saved'})
 
 
+@require_POST
+def save_answers_batch_ajax(request):
+    """
+    Сохранение пачки ответов: {"answers": [{"question_id", "selected_option", "client_ts"}, ...]}.
+    Ответы проверяются по списку вопросов сессии и записываются одним upsert в одной транзакции.
+    Для повторяющегося question_id берется ответ с наибольшим client_ts.
+    """
+    session, is_finished = get_session_and_check_time(request)
+    if is_finished:
+        return JsonResponse({'status': 'finished', 'result_url': reverse('testing:test_result', args=[session.session_key])})
+
+    try:
+        if request.content_type == 'application/json':
+            data = json.loads(request.body)
+        else:
+            data = {'answers': json.loads(request.POST.get('answers', '[]'))}
+        entries = data['answers']
+        if not isinstance(entries, list):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest("Invalid answers")
+
+    allowed_ids = set(session.selected_questions.get('order', []))
+    latest = {}
+    rejected = []
+    for entry in entries:
+        try:
+            question_id = int(entry['question_id'])
+            selected_option = entry.get('selected_option')
+            selected_option = int(selected_option) if selected_option not in (None, '') else None
+            client_ts = float(entry.get('client_ts') or 0)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return HttpResponseBadRequest("Invalid answers")
+
+        if question_id not in allowed_ids or (selected_option is not None and not 1 <= selected_option <= 4):
+            rejected.append(question_id)
+            continue
+        if question_id not in latest or client_ts >= latest[question_id][0]:
+            latest[question_id] = (client_ts, selected_option)
+
+    answers = [
+        UserAnswer(session=session, question_id=question_id, selected_option=selected_option)
+        for question_id, (_, selected_option) in latest.items()
+    ]
+    if answers:
+        with transaction.atomic():
+            UserAnswer.objects.bulk_create(
+                answers,
+                update_conflicts=True,
+                unique_fields=['session', 'question'],
+                update_fields=['selected_option'],
+            )
+
+    return JsonResponse({'status': 'ok', 'saved': len(answers), 'rejected': rejected})
+
+
 def test_finish(request):
     session_id = request.session.get('test_session_id')
     if not session_id:
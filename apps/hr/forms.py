@@ -211,6 +211,12 @@ class CSVImportForm(forms.Form):
         help_text='Файл должен содержать колонки: Фамилия;Имя;Отчество;ФИО в винительном падеже (опционально);Дата рождения (YYYY-MM-DD);Пол (M/F);Рабочий телефон;Мобильный телефон;IP-телефон (опционально);Email;Дата назначения (YYYY-MM-DD);Дата приказа (YYYY-MM-DD);Номер приказа;Статус (опционально: active/dismissed/temporary_absence)',
         widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv'})
     )
+    dry_run = forms.BooleanField(
+        label='Только проверка (без записи)',
+        required=False,
+        help_text='Показать, какие строки будут добавлены, обновлены или пропущены как дубликаты',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
 
 class PostsCSVImportForm(forms.Form):
@@ -0,0 +1,499 @@
+"""
+Массовый импорт сотрудников и штатных позиций из CSV.
+
+Справочники и сотрудники загружаются в словари один раз на файл, строки
+классифицируются и проверяются в памяти, запись выполняется через
+bulk_create/bulk_update в одной транзакции.
+"""
+import csv
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.reference.models import Postname, Departments
+from .matching import EmployeeNameMatcher, split_full_name
+from .models import Posts, Employees, employee_name_keys, normalize_name_part
+
+
+OCCUPIED_VALUES = ['occupied', 'занята', 'занято']
+VACANT_VALUES = ['vacant', 'вакантна', 'вакантно']
+TRUE_VALUES = ['true', '1', 'да', 'yes']
+FALSE_VALUES = ['false', '0', 'нет', 'no']
+
+BULK_BATCH_SIZE = 1000
+
+EMPLOYEE_STATUS_MAP = {
+    'active': Employees.STATUS_ACTIVE,
+    'активен': Employees.STATUS_ACTIVE,
+    'dismissed': Employees.STATUS_DISMISSED,
+    'уволен': Employees.STATUS_DISMISSED,
+    'temporary_absence': Employees.STATUS_TEMPORARY_ABSENCE,
+    'временно отсутствует': Employees.STATUS_TEMPORARY_ABSENCE,
+}
+
+# Поля сотрудника, которые обновляются при повторном импорте (ключевые поля не меняются)
+EMPLOYEE_UPDATE_FIELDS = [
+    'full_name_accusative', 'gender', 'work_phone', 'mobile_phone', 'ip_phone', 'email',
+    'appointment_date', 'appointment_order_date', 'appointment_order_number', 'status',
+]
+
+ACTION_INSERT = 'insert'
+ACTION_UPDATE = 'update'
+ACTION_DUPLICATE = 'duplicate'
+
+
+def build_lookup(queryset):
+    """
+    Строит словари поиска по названию и коду для активных записей справочника.
+    Название может повторяться, поэтому по названию хранится список.
+    """
+    by_name = defaultdict(list)
+    by_code = {}
+    for obj in queryset.filter(is_active=True).only('pk', 'name', 'code'):
+        by_name[obj.name].append(obj)
+        by_code[obj.code] = obj
+    return by_name, by_code
+
+
+class PostCSVImporter:
+    """
+    Импортер штатных позиций из CSV (разделитель ';').
+
+    Использование:
+        importer = PostCSVImporter()
+        imported = importer.run(lines)
+        importer.errors  # список сообщений об ошибках по строкам
+    """
+
+    def __init__(self):
+        self.errors = []
+
+    def parse(self, lines):
+        """Разбирает строки файла в список (номер строки, словарь полей)"""
+        first_line_lower = lines[0].lower()
+        has_header = 'должность' in first_line_lower or 'подразделение' in first_line_lower or 'post' in first_line_lower
+
+        rows = []
+        if has_header:
+            for row_num, row in enumerate(csv.DictReader(lines, delimiter=';'), start=2):
+                rows.append((row_num, {
+                    'postname': (row.get('Должность') or '').strip(),
+                    'department': (row.get('Подразделение') or '').strip(),
+                    'employee': (row.get('Сотрудник') or '').strip(),
+                    'status': (row.get('Статус') or '').strip().lower(),
+                    'is_active': (row.get('Активна') or '').strip(),
+                }))
+        else:
+            for row_num, row in enumerate(csv.reader(lines, delimiter=';'), start=1):
+                if len(row) < 2:
+                    self.errors.append(f"Строка {row_num}: недостаточно данных (нужно минимум 2 поля: Должность, Подразделение)")
+                    continue
+                rows.append((row_num, {
+                    'postname': row[0].strip(),
+                    'department': row[1].strip(),
+                    'employee': row[2].strip() if len(row) > 2 else '',
+                    'status': row[3].strip().lower() if len(row) > 3 else '',
+                    'is_active': row[4].strip() if len(row) > 4 else '',
+                }))
+        return rows
+
+    def _resolve(self, row_num, value, by_name, by_code, not_found_message):
+        """Поиск записи справочника сначала по названию, затем по коду"""
+        candidates = by_name.get(value)
+        if candidates:
+            if len(candidates) > 1:
+                self.errors.append(f"Строка {row_num}: найдено несколько записей с названием: {value}")
+                return None
+            return candidates[0]
+        if value in by_code:
+            return by_code[value]
+        self.errors.append(f"Строка {row_num}: {not_found_message}: {value}")
+        return None
+
+    def run(self, lines):
+        """Импортирует строки файла. Возвращает количество созданных позиций."""
+        parsed = self.parse(lines)
+        if not parsed:
+            return 0
+
+        postnames_by_name, postnames_by_code = build_lookup(Postname.objects.all())
+        departments_by_name, departments_by_code = build_lookup(Departments.objects.all())
+        # Сотрудники по ФИО из файла одним запросом
+        employee_index = EmployeeNameMatcher(
+            Employees.objects.filter(is_active=True).only('pk', 'name_key', 'short_name_key'), exact=True
+        )
+        employee_index.prefetch(data['employee'] for _, data in parsed if data['employee'])
+        occupied_employee_ids = set(
+            Posts.objects.filter(status=Posts.STATUS_OCCUPIED, employee__isnull=False).values_list('employee_id', flat=True)
+        )
+
+        posts = []
+        for row_num, data in parsed:
+            try:
+                post = self._build_post(
+                    row_num, data,
+                    postnames_by_name, postnames_by_code,
+                    departments_by_name, departments_by_code,
+                    employee_index, occupied_employee_ids,
+                )
+            except Exception as e:
+                self.errors.append(f"Строка {row_num}: ошибка при обработке - {str(e)}")
+                continue
+            if post is not None:
+                posts.append(post)
+
+        if not posts:
+            return 0
+
+        with transaction.atomic():
+            Posts.objects.bulk_create(posts, batch_size=BULK_BATCH_SIZE)
+            # bulk_create не отправляет post_save: актуализируем доступы одним проходом
+            from apps.access_management.signals import mark_access_needs_update
+            mark_access_needs_update({post.employee_id for post in posts if post.employee_id})
+        return len(posts)
+
+    def _build_post(self, row_num, data, postnames_by_name, postnames_by_code,
+                    departments_by_name, departments_by_code, employee_index, occupied_employee_ids):
+        """Создает несохраненный объект Posts из полей строки или возвращает None при ошибке"""
+        if not data['postname']:
+            self.errors.append(f"Строка {row_num}: отсутствует должность")
+            return None
+
+        if not data['department']:
+            self.errors.append(f"Строка {row_num}: отсутствует подразделение")
+            return None
+
+        postname = self._resolve(row_num, data['postname'], postnames_by_name, postnames_by_code, 'должность не найдена')
+        if postname is None:
+            return None
+
+        department = self._resolve(row_num, data['department'], departments_by_name, departments_by_code, 'подразделение не найдено')
+        if department is None:
+            return None
+
+        # Поиск сотрудника по ФИО (опционально)
+        employee_id = None
+        employee_str = data['employee']
+        if employee_str:
+            if split_full_name(employee_str):
+                matches = employee_index.find_all(employee_str)
+                if not matches:
+                    self.errors.append(f"Строка {row_num}: сотрудник не найден: {employee_str}")
+                    return None
+                if len(matches) > 1:
+                    # Если несколько сотрудников, берем первого
+                    self.errors.append(f"Строка {row_num}: найдено несколько сотрудников с ФИО {employee_str}, выбран первый")
+                employee_id = matches[0].pk
+
+        # Определяем статус
+        status = Posts.STATUS_VACANT
+        if data['status']:
+            if data['status'] in OCCUPIED_VALUES:
+                status = Posts.STATUS_OCCUPIED
+            elif data['status'] in VACANT_VALUES:
+                status = Posts.STATUS_VACANT
+            else:
+                self.errors.append(f"Строка {row_num}: неверное значение статуса (должно быть vacant/occupied), получено: {data['status']}")
+                return None
+
+        # Проверяем согласованность статуса и сотрудника
+        if status == Posts.STATUS_OCCUPIED and not employee_id:
+            self.errors.append(f"Строка {row_num}: для статуса 'занята' необходимо указать сотрудника")
+            return None
+
+        if status == Posts.STATUS_VACANT and employee_id:
+            self.errors.append(f"Строка {row_num}: для статуса 'вакантна' не должен быть указан сотрудник")
+            return None
+
+        # Сотрудник не может занимать более одной позиции (см. Posts.clean), включая позиции из этого же файла
+        if employee_id in occupied_employee_ids:
+            self.errors.append(f"Строка {row_num}: сотрудник уже занимает другую должность: {employee_str}")
+            return None
+        if employee_id:
+            occupied_employee_ids.add(employee_id)
+
+        is_active = True
+        if data['is_active']:
+            is_active_lower = data['is_active'].lower()
+            if is_active_lower in FALSE_VALUES:
+                is_active = False
+            elif is_active_lower in TRUE_VALUES:
+                is_active = True
+
+        return Posts(
+            postname=postname,
+            department=department,
+            employee_id=employee_id,
+            status=status,
+            is_active=is_active,
+        )
+
+
+def employee_key(last_name, first_name, middle_name, birth_date):
+    """Ключ поиска сотрудника: нормализованные ФИО и дата рождения"""
+    return (
+        normalize_name_part(last_name),
+        normalize_name_part(first_name),
+        normalize_name_part(middle_name),
+        birth_date,
+    )
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class EmployeeCSVImporter:
+    """
+    Импортер сотрудников из CSV (разделитель ';').
+
+    Каждая строка классифицируется по индексу существующих сотрудников
+    (нормализованные ФИО + дата рождения):
+        insert    - сотрудника нет, будет создан;
+        update    - сотрудник есть, данные в файле отличаются, будет обновлен;
+        duplicate - сотрудник есть и не отличается, либо строка повторяет предыдущую строку файла.
+
+    Использование:
+        importer = EmployeeCSVImporter(dry_run=False)
+        importer.run(lines)
+        importer.counts   # {'insert': N, 'update': M, 'duplicate': K}
+        importer.rows     # [(номер строки, действие, ФИО), ...]
+        importer.errors   # список сообщений об ошибках по строкам
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.errors = []
+        self.rows = []
+        self.counts = {ACTION_INSERT: 0, ACTION_UPDATE: 0, ACTION_DUPLICATE: 0}
+
+    def parse(self, lines):
+        """Разбирает строки файла в список (номер строки, словарь полей)"""
+        # Если первая строка содержит "Фамилия" или похожие слова, считаем её заголовком
+        first_line_lower = lines[0].lower()
+        has_header = 'фамилия' in first_line_lower or 'last' in first_line_lower
+
+        rows = []
+        if has_header:
+            for row_num, row in enumerate(csv.DictReader(lines, delimiter=';'), start=2):
+                get = lambda *titles: next(((row.get(t) or '').strip() for t in titles if row.get(t) is not None), '')
+                rows.append((row_num, {
+                    'last_name': get('Фамилия'),
+                    'first_name': get('Имя'),
+                    'middle_name': get('Отчество'),
+                    'full_name_accusative': get('ФИО в винительном падеже'),
+                    'birth_date': get('Дата рождения'),
+                    'gender': get('Пол').upper(),
+                    'work_phone': get('Рабочий телефон', 'Телефон'),  # Поддержка старого названия
+                    'mobile_phone': get('Мобильный телефон'),
+                    'ip_phone': get('IP-телефон', 'IP телефон'),
+                    'email': get('Email'),
+                    'appointment_date': get('Дата назначения'),
+                    'appointment_order_date': get('Дата приказа'),
+                    'appointment_order_number': get('Номер приказа'),
+                    'status': get('Статус'),
+                }))
+            return rows
+
+        for row_num, row in enumerate(csv.reader(lines, delimiter=';'), start=1):
+            if len(row) < 4:
+                self.errors.append(f"Строка {row_num}: недостаточно данных (нужно минимум 4 поля)")
+                continue
+            cell = lambda index: row[index].strip() if len(row) > index else ''
+
+            # Старый формат (без ФИО в винительном падеже и IP-телефона) определяется по дате в 4-м поле
+            is_old_format = False
+            if cell(3):
+                try:
+                    parse_date(cell(3))
+                    is_old_format = True
+                except ValueError:
+                    pass
+
+            if is_old_format:
+                # Фамилия;Имя;Отчество;Дата рождения;Пол;Рабочий телефон;Мобильный телефон;Email;Дата назначения;Дата приказа;Номер приказа
+                columns = [
+                    'last_name', 'first_name', 'middle_name', 'birth_date', 'gender', 'work_phone', 'mobile_phone',
+                    'email', 'appointment_date', 'appointment_order_date', 'appointment_order_number', 'status',
+                ]
+            else:
+                # Фамилия;Имя;Отчество;ФИО в винительном падеже;Дата рождения;Пол;Рабочий телефон;Мобильный телефон;IP-телефон;Email;Дата назначения;Дата приказа;Номер приказа
+                columns = [
+                    'last_name', 'first_name', 'middle_name', 'full_name_accusative', 'birth_date', 'gender',
+                    'work_phone', 'mobile_phone', 'ip_phone', 'email', 'appointment_date', 'appointment_order_date',
+                    'appointment_order_number', 'status',
+                ]
+            data = {field: '' for field in ['full_name_accusative', 'ip_phone']}
+            data.update({field: cell(index) for index, field in enumerate(columns)})
+            data['gender'] = data['gender'].upper()
+            rows.append((row_num, data))
+        return rows
+
+    def _build_employee(self, row_num, data):
+        """Создает несохраненный объект Employees из полей строки или возвращает None при ошибке"""
+        if not data['last_name'] or not data['first_name']:
+            self.errors.append(f"Строка {row_num}: отсутствует фамилия или имя")
+            return None
+
+        if not data['birth_date']:
+            self.errors.append(f"Строка {row_num}: отсутствует дата рождения")
+            return None
+
+        try:
+            birth_date = parse_date(data['birth_date'])
+        except ValueError:
+            self.errors.append(f"Строка {row_num}: неверный формат даты рождения. Ожидается YYYY-MM-DD, получено: {data['birth_date']}")
+            return None
+
+        if data['gender'] not in ['M', 'F']:
+            self.errors.append(f"Строка {row_num}: неверное значение пола (должно быть M или F), получено: {data['gender']}")
+            return None
+
+        appointment_date = None
+        if data['appointment_date']:
+            try:
+                appointment_date = parse_date(data['appointment_date'])
+            except ValueError:
+                self.errors.append(f"Строка {row_num}: неверный формат даты назначения. Ожидается YYYY-MM-DD, получено: {data['appointment_date']}")
+                return None
+
+        appointment_order_date = None
+        if data['appointment_order_date']:
+            try:
+                appointment_order_date = parse_date(data['appointment_order_date'])
+            except ValueError:
+                self.errors.append(f"Строка {row_num}: неверный формат даты приказа. Ожидается YYYY-MM-DD, получено: {data['appointment_order_date']}")
+                return None
+
+        status = Employees.STATUS_ACTIVE
+        if data['status']:
+            status = EMPLOYEE_STATUS_MAP.get(data['status'].lower().strip())
+            if status is None:
+                self.errors.append(f"Строка {row_num}: неверное значение статуса. Допустимые значения: active, dismissed, temporary_absence. Получено: {data['status']}")
+                return None
+
+        name_key, short_name_key = employee_name_keys(data['last_name'], data['first_name'], data['middle_name'])
+        return Employees(
+            last_name=data['last_name'],
+            first_name=data['first_name'],
+            middle_name=data['middle_name'],
+            full_name_accusative=data['full_name_accusative'],
+            birth_date=birth_date,
+            gender=data['gender'],
+            work_phone=data['work_phone'],
+            mobile_phone=data['mobile_phone'],
+            ip_phone=data['ip_phone'],
+            email=data['email'],
+            appointment_date=appointment_date,
+            appointment_order_date=appointment_order_date,
+            appointment_order_number=data['appointment_order_number'],
+            status=status,
+            # bulk_create не вызывает save(), поэтому синхронизируем is_active здесь
+            is_active=(status == Employees.STATUS_ACTIVE),
+            # и ключи поиска по ФИО
+            name_key=name_key,
+            short_name_key=short_name_key,
+        )
+
+    @staticmethod
+    def _changed_fields(existing, incoming, data):
+        """
+        Поля, которые строка файла меняет у существующего сотрудника.
+        Пустые значения в файле не затирают заполненные поля.
+        """
+        changed = []
+        for field in EMPLOYEE_UPDATE_FIELDS:
+            if field == 'status' and not data['status']:
+                continue
+            new_value = getattr(incoming, field)
+            if new_value in ('', None):
+                continue
+            if getattr(existing, field) != new_value:
+                changed.append(field)
+        return changed
+
+    def run(self, lines):
+        """
+        Классифицирует строки и, если это не пробный запуск, записывает изменения.
+        Возвращает self.counts.
+        """
+        parsed = self.parse(lines)
+
+        # Индекс существующих сотрудников - одним запросом
+        existing_index = defaultdict(list)
+        existing = Employees.objects.values_list('pk', 'last_name', 'first_name', 'middle_name', 'birth_date')
+        for pk, last_name, first_name, middle_name, birth_date in existing.iterator(chunk_size=5000):
+            existing_index[employee_key(last_name, first_name, middle_name, birth_date)].append(pk)
+
+        to_create = []
+        pending_updates = []  # (номер строки, pk, новый объект, поля строки)
+        seen_keys = set()
+        for row_num, data in parsed:
+            try:
+                employee = self._build_employee(row_num, data)
+            except Exception as e:
+                self.errors.append(f"Строка {row_num}: ошибка при обработке - {str(e)}")
+                continue
+            if employee is None:
+                continue
+
+            key = employee_key(employee.last_name, employee.first_name, employee.middle_name, employee.birth_date)
+            if key in seen_keys:
+                self._classify(row_num, ACTION_DUPLICATE, employee)
+                continue
+            seen_keys.add(key)
+
+            matches = existing_index.get(key)
+            if not matches:
+                to_create.append(employee)
+                self._classify(row_num, ACTION_INSERT, employee)
+            elif len(matches) > 1:
+                self.errors.append(f"Строка {row_num}: найдено несколько сотрудников с такими ФИО и датой рождения: {employee}")
+            else:
+                pending_updates.append((row_num, matches[0], employee, data))
+
+        # Существующие сотрудники загружаются только для строк-совпадений
+        existing_objects = {}
+        update_ids = [pk for _, pk, _, _ in pending_updates]
+        for start in range(0, len(update_ids), BULK_BATCH_SIZE):
+            existing_objects.update(Employees.objects.in_bulk(update_ids[start:start + BULK_BATCH_SIZE]))
+
+        to_update = []
+        update_fields = set()
+        for row_num, pk, employee, data in pending_updates:
+            current = existing_objects[pk]
+            changed = self._changed_fields(current, employee, data)
+            if not changed:
+                self._classify(row_num, ACTION_DUPLICATE, current)
+                continue
+            for field in changed:
+                setattr(current, field, getattr(employee, field))
+            current.is_active = (current.status == Employees.STATUS_ACTIVE)
+            to_update.append(current)
+            update_fields.update(changed)
+            self._classify(row_num, ACTION_UPDATE, current)
+
+        self.rows.sort()
+
+        if self.dry_run or not (to_create or to_update):
+            return self.counts
+
+        with transaction.atomic():
+            Employees.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+            if to_update:
+                now = timezone.now()
+                for employee in to_update:
+                    employee.updated_at = now
+                Employees.objects.bulk_update(
+                    to_update, sorted(update_fields | {'is_active', 'updated_at'}), batch_size=BULK_BATCH_SIZE
+                )
+            # Побочный эффект post_save (см. apps.access_management.signals) - одним проходом
+            from apps.access_management.signals import mark_access_needs_update
+            mark_access_needs_update(employee.pk for employee in to_update if not employee.is_active)
+        return self.counts
+
+    def _classify(self, row_num, action, employee):
+        self.counts[action] += 1
+        self.rows.append((row_num, action, str(employee)))
@@ -0,0 +1,87 @@
+"""
+Поиск сотрудников по ФИО.
+
+ФИО сравниваются в нормализованном виде (регистр, ё/е, лишние пробелы) по
+индексированным полям Employees.name_key (фамилия имя отчество) и
+Employees.short_name_key (фамилия имя), которые заполняются при сохранении.
+Поиск одного ФИО - один запрос на равенство по индексу; для списка ФИО
+кандидаты загружаются одним запросом short_name_key IN (...).
+"""
+from collections import defaultdict
+
+from .models import Employees, employee_name_keys
+
+
+# Ограничение числа параметров запроса (SQLite)
+PREFETCH_BATCH_SIZE = 500
+
+
+def split_full_name(full_name):
+    """Разбивает "Фамилия Имя [Отчество]" на части; None, если нет фамилии и имени"""
+    name_parts = (full_name or '').split()
+    if len(name_parts) < 2:
+        return None
+    return name_parts[0], name_parts[1], ' '.join(name_parts[2:])
+
+
+class EmployeeNameMatcher:
+    """
+    Сопоставление ФИО с сотрудниками.
+
+    Использование:
+        matcher = EmployeeNameMatcher(Employees.objects.filter(is_active=True), exact=True)
+        matcher.prefetch(names)  # необязательно: кандидаты для всех ФИО одним запросом
+        employee = matcher.find('Иванов Иван Иванович')
+        employees = matcher.find_all('Иванов Иван Иванович')
+
+    exact=False - при наличии отчества предпочтительно полное совпадение ФИО, иначе
+    первый по фамилии и имени; без отчества предпочтителен сотрудник без отчества.
+    exact=True - только полное совпадение ФИО (без отчества - сотрудники без отчества).
+    """
+
+    def __init__(self, queryset=None, exact=False):
+        self.queryset = queryset if queryset is not None else Employees.objects.all()
+        self.exact = exact
+        self._candidates = {}  # short_name_key -> сотрудники в порядке сортировки
+
+    def _ordered(self, queryset):
+        return queryset.order_by('last_name', 'first_name', 'middle_name', 'pk')
+
+    def prefetch(self, full_names):
+        """Загружает кандидатов для списка ФИО одним запросом (по частям для длинных списков)"""
+        keys = set()
+        for full_name in full_names:
+            name_parts = split_full_name(full_name)
+            if name_parts:
+                keys.add(employee_name_keys(*name_parts)[1])
+        keys.difference_update(self._candidates)
+        keys = list(keys)
+        for start in range(0, len(keys), PREFETCH_BATCH_SIZE):
+            batch = keys[start:start + PREFETCH_BATCH_SIZE]
+            found = defaultdict(list)
+            for employee in self._ordered(self.queryset.filter(short_name_key__in=batch)):
+                found[employee.short_name_key].append(employee)
+            for key in batch:
+                self._candidates[key] = found.get(key, [])
+
+    def _get_candidates(self, short_key):
+        if short_key not in self._candidates:
+            self._candidates[short_key] = list(self._ordered(self.queryset.filter(short_name_key=short_key)))
+        return self._candidates[short_key]
+
+    def find_all(self, full_name):
+        """Все сотрудники с совпадающим ФИО (при exact=False - по фамилии и имени, лучшие совпадения первыми)"""
+        name_parts = split_full_name(full_name)
+        if not name_parts:
+            return []
+        name_key, short_key = employee_name_keys(*name_parts)
+        candidates = self._get_candidates(short_key)
+        matches = [employee for employee in candidates if employee.name_key == name_key]
+        if self.exact:
+            return matches
+        return matches + [employee for employee in candidates if employee.name_key != name_key]
+
+    def find(self, full_name):
+        """Лучшее совпадение или None"""
+        matches = self.find_all(full_name)
+        return matches[0] if matches else None
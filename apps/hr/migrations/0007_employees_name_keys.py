@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+import apps.hr.models
+
+
+employee_name_keys = apps.hr.models.employee_name_keys
+
+
+def fill_name_keys(apps, schema_editor):
+    """Ключи ФИО для существующих сотрудников (Employees.save в миграции не вызывается)"""
+    Employees = apps.get_model('hr', 'Employees')
+    employees = list(Employees.objects.only('id', 'last_name', 'first_name', 'middle_name'))
+    for employee in employees:
+        employee.name_key, employee.short_name_key = employee_name_keys(
+            employee.last_name, employee.first_name, employee.middle_name
+        )
+    Employees.objects.bulk_update(employees, ['name_key', 'short_name_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0006_employees_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employees',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=452, verbose_name='Ключ ФИО'),
+        ),
+        migrations.AddField(
+            model_name='employees',
+            name='short_name_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=301, verbose_name='Ключ фамилии и имени'),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,18 @@ from django.core.exceptions import ValidationError
 from apps.reference.models import Postname, Departments
 
 
+def normalize_name_part(value):
+    """Нормализация части ФИО для сравнения: регистр, ё/е, лишние пробелы"""
+    return ' '.join((value or '').casefold().replace('ё', 'е').split())
+
+
+def employee_name_keys(last_name, first_name, middle_name=''):
+    """Ключи поиска по ФИО: (фамилия имя отчество, фамилия имя) в нормализованном виде"""
+    short_key = ' '.join(filter(None, (normalize_name_part(last_name), normalize_name_part(first_name))))
+    name_key = ' '.join(filter(None, (short_key, normalize_name_part(middle_name))))
+    return name_key, short_key
+
+
 class Employees(models.Model):
     GENDER_CHOICES = (
         ('M', 'Мужской'),
@@ -38,6 +50,10 @@ class Employees(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE, verbose_name='Статус')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
 
+    # Нормализованные ФИО для поиска по имени (см. apps.hr.matching)
+    name_key = models.CharField(max_length=452, blank=True, db_index=True, editable=False, verbose_name='Ключ ФИО')
+    short_name_key = models.CharField(max_length=301, blank=True, db_index=True, editable=False, verbose_name='Ключ фамилии и имени')
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -46,9 +62,16 @@ class Employees(models.Model):
         verbose_name_plural = 'Сотрудники'
         ordering = ['last_name', 'first_name', 'middle_name']
 
+    def fill_name_keys(self):
+        self.name_key, self.short_name_key = employee_name_keys(self.last_name, self.first_name, self.middle_name)
+
     def save(self, *args, **kwargs):
         # Синхронизируем is_active со статусом для обратной совместимости
         self.is_active = (self.status == self.STATUS_ACTIVE)
+        self.fill_name_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'name_key', 'short_name_key'}
         super().save(*args, **kwargs)
 
     @property
@@ -7,10 +7,14 @@ from django.views.generic import ListView, DetailView, View, CreateView, UpdateV
 from django.http import HttpResponse
 
 from .models import Posts, Employees, PositionHistory
+from .importers import EmployeeCSVImporter, PostCSVImporter
 from .forms import HireNewEmployeeForm, AssignExistingEmployeeForm, MoveEmployeeForm, FreePositionForm, PostsForm, CSVImportForm, PostsCSVImportForm
 from apps.reference.models import Postname, Departments
 import csv
-from datetime import datetime
+
+
+# Сколько строк классификации показывать при пробном импорте сотрудников
+PREVIEW_ROWS_LIMIT = 200
 
 
 @login_required
@@ -294,186 +298,39 @@ class EmployeeCSVImportView(LoginRequiredMixin, View):
                     messages.error(request, 'Файл пуст.')
                     return render(request, 'hr/employee_csv_import.html', {'form': form})
                 
-                imported = 0
-                errors = []
-                
-                # Определяем, есть ли заголовок
-                # Если первая строка содержит "Фамилия" или похожие слова, считаем её заголовком
-                first_line_lower = lines[0].lower()
-                has_header = 'фамилия' in first_line_lower or 'last' in first_line_lower
-                
-                if has_header:
-                    # Используем DictReader с заголовком
-                    csv_reader = csv.DictReader(lines, delimiter=';')
-                    start_row = 2
-                else:
-                    # Используем обычный reader, предполагаем порядок: Фамилия, Имя, Отчество, Дата рождения, Пол, Рабочий телефон, Мобильный телефон, Email, Дата назначения, Дата приказа, Номер приказа
-                    csv_reader = csv.reader(lines, delimiter=';')
-                    start_row = 1
+                importer = EmployeeCSVImporter(dry_run=form.cleaned_data['dry_run'])
+                counts = importer.run(lines)
+                errors = importer.errors
                 
-                for row_num, row_data in enumerate(csv_reader, start=start_row):
-                    try:
-                        if has_header:
-                            # DictReader возвращает словарь
-                            row = row_data
-                            last_name = row.get('Фамилия', '').strip()
-                            first_name = row.get('Имя', '').strip()
-                            middle_name = row.get('Отчество', '').strip()
-                            full_name_accusative = row.get('ФИО в винительном падеже', '').strip()
-                            birth_date_str = row.get('Дата рождения', '').strip()
-                            gender = row.get('Пол', '').strip().upper()
-                            work_phone = row.get('Рабочий телефон', row.get('Телефон', '')).strip()  # Поддержка старого названия
-                            mobile_phone = row.get('Мобильный телефон', '').strip()
-                            ip_phone = row.get('IP-телефон', row.get('IP телефон', '')).strip()
-                            email = row.get('Email', '').strip()
-                            appointment_date_str = row.get('Дата назначения', '').strip()
-                            appointment_order_date_str = row.get('Дата приказа', '').strip()
-                            appointment_order_number = row.get('Номер приказа', '').strip()
-                            status_str = row.get('Статус', '').strip()
-                        else:
-                            # Обычный reader возвращает список
-                            if len(row_data) < 4:
-                                errors.append(f"Строка {row_num}: недостаточно данных (нужно минимум 4 поля)")
-                                continue
-                            
-                            # Определяем формат: новый (с ФИО в винительном падеже и IP-телефоном) или старый
-                            # Проверяем поле 3: если это дата (содержит дефисы и цифры), то старый формат
-                            field3 = row_data[3].strip() if len(row_data) > 3 else ''
-                            is_old_format = False
-                            if field3:
-                                # Проверяем, похоже ли поле 3 на дату (формат YYYY-MM-DD)
-                                try:
-                                    datetime.strptime(field3, '%Y-%m-%d')
-                                    is_old_format = True
-                                except ValueError:
-                                    pass  # Не дата, значит новый формат
-                            
-                            last_name = row_data[0].strip() if len(row_data) > 0 else ''
-                            first_name = row_data[1].strip() if len(row_data) > 1 else ''
-                            middle_name = row_data[2].strip() if len(row_data) > 2 else ''
-                            
-                            if is_old_format:
-                                # Старый формат: Фамилия;Имя;Отчество;Дата рождения;Пол;Рабочий телефон;Мобильный телефон;Email;Дата назначения;Дата приказа;Номер приказа
-                                full_name_accusative = ''
-                                birth_date_str = row_data[3].strip() if len(row_data) > 3 else ''
-                                gender = (row_data[4].strip().upper() if len(row_data) > 4 else '')
-                                work_phone = row_data[5].strip() if len(row_data) > 5 else ''
-                                mobile_phone = row_data[6].strip() if len(row_data) > 6 else ''
-                                ip_phone = ''
-                                email = row_data[7].strip() if len(row_data) > 7 else ''
-                                appointment_date_str = row_data[8].strip() if len(row_data) > 8 else ''
-                                appointment_order_date_str = row_data[9].strip() if len(row_data) > 9 else ''
-                                appointment_order_number = row_data[10].strip() if len(row_data) > 10 else ''
-                                status_str = row_data[11].strip() if len(row_data) > 11 else ''
-                            else:
-                                # Новый формат: Фамилия;Имя;Отчество;ФИО в винительном падеже;Дата рождения;Пол;Рабочий телефон;Мобильный телефон;IP-телефон;Email;Дата назначения;Дата приказа;Номер приказа
-                                full_name_accusative = row_data[3].strip() if len(row_data) > 3 else ''
-                                birth_date_str = row_data[4].strip() if len(row_data) > 4 else ''
-                                gender = (row_data[5].strip().upper() if len(row_data) > 5 else '')
-                                work_phone = row_data[6].strip() if len(row_data) > 6 else ''
-                                mobile_phone = row_data[7].strip() if len(row_data) > 7 else ''
-                                ip_phone = row_data[8].strip() if len(row_data) > 8 else ''
-                                email = row_data[9].strip() if len(row_data) > 9 else ''
-                                appointment_date_str = row_data[10].strip() if len(row_data) > 10 else ''
-                                appointment_order_date_str = row_data[11].strip() if len(row_data) > 11 else ''
-                                appointment_order_number = row_data[12].strip() if len(row_data) > 12 else ''
-                                status_str = row_data[13].strip() if len(row_data) > 13 else ''
-                        
-                        # Валидация обязательных полей
-                        if not last_name or not first_name:
-                            errors.append(f"Строка {row_num}: отсутствует фамилия или имя")
-                            continue
-                        
-                        if not birth_date_str:
-                            errors.append(f"Строка {row_num}: отсутствует дата рождения")
-                            continue
-                        
-                        # Парсим дату
-                        try:
-                            birth_date = datetime.strptime(birth_date_str, '%Y-%m-%d').date()
-                        except ValueError:
-                            errors.append(f"Строка {row_num}: неверный формат даты рождения. Ожидается YYYY-MM-DD, получено: {birth_date_str}")
-                            continue
-                        
-                        # Валидация пола
-                        if gender not in ['M', 'F']:
-                            errors.append(f"Строка {row_num}: неверное значение пола (должно быть M или F), получено: {gender}")
-                            continue
-                        
-                        # Парсим дату назначения (опционально)
-                        appointment_date = None
-                        if appointment_date_str:
-                            try:
-                                appointment_date = datetime.strptime(appointment_date_str, '%Y-%m-%d').date()
-                            except ValueError:
-                                errors.append(f"Строка {row_num}: неверный формат даты назначения. Ожидается YYYY-MM-DD, получено: {appointment_date_str}")
-                                continue
-                        
-                        # Парсим дату приказа (опционально)
-                        appointment_order_date = None
-                        if appointment_order_date_str:
-                            try:
-                                appointment_order_date = datetime.strptime(appointment_order_date_str, '%Y-%m-%d').date()
-                            except ValueError:
-                                errors.append(f"Строка {row_num}: неверный формат даты приказа. Ожидается YYYY-MM-DD, получено: {appointment_order_date_str}")
-                                continue
-                        
-                        # Определяем статус
-                        status = Employees.STATUS_ACTIVE  # По умолчанию активен
-                        if status_str:
-                            status_lower = status_str.lower().strip()
-                            # Маппинг различных вариантов написания
-                            status_map = {
-                                'active': Employees.STATUS_ACTIVE,
-                                'активен': Employees.STATUS_ACTIVE,
-                                'dismissed': Employees.STATUS_DISMISSED,
-                                'уволен': Employees.STATUS_DISMISSED,
-                                'temporary_absence': Employees.STATUS_TEMPORARY_ABSENCE,
-                                'временно отсутствует': Employees.STATUS_TEMPORARY_ABSENCE,
-                                'временно отсутствует': Employees.STATUS_TEMPORARY_ABSENCE,
-                            }
-                            if status_lower in status_map:
-                                status = status_map[status_lower]
-                            else:
-                                # Пытаемся найти по ключу из choices
-                                valid_statuses = [choice[0] for choice in Employees.STATUS_CHOICES]
-                                if status_lower in valid_statuses:
-                                    status = status_lower
-                                else:
-                                    errors.append(f"Строка {row_num}: неверное значение статуса. Допустимые значения: active, dismissed, temporary_absence. Получено: {status_str}")
-                                    continue
-                        
-                        # Создаем сотрудника
-                        employee = Employees.objects.create(
-                            last_name=last_name,
-                            first_name=first_name,
-                            middle_name=middle_name,
-                            full_name_accusative=full_name_accusative if full_name_accusative else '',
-                            birth_date=birth_date,
-                            gender=gender,
-                            work_phone=work_phone if work_phone else '',
-                            mobile_phone=mobile_phone if mobile_phone else '',
-                            ip_phone=ip_phone if ip_phone else '',
-                            email=email if email else '',
-                            appointment_date=appointment_date,
-                            appointment_order_date=appointment_order_date,
-                            appointment_order_number=appointment_order_number if appointment_order_number else '',
-                            status=status
-                        )
-                        imported += 1
-                        
-                    except Exception as e:
-                        errors.append(f"Строка {row_num}: ошибка при обработке - {str(e)}")
+                if importer.dry_run:
+                    messages.info(
+                        request,
+                        f"Проверка файла: будет добавлено {counts['insert']}, обновлено {counts['update']}, "
+                        f"дубликатов {counts['duplicate']}, ошибок {len(errors)}"
+                    )
+                    for error in errors[:20]:
+                        messages.warning(request, error)
+                    if len(errors) > 20:
+                        messages.warning(request, f'... и еще {len(errors) - 20} ошибок')
+                    return render(request, 'hr/employee_csv_import.html', {
+                        'form': CSVImportForm(),
+                        'preview_rows': importer.rows[:PREVIEW_ROWS_LIMIT],
+                        'preview_total': len(importer.rows),
+                    })
                 
-                if imported > 0:
-                    messages.success(request, f'Успешно импортировано сотрудников: {imported}')
+                if counts['insert'] > 0:
+                    messages.success(request, f"Успешно импортировано сотрудников: {counts['insert']}")
+                if counts['update'] > 0:
+                    messages.success(request, f"Обновлено сотрудников: {counts['update']}")
+                if counts['duplicate'] > 0:
+                    messages.info(request, f"Пропущено дубликатов: {counts['duplicate']}")
                 if errors:
                     for error in errors[:20]:  # Показываем первые 20 ошибок
                         messages.warning(request, error)
                     if len(errors) > 20:
                         messages.warning(request, f'... и еще {len(errors) - 20} ошибок')
                 
-                if imported == 0 and not errors:
+                if not any(counts.values()) and not errors:
                     messages.info(request, 'Нет данных для импорта. Проверьте формат файла.')
                 
                 return redirect('hr:employees')
@@ -576,147 +433,9 @@ class PostCSVImportView(LoginRequiredMixin, View):
                     messages.error(request, 'Файл пуст.')
                     return render(request, 'hr/post_csv_import.html', {'form': form})
                 
-                imported = 0
-                errors = []
-                
-                # Определяем, есть ли заголовок
-                first_line_lower = lines[0].lower()
-                has_header = 'должность' in first_line_lower or 'подразделение' in first_line_lower or 'post' in first_line_lower
-                
-                if has_header:
-                    csv_reader = csv.DictReader(lines, delimiter=';')
-                    start_row = 2
-                else:
-                    csv_reader = csv.reader(lines, delimiter=';')
-                    start_row = 1
-                
-                for row_num, row_data in enumerate(csv_reader, start=start_row):
-                    try:
-                        if has_header:
-                            row = row_data
-                            postname_str = row.get('Должность', '').strip()
-                            department_str = row.get('Подразделение', '').strip()
-                            employee_str = row.get('Сотрудник', '').strip()
-                            status_str = row.get('Статус', '').strip().lower()
-                            is_active_str = row.get('Активна', '').strip()
-                        else:
-                            if len(row_data) < 2:
-                                errors.append(f"Строка {row_num}: недостаточно данных (нужно минимум 2 поля: Должность, Подразделение)")
-                                continue
-                            postname_str = row_data[0].strip() if len(row_data) > 0 else ''
-                            department_str = row_data[1].strip() if len(row_data) > 1 else ''
-                            employee_str = row_data[2].strip() if len(row_data) > 2 else ''
-                            status_str = row_data[3].strip().lower() if len(row_data) > 3 else ''
-                            is_active_str = row_data[4].strip() if len(row_data) > 4 else ''
-                        
-                        # Валидация обязательных полей
-                        if not postname_str:
-                            errors.append(f"Строка {row_num}: отсутствует должность")
-                            continue
-                        
-                        if not department_str:
-                            errors.append(f"Строка {row_num}: отсутствует подразделение")
-                            continue
-                        
-                        # Поиск должности по названию или коду
-                        postname = None
-                        try:
-                            postname = Postname.objects.get(name=postname_str, is_active=True)
-                        except Postname.DoesNotExist:
-                            try:
-                                postname = Postname.objects.get(code=postname_str, is_active=True)
-                            except Postname.DoesNotExist:
-                                errors.append(f"Строка {row_num}: должность не найдена: {postname_str}")
-                                continue
-                        
-                        # Поиск подразделения по названию или коду
-                        department = None
-                        try:
-                            department = Departments.objects.get(name=department_str, is_active=True)
-                        except Departments.DoesNotExist:
-                            try:
-                                department = Departments.objects.get(code=department_str, is_active=True)
-                            except Departments.DoesNotExist:
-                                errors.append(f"Строка {row_num}: подразделение не найдено: {department_str}")
-                                continue
-                        
-                        # Поиск сотрудника по ФИО (опционально)
-                        employee = None
-                        if employee_str:
-                            # Разбиваем ФИО на части
-                            employee_parts = employee_str.split()
-                            if len(employee_parts) >= 2:
-                                last_name = employee_parts[0]
-                                first_name = employee_parts[1]
-                                middle_name = employee_parts[2] if len(employee_parts) > 2 else ''
-                                
-                                try:
-                                    employee = Employees.objects.get(
-                                        last_name=last_name,
-                                        first_name=first_name,
-                                        middle_name=middle_name,
-                                        is_active=True
-                                    )
-                                except Employees.DoesNotExist:
-                                    errors.append(f"Строка {row_num}: сотрудник не найден: {employee_str}")
-                                    continue
-                                except Employees.MultipleObjectsReturned:
-                                    # Если несколько сотрудников, берем первого
-                                    employee = Employees.objects.filter(
-                                        last_name=last_name,
-                                        first_name=first_name,
-                                        middle_name=middle_name,
-                                        is_active=True
-                                    ).first()
-                                    errors.append(f"Строка {row_num}: найдено несколько сотрудников с ФИО {employee_str}, выбран первый")
-                        
-                        # Определяем статус
-                        status = Posts.STATUS_VACANT
-                        if status_str:
-                            if status_str in ['occupied', 'занята', 'занято']:
-                                status = Posts.STATUS_OCCUPIED
-                            elif status_str in ['vacant', 'вакантна', 'вакантно']:
-                                status = Posts.STATUS_VACANT
-                            else:
-                                errors.append(f"Строка {row_num}: неверное значение статуса (должно быть vacant/occupied), получено: {status_str}")
-                                continue
-                        
-                        # Проверяем согласованность статуса и сотрудника
-                        if status == Posts.STATUS_OCCUPIED and not employee:
-                            errors.append(f"Строка {row_num}: для статуса 'занята' необходимо указать сотрудника")
-                            continue
-                        
-                        if status == Posts.STATUS_VACANT and employee:
-                            errors.append(f"Строка {row_num}: для статуса 'вакантна' не должен быть указан сотрудник")
-                            continue
-                        
-                        # Определяем is_active
-                        is_active = True
-                        if is_active_str:
-                            is_active_str_lower = is_active_str.lower()
-                            if is_active_str_lower in ['false', '0', 'нет', 'no']:
-                                is_active = False
-                            elif is_active_str_lower in ['true', '1', 'да', 'yes']:
-                                is_active = True
-                        
-                        # Создаем позицию
-                        post = Posts(
-                            postname=postname,
-                            department=department,
-                            employee=employee,
-                            status=status,
-                            is_active=is_active
-                        )
-                        try:
-                            post.full_clean()
-                            post.save()
-                            imported += 1
-                        except Exception as validation_error:
-                            errors.append(f"Строка {row_num}: ошибка валидации - {str(validation_error)}")
-                            continue
-                        
-                    except Exception as e:
-                        errors.append(f"Строка {row_num}: ошибка при обработке - {str(e)}")
+                importer = PostCSVImporter()
+                imported = importer.run(lines)
+                errors = importer.errors
                 
                 if imported > 0:
                     messages.success(request, f'Успешно импортировано позиций: {imported}')
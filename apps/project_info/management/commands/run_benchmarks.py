@@ -0,0 +1,181 @@
+"""
+Набор бенчмарков для горячих страниц платформы.
+
+Каждый сценарий выполняется через тестовый клиент Django внутри транзакции,
+которая откатывается по завершении, поэтому запуск не изменяет данные.
+Результат (время и количество SQL-запросов) выводится в JSON, чтобы
+сравнивать замеры между коммитами.
+
+Пример:
+    python manage.py seed_synthetic_org
+    python manage.py run_benchmarks --repeat 5 --output bench.json
+"""
+import json
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.reference.models import ITAsset
+from apps.hr.models import Employees
+from apps.apps_testing.tests.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Запускает набор бенчмарков горячих страниц и выводит время и количество SQL-запросов в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Количество повторов каждого сценария')
+        parser.add_argument('--only', nargs='*', help='Запустить только указанные сценарии')
+        parser.add_argument('--certificates', type=int, default=200,
+                            help='Количество сертификатов в HTML-файле для сценария импорта')
+        parser.add_argument('--output', help='Файл для записи результатов (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                results = self._run(options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'revision': self._git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'repeat': options['repeat'],
+            'benchmarks': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def _run(self, options):
+        user = User.objects.create_superuser('benchmark_runner', password=None)
+        client = Client()
+        client.force_login(user)
+
+        results = []
+        for name, method, url, data in self._scenarios(options):
+            if options['only'] and name not in options['only']:
+                continue
+            timings = []
+            queries = []
+            status_code = None
+            for _ in range(options['repeat']):
+                # Каждый повтор в своей точке сохранения, чтобы POST-сценарии не влияли друг на друга
+                sid = transaction.savepoint()
+                payload = data() if callable(data) else data
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    if method == 'post':
+                        response = client.post(url, payload)
+                    else:
+                        response = client.get(url, payload)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append((time.perf_counter() - start) * 1000)
+                transaction.savepoint_rollback(sid)
+                queries.append(len(captured))
+                status_code = response.status_code
+
+            results.append({
+                'name': name,
+                'method': method.upper(),
+                'url': url,
+                'status': status_code,
+                'wall_ms': {
+                    'min': round(min(timings), 2),
+                    'median': round(statistics.median(timings), 2),
+                    'max': round(max(timings), 2),
+                },
+                'queries': max(queries),
+            })
+            self.stderr.write(f'{name}: {statistics.median(timings):.1f} мс, {max(queries)} запросов')
+        return results
+
+    def _scenarios(self, options):
+        """Список сценариев: (имя, метод, URL, параметры)"""
+        system = ITAsset.objects.filter(is_active=True).order_by('-pk').first()
+        test = Test.objects.order_by('-pk').first()
+        if system is None or test is None:
+            raise CommandError('Нет данных для бенчмарка. Сначала выполните seed_synthetic_org.')
+
+        today = timezone.now().date()
+        analytics_params = {
+            'start_date': (today - timedelta(days=365)).isoformat(),
+            'end_date': today.isoformat(),
+            'test': test.pk,
+            'include_all_sets': 'on',
+        }
+        certificates = options['certificates']
+
+        return [
+            ('directory', 'get', reverse('directory:directory'), {}),
+            ('directory_search', 'get', reverse('directory:directory'), {'search': 'Иван'}),
+            ('posts_list', 'get', reverse('hr:posts'), {}),
+            ('report_system_access_active', 'get', reverse('access:report_system_access_active'),
+             {'system': system.pk, 'status': 'active'}),
+            ('report_system_access_active_csv', 'get', reverse('access:report_system_access_active'),
+             {'system': system.pk, 'status': 'active', 'format': 'csv'}),
+            ('report_system_access_expiring', 'get', reverse('access:report_system_access_expiring'),
+             {'report_type': ['needs_update', 'expired', 'expiring'], 'days': 40}),
+            ('report_signature_active', 'get', reverse('access:report_signature_active'), {'status': 'active'}),
+            ('report_signature_missing', 'get', reverse('access:report_signature_missing'), {'active_only': 'on'}),
+            ('report_signature_missing_excel', 'get', reverse('access:report_signature_missing'),
+             {'active_only': 'on', 'format': 'excel'}),
+            ('report_signature_expiring', 'get', reverse('access:report_signature_expiring'),
+             {'days': 40, 'active_only': 'on'}),
+            ('results_list', 'get', reverse('moderator:result_list'), {}),
+            ('question_error_analytics', 'get', reverse('moderator:question_error_analytics'), analytics_params),
+            ('certificate_import', 'post', reverse('access:digital_signature_import'),
+             lambda: {'html_file': self._certificate_html(certificates)}),
+        ]
+
+    def _certificate_html(self, count):
+        """HTML-файл в формате портала УЦ с сертификатами существующих сотрудников"""
+        employees = Employees.objects.order_by('-pk')[:count]
+        expiry = (timezone.now().date() + timedelta(days=365)).strftime('%d.%m.%Y')
+        items = []
+        for index, employee in enumerate(employees):
+            items.append(
+                '<div class="cert-item">'
+                '<div class="cert-item-content contWidth1"><div>'
+                '<div><b>Сертификат должностного лица</b></div>'
+                f'<div>№ 7F 00 BE {index:08X}</div>'
+                '</div></div>'
+                '<div class="cert-item-content contWidth2">'
+                f'<div class="owner-name"><b>{employee}</b></div>'
+                '</div>'
+                '<div class="cert-item-content-right"><table>'
+                f'<tr><td>Действует до</td><td><b>{expiry}</b></td></tr>'
+                '</table></div>'
+                '</div>'
+            )
+        content = '<html><body>' + ''.join(items) + '</body></html>'
+        return SimpleUploadedFile('benchmark.html', content.encode('utf-8'), content_type='text/html')
+
+    @staticmethod
+    def _git_revision():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
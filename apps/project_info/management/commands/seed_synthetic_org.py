@@ -0,0 +1,333 @@
+"""
+Генерация синтетической организации для нагрузочного тестирования.
+
+Создает дерево подразделений, должности, штатные позиции, сотрудников,
+доступы к системам, цифровые подписи, наборы вопросов и историю тестирования.
+Все записи создаются через bulk_create, сигналы post_save не вызываются;
+вычисляемые поля (ключи ФИО, хэши вопросов и сертификатов) и статистика
+ответов по вопросам (QuestionDailyStats) заполняются явно.
+
+Пример:
+    python manage.py seed_synthetic_org --depth 3 --fanout 6 --posts-per-department 8
+"""
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.reference.models import Departments, Postname, ITAsset, CertificateType
+from apps.hr.models import Employees, Posts
+from apps.access_management.models import SystemAccess, DigitalSignature
+from apps.apps_testing.tests.models import QuestionSet, Question, Test, TestSession, UserAnswer, TestResult
+from apps.apps_testing.tests.utils import add_question_stats
+
+
+LAST_NAMES = [
+    'Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов',
+    'Михайлов', 'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов',
+]
+FIRST_NAMES_M = ['Александр', 'Алексей', 'Андрей', 'Дмитрий', 'Иван', 'Максим', 'Михаил', 'Сергей']
+FIRST_NAMES_F = ['Анна', 'Елена', 'Мария', 'Наталья', 'Ольга', 'Светлана', 'Татьяна', 'Юлия']
+MIDDLE_NAMES_M = ['Александрович', 'Андреевич', 'Иванович', 'Петрович', 'Сергеевич', 'Викторович']
+MIDDLE_NAMES_F = ['Александровна', 'Андреевна', 'Ивановна', 'Петровна', 'Сергеевна', 'Викторовна']
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетическую организацию (подразделения, сотрудники, доступы, тесты) для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='SYN', help='Префикс кодов создаваемых записей')
+        parser.add_argument('--depth', type=int, default=3, help='Глубина дерева подразделений (без корня)')
+        parser.add_argument('--fanout', type=int, default=5, help='Количество дочерних подразделений у каждого узла')
+        parser.add_argument('--postnames', type=int, default=20, help='Количество должностей')
+        parser.add_argument('--posts-per-department', type=int, default=5, help='Штатных позиций на подразделение')
+        parser.add_argument('--occupancy', type=float, default=0.9, help='Доля занятых позиций (0..1)')
+        parser.add_argument('--systems', type=int, default=5, help='Количество информационных систем')
+        parser.add_argument('--access-ratio', type=float, default=0.7, help='Доля сотрудников с доступом к каждой системе')
+        parser.add_argument('--signature-ratio', type=float, default=0.6, help='Доля сотрудников с цифровой подписью')
+        parser.add_argument('--question-sets', type=int, default=5, help='Количество наборов вопросов')
+        parser.add_argument('--questions-per-set', type=int, default=40, help='Количество вопросов в наборе')
+        parser.add_argument('--sessions', type=int, default=500, help='Количество сессий тестирования')
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+
+        if Departments.objects.filter(code__startswith=f'{self.prefix}-').exists():
+            raise CommandError(
+                f'Записи с префиксом "{self.prefix}" уже существуют. Укажите другой --prefix.'
+            )
+
+        with transaction.atomic():
+            departments = self._create_departments(options['depth'], options['fanout'])
+            postnames = self._create_postnames(options['postnames'])
+            employees, posts = self._create_posts_and_employees(
+                departments, postnames, options['posts_per_department'], options['occupancy']
+            )
+            accesses = self._create_system_accesses(employees, options['systems'], options['access_ratio'])
+            signatures = self._create_signatures(employees, options['signature_ratio'])
+            test, questions = self._create_questions(options['question_sets'], options['questions_per_set'])
+            sessions, answers = self._create_sessions(test, questions, departments, postnames, options['sessions'])
+
+        summary = [
+            ('Подразделения', len(departments)),
+            ('Должности', len(postnames)),
+            ('Штатные позиции', len(posts)),
+            ('Сотрудники', len(employees)),
+            ('Доступы к системам', accesses),
+            ('Цифровые подписи', signatures),
+            ('Вопросы', len(questions)),
+            ('Сессии тестирования', sessions),
+            ('Ответы', answers),
+        ]
+        for label, count in summary:
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Синтетическая организация "{self.prefix}" создана.'))
+
+    def _create_departments(self, depth, fanout):
+        """Дерево подразделений с корректными путями sorting (001.002.003)"""
+        root_sorting = Departments.allocate_sorting_code(parent=None)
+        root = Departments.objects.create(
+            name=f'{self.prefix} Организация',
+            code=f'{self.prefix}-{root_sorting}',
+            sorting=root_sorting,
+        )
+        departments = [root]
+        level = [root]
+        for _ in range(depth):
+            children = []
+            for parent in level:
+                for index in range(1, fanout + 1):
+                    sorting = f'{parent.sorting}.{index:03d}'
+                    children.append(Departments(
+                        name=f'{self.prefix} Отдел {sorting}',
+                        code=f'{self.prefix}-{sorting}',
+                        sorting=sorting,
+                        parent=parent,
+                    ))
+            Departments.objects.bulk_create(children, batch_size=BATCH_SIZE)
+            departments.extend(children)
+            level = children
+        Departments.invalidate_tree_cache()
+        return departments
+
+    def _create_postnames(self, count):
+        postnames = [
+            Postname(
+                name=f'{self.prefix} Должность {index:03d}',
+                code=f'{self.prefix}-P{index:03d}',
+                sorting=f'{index:03d}',
+            )
+            for index in range(1, count + 1)
+        ]
+        return Postname.objects.bulk_create(postnames, batch_size=BATCH_SIZE)
+
+    def _random_person(self):
+        gender = self.rng.choice(['M', 'F'])
+        last_name = self.rng.choice(LAST_NAMES)
+        if gender == 'F':
+            last_name += 'а'
+            first_name = self.rng.choice(FIRST_NAMES_F)
+            middle_name = self.rng.choice(MIDDLE_NAMES_F)
+        else:
+            first_name = self.rng.choice(FIRST_NAMES_M)
+            middle_name = self.rng.choice(MIDDLE_NAMES_M)
+        return gender, last_name, first_name, middle_name
+
+    def _create_posts_and_employees(self, departments, postnames, per_department, occupancy):
+        employees = []
+        post_specs = []
+        for department in departments:
+            for _ in range(per_department):
+                occupied = self.rng.random() < occupancy
+                if occupied:
+                    gender, last_name, first_name, middle_name = self._random_person()
+                    employees.append(Employees(
+                        last_name=last_name,
+                        first_name=first_name,
+                        middle_name=middle_name,
+                        gender=gender,
+                        birth_date=date(1960, 1, 1) + timedelta(days=self.rng.randint(0, 15000)),
+                        email=f'{self.prefix.lower()}{len(employees)}@example.org',
+                        work_phone=f'{self.rng.randint(100000, 999999)}',
+                    ))
+                post_specs.append((department, self.rng.choice(postnames), employees[-1] if occupied else None))
+
+        # bulk_create не вызывает save(): ключи поиска по ФИО заполняются явно
+        for employee in employees:
+            employee.fill_name_keys()
+        Employees.objects.bulk_create(employees, batch_size=BATCH_SIZE)
+
+        posts = [
+            Posts(
+                department=department,
+                postname=postname,
+                employee=employee,
+                status=Posts.STATUS_OCCUPIED if employee else Posts.STATUS_VACANT,
+            )
+            for department, postname, employee in post_specs
+        ]
+        Posts.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+        return employees, posts
+
+    def _create_system_accesses(self, employees, systems_count, ratio):
+        systems = ITAsset.objects.bulk_create([
+            ITAsset(name=f'{self.prefix} Система {index}') for index in range(1, systems_count + 1)
+        ])
+        today = timezone.now().date()
+        statuses = [
+            SystemAccess.STATUS_ACTIVE, SystemAccess.STATUS_ACTIVE, SystemAccess.STATUS_ACTIVE,
+            SystemAccess.STATUS_SUSPENDED, SystemAccess.STATUS_NEEDS_UPDATE,
+        ]
+        accesses = []
+        for system in systems:
+            for employee in employees:
+                if self.rng.random() >= ratio:
+                    continue
+                granted = today - timedelta(days=self.rng.randint(30, 1500))
+                blocked = today + timedelta(days=self.rng.randint(-60, 365)) if self.rng.random() < 0.5 else None
+                accesses.append(SystemAccess(
+                    employee=employee,
+                    system=system,
+                    login=f'{self.prefix.lower()}_{employee.pk}_{system.pk}',
+                    status=self.rng.choice(statuses),
+                    access_granted_date=granted,
+                    access_blocked_date=blocked if blocked and blocked > granted else None,
+                ))
+        SystemAccess.objects.bulk_create(accesses, batch_size=BATCH_SIZE)
+        return len(accesses)
+
+    def _create_signatures(self, employees, ratio):
+        certificate_type, _ = CertificateType.objects.get_or_create(
+            name='Сертификат должностного лица',
+            defaults={'is_active': True},
+        )
+        today = timezone.now().date()
+        signatures = []
+        for employee in employees:
+            if self.rng.random() >= ratio:
+                continue
+            signatures.append(DigitalSignature(
+                employee=employee,
+                certificate_type=certificate_type,
+                certificate_serial=uuid.UUID(int=self.rng.getrandbits(128)).hex.upper(),
+                certificate_alias=uuid.UUID(int=self.rng.getrandbits(128)).hex,
+                expiry_date=today + timedelta(days=self.rng.randint(-30, 400)),
+                status=DigitalSignature.STATUS_ACTIVE,
+            ))
+        # bulk_create не вызывает save(): ключи серийного номера и отпечатка заполняются явно
+        for signature in signatures:
+            signature.fill_keys()
+        DigitalSignature.objects.bulk_create(signatures, batch_size=BATCH_SIZE)
+        return len(signatures)
+
+    def _create_questions(self, sets_count, per_set):
+        question_sets = QuestionSet.objects.bulk_create([
+            QuestionSet(title=f'{self.prefix} Набор {index}', description='Синтетический набор вопросов')
+            for index in range(1, sets_count + 1)
+        ])
+        questions = []
+        for question_set in question_sets:
+            for index in range(1, per_set + 1):
+                questions.append(Question(
+                    question_set=question_set,
+                    text=f'{question_set.title}: вопрос {index}',
+                    option_1='Вариант 1',
+                    option_2='Вариант 2',
+                    option_3='Вариант 3',
+                    option_4='Вариант 4',
+                    correct_option=self.rng.randint(1, 4),
+                ))
+        for question in questions:
+            question.content_hash = question.compute_content_hash()
+        Question.objects.bulk_create(questions, batch_size=BATCH_SIZE)
+
+        test = Test.objects.create(
+            title=f'{self.prefix} Тест',
+            password=self.prefix.lower(),
+            time_limit=30,
+            questions_per_set=min(per_set, 10),
+        )
+        test.question_sets.set(question_sets)
+        return test, questions
+
+    def _create_sessions(self, test, questions, departments, postnames, count):
+        """Сессии тестирования с ответами; 90% сессий завершены и имеют результат"""
+        by_set = {}
+        for question in questions:
+            by_set.setdefault(question.question_set_id, []).append(question)
+
+        now = timezone.now()
+        sessions = []
+        selected = []
+        for _ in range(count):
+            chosen = []
+            for set_questions in by_set.values():
+                chosen.extend(self.rng.sample(set_questions, min(len(set_questions), test.questions_per_set)))
+            self.rng.shuffle(chosen)
+            gender, last_name, first_name, middle_name = self._random_person()
+            start_time = now - timedelta(days=self.rng.randint(0, 90), minutes=self.rng.randint(0, 600))
+            completed = self.rng.random() < 0.9
+            sessions.append(TestSession(
+                test=test,
+                first_name=first_name,
+                last_name=last_name,
+                middle_name=middle_name,
+                department=self.rng.choice(departments),
+                postname=self.rng.choice(postnames),
+                session_key=uuid.UUID(int=self.rng.getrandbits(128)).hex,
+                start_time=start_time,
+                end_time=start_time + timedelta(minutes=self.rng.randint(5, test.time_limit)) if completed else None,
+                is_completed=completed,
+                selected_questions={'order': [question.id for question in chosen]},
+                ip_address=f'10.0.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}',
+            ))
+            selected.append(chosen)
+        TestSession.objects.bulk_create(sessions, batch_size=BATCH_SIZE)
+
+        answers = []
+        results = []
+        for session, chosen in zip(sessions, selected):
+            answered = correct = 0
+            for question in chosen:
+                if self.rng.random() < 0.1:
+                    continue
+                # Правильный ответ выбирается с вероятностью 70%
+                if self.rng.random() < 0.7:
+                    option = question.correct_option
+                else:
+                    option = self.rng.choice([o for o in (1, 2, 3, 4) if o != question.correct_option])
+                is_correct = option == question.correct_option
+                answers.append(UserAnswer(
+                    session=session,
+                    question=question,
+                    selected_option=option,
+                    is_correct=is_correct,
+                ))
+                answered += 1
+                correct += is_correct
+            if session.is_completed:
+                total = len(chosen)
+                results.append(TestResult(
+                    session=session,
+                    total_questions=total,
+                    answered_questions=answered,
+                    correct_answers=correct,
+                    skipped_questions=total - answered,
+                    percentage=(Decimal(correct) / Decimal(total) * 100) if total else Decimal(0),
+                ))
+        UserAnswer.objects.bulk_create(answers, batch_size=BATCH_SIZE)
+        TestResult.objects.bulk_create(results, batch_size=BATCH_SIZE)
+
+        # Статистика по вопросам учитывает только сессии с результатом, как при подсчете результатов
+        scored_ids = [result.session_id for result in results]
+        for start in range(0, len(scored_ids), BATCH_SIZE):
+            add_question_stats(scored_ids[start:start + BATCH_SIZE])
+        return len(sessions), len(answers)
@@ -48,27 +48,23 @@ class DepartmentsAdmin(admin.ModelAdmin):
                 messages.error(request, _('Нельзя деактивировать подразделение: существуют связанные позиции.'))
                 return
         
-        # Сохраняем старый parent для проверки изменений
-        old_parent = None
+        # Сохраняем старый parent для проверки изменений (у нового подразделения parent не меняется)
+        parent_changed = False
         if change and obj.pk:
             try:
                 old_instance = Departments.objects.get(pk=obj.pk)
-                old_parent = old_instance.parent
+                parent_changed = old_instance.parent != obj.parent
             except Departments.DoesNotExist:
                 pass
         
-        # Если sorting не заполнен, генерируем автоматически
-        if not obj.sorting:
-            obj.sorting = Departments.get_next_sorting_code(parent=obj.parent, exclude_pk=obj.pk)
-        
-        # Если parent изменился, обновляем sorting
-        if old_parent != obj.parent:
-            obj.sorting = Departments.get_next_sorting_code(parent=obj.parent, exclude_pk=obj.pk)
+        # Код выделяется один раз: если sorting не заполнен или сменился parent
+        if not obj.sorting or parent_changed:
+            obj.sorting = Departments.allocate_sorting_code(parent=obj.parent)
         
         super().save_model(request, obj, form, change)
         
         # Обновляем дочерние элементы после сохранения, если parent изменился
-        if old_parent != obj.parent:
+        if parent_changed:
             obj.update_children_sorting()
     
     def get_form(self, request, obj=None, **kwargs):
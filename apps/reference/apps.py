@@ -5,3 +5,6 @@ class ReferenceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reference'
     verbose_name = 'Справочники'
+    
+    def ready(self):
+        import apps.reference.signals  # noqa
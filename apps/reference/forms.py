@@ -94,24 +94,21 @@ class DepartmentForm(forms.ModelForm):
         """Переопределяем save для автоматической генерации sorting"""
         instance = super().save(commit=False)
         
-        # Сохраняем старый parent для проверки изменений
-        old_parent = None
-        if instance.pk:
+        # Сохраняем старый parent для проверки изменений (у нового подразделения parent не меняется)
+        parent_changed = False
+        if not instance._state.adding:
             try:
                 old_instance = Departments.objects.get(pk=instance.pk)
-                old_parent = old_instance.parent
+                parent_changed = old_instance.parent != instance.parent
             except Departments.DoesNotExist:
                 pass
         
-        # Если sorting не заполнен, генерируем автоматически
-        if not instance.sorting:
-            instance.sorting = Departments.get_next_sorting_code(parent=instance.parent, exclude_pk=instance.pk)
+        # Код выделяется один раз: если sorting не заполнен или сменился parent
+        if not instance.sorting or parent_changed:
+            instance.sorting = Departments.allocate_sorting_code(parent=instance.parent)
         
-        # Если parent изменился, обновляем sorting и дочерние элементы
-        if old_parent != instance.parent:
-            # Генерируем новый sorting на основе нового parent
-            instance.sorting = Departments.get_next_sorting_code(parent=instance.parent, exclude_pk=instance.pk)
-            
+        # Если parent изменился, обновляем дочерние элементы
+        if parent_changed:
             if commit:
                 instance.save()
                 # Обновляем дочерние элементы после сохранения
@@ -0,0 +1,324 @@
+"""
+Массовый импорт подразделений из CSV.
+
+Импорт выполняется в два прохода:
+1. Разбор и валидация всех строк файла в памяти; родители ищутся по словарям
+   кодов и названий (один запрос к БД) и среди строк самого файла.
+2. Строки упорядочиваются по уровням (родитель раньше потомков), коды сортировки
+   выделяются в памяти, записи создаются через bulk_create пачками в одной транзакции.
+"""
+import csv
+import re
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Departments
+
+
+SORTING_RE = re.compile(r'^(\d{3})(\.\d{3})*$')
+
+TRUE_VALUES = ['true', '1', 'да', 'yes']
+FALSE_VALUES = ['false', '0', 'нет', 'no']
+
+# Порядок колонок для файла без заголовка
+COLUMNS = [
+    ('name', 'Название'),
+    ('code', 'Код'),
+    ('sorting', 'Код сортировки'),
+    ('description', 'Описание'),
+    ('dep_short_name', 'Короткое наименование'),
+    ('email', 'Email'),
+    ('zipcode', 'Почтовый индекс'),
+    ('city', 'Город'),
+    ('street', 'Улица'),
+    ('bldg', 'Здание'),
+    ('net_id', 'Идентификатор узла'),
+    ('ip', 'IP адрес'),
+    ('mask', 'Маска'),
+    ('parent', 'Родительское подразделение'),
+    ('is_logical', 'Логическое'),
+    ('is_active', 'Активно'),
+]
+
+BULK_BATCH_SIZE = 500
+
+
+class DepartmentCSVImporter:
+    """
+    Импортер подразделений из CSV (разделитель ';').
+
+    Использование:
+        importer = DepartmentCSVImporter()
+        imported = importer.run(lines)
+        importer.errors  # список сообщений об ошибках по строкам
+    """
+
+    def __init__(self):
+        self.errors = []
+
+    # --- Проход 1: разбор строк ---
+
+    def parse(self, lines):
+        """Разбирает строки файла в список (номер строки, словарь полей)"""
+        first_line_lower = lines[0].lower()
+        has_header = 'название' in first_line_lower or 'name' in first_line_lower or 'подразделение' in first_line_lower
+
+        rows = []
+        if has_header:
+            for row_num, row in enumerate(csv.DictReader(lines, delimiter=';'), start=2):
+                rows.append((row_num, {
+                    field: (row.get(title) or '').strip() for field, title in COLUMNS
+                }))
+        else:
+            for row_num, row in enumerate(csv.reader(lines, delimiter=';'), start=1):
+                if len(row) < 2:
+                    self.errors.append(f"Строка {row_num}: недостаточно данных (нужно минимум 2 поля: Название, Код)")
+                    continue
+                rows.append((row_num, {
+                    field: row[index].strip() if len(row) > index else ''
+                    for index, (field, _) in enumerate(COLUMNS)
+                }))
+        return rows
+
+    def _build_department(self, row_num, data):
+        """Создает несохраненный объект Departments из полей строки или возвращает None при ошибке"""
+        if not data['name'] or not data['code']:
+            self.errors.append(f"Строка {row_num}: отсутствует название или код")
+            return None
+
+        is_logical = data['is_logical'].lower() in TRUE_VALUES if data['is_logical'] else False
+        is_active = data['is_active'].lower() not in FALSE_VALUES if data['is_active'] else True
+
+        mask = None
+        if data['mask']:
+            try:
+                mask = int(data['mask'])
+            except ValueError:
+                self.errors.append(f"Строка {row_num}: неверный формат маски: {data['mask']}")
+                return None
+            if mask < 0 or mask > 32:
+                self.errors.append(f"Строка {row_num}: маска должна быть в диапазоне от 0 до 32")
+                return None
+
+        if data['net_id'] and len(data['net_id']) > 4:
+            self.errors.append(f"Строка {row_num}: идентификатор узла должен содержать не более 4 символов")
+            return None
+
+        if data['email'] and '@' not in data['email']:
+            self.errors.append(f"Строка {row_num}: неверный формат email: {data['email']}")
+            return None
+
+        if data['sorting'] and not SORTING_RE.match(data['sorting']):
+            self.errors.append(
+                f"Строка {row_num}: неверный формат кода сортировки: {data['sorting']}. "
+                f"Должен быть в формате: 001, 001.001, 001.002.001 и т.д."
+            )
+            return None
+
+        department = Departments(
+            name=data['name'],
+            code=data['code'],
+            sorting=data['sorting'],
+            description=data['description'],
+            dep_short_name=data['dep_short_name'],
+            email=data['email'],
+            zipcode=data['zipcode'],
+            city=data['city'],
+            street=data['street'],
+            bldg=data['bldg'],
+            net_id=data['net_id'],
+            ip=data['ip'] or None,
+            mask=mask,
+            is_logical=is_logical,
+            is_active=is_active,
+        )
+
+        # Валидация полей без обращений к БД: уникальность кода и родитель проверяются по словарям
+        try:
+            department.full_clean(exclude=['parent', 'sorting'], validate_unique=False, validate_constraints=False)
+        except ValidationError as e:
+            if hasattr(e, 'error_dict'):
+                error_msg = "; ".join(
+                    f"{field}: {err.message}" for field, field_errors in e.error_dict.items() for err in field_errors
+                )
+            else:
+                error_msg = str(e)
+            self.errors.append(f"Строка {row_num}: ошибка валидации - {error_msg}")
+            return None
+        return department
+
+    # --- Проход 2: разрешение родителей, коды сортировки, запись ---
+
+    def run(self, lines):
+        """Импортирует строки файла. Возвращает количество созданных подразделений."""
+        parsed = self.parse(lines)
+
+        # Существующие подразделения: коды, названия (активные) и коды сортировки - одним запросом
+        existing_codes = set()
+        existing_by_code = {}
+        existing_by_name = defaultdict(list)
+        existing_sortings = set()
+        for dept in Departments.objects.only('pk', 'name', 'code', 'sorting', 'is_active'):
+            existing_codes.add(dept.code)
+            if dept.sorting:
+                existing_sortings.add(dept.sorting)
+            if dept.is_active:
+                existing_by_code[dept.code] = dept
+                existing_by_name[dept.name].append(dept)
+
+        # Строки файла с корректными полями и уникальными кодами
+        entries = []
+        file_codes = set()
+        for row_num, data in parsed:
+            try:
+                department = self._build_department(row_num, data)
+            except Exception as e:
+                self.errors.append(f"Строка {row_num}: ошибка при обработке - {str(e)}")
+                continue
+            if department is None:
+                continue
+            if department.code in existing_codes or department.code in file_codes:
+                self.errors.append(f"Строка {row_num}: подразделение с кодом '{department.code}' уже существует")
+                continue
+            file_codes.add(department.code)
+            entries.append({'row_num': row_num, 'dept': department, 'parent_str': data['parent'], 'parent_entry': None})
+
+        file_by_name = defaultdict(list)
+        file_by_code = {}
+        for entry in entries:
+            if entry['dept'].is_active:
+                file_by_name[entry['dept'].name].append(entry)
+                file_by_code[entry['dept'].code] = entry
+
+        # Разрешение родителей: сначала среди существующих (как раньше), затем среди строк файла
+        resolved = []
+        for entry in entries:
+            parent_str = entry['parent_str']
+            if parent_str:
+                if len(existing_by_name.get(parent_str, [])) == 1:
+                    entry['dept'].parent = existing_by_name[parent_str][0]
+                elif parent_str in existing_by_name:
+                    self.errors.append(
+                        f"Строка {entry['row_num']}: найдено несколько подразделений с названием: {parent_str}"
+                    )
+                    continue
+                elif parent_str in existing_by_code:
+                    entry['dept'].parent = existing_by_code[parent_str]
+                elif len(file_by_name.get(parent_str, [])) == 1 and file_by_name[parent_str][0] is not entry:
+                    entry['parent_entry'] = file_by_name[parent_str][0]
+                elif parent_str in file_by_code and file_by_code[parent_str] is not entry:
+                    entry['parent_entry'] = file_by_code[parent_str]
+                else:
+                    self.errors.append(f"Строка {entry['row_num']}: родительское подразделение не найдено: {parent_str}")
+                    continue
+            resolved.append(entry)
+
+        levels = self._order_by_level(resolved)
+        self._allocate_sorting(levels, existing_sortings)
+
+        imported = 0
+        with transaction.atomic():
+            for level in levels:
+                for entry in level:
+                    if entry['parent_entry'] is not None:
+                        entry['dept'].parent = entry['parent_entry']['dept']
+                Departments.objects.bulk_create([entry['dept'] for entry in level], batch_size=BULK_BATCH_SIZE)
+                imported += len(level)
+
+        if imported:
+            Departments.invalidate_tree_cache()
+        return imported
+
+    def _order_by_level(self, entries):
+        """
+        Топологическая сортировка: группирует строки по уровням так, чтобы
+        родитель из файла создавался раньше потомков. Строки в цикле и потомки
+        отклоненных строк отбрасываются с ошибкой.
+        """
+        accepted = {id(entry) for entry in entries}
+        depth = {}  # id строки -> уровень или None, если строка отклонена
+
+        for entry in entries:
+            path = []
+            on_path = set()
+            current = entry
+            # Поднимаемся по родителям из файла до строки с известным уровнем
+            while current is not None and id(current) not in depth:
+                if id(current) in on_path or id(current) not in accepted:
+                    break
+                on_path.add(id(current))
+                path.append(current)
+                current = current['parent_entry']
+
+            if current is None:
+                base = -1
+            elif id(current) in depth:
+                base = depth[id(current)]
+            else:
+                base = None
+                if id(current) in on_path:
+                    cycle = path[path.index(current):]
+                    for member in cycle:
+                        depth[id(member)] = None
+                        self.errors.append(f"Строка {member['row_num']}: циклическая ссылка на родительское подразделение")
+                    path = path[:path.index(current)]
+
+            for member in reversed(path):
+                if base is None:
+                    depth[id(member)] = None
+                    self.errors.append(
+                        f"Строка {member['row_num']}: родительское подразделение не импортировано: {member['parent_str']}"
+                    )
+                else:
+                    base += 1
+                    depth[id(member)] = base
+
+        levels = defaultdict(list)
+        for entry in entries:
+            if depth.get(id(entry)) is not None:
+                levels[depth[id(entry)]].append(entry)
+        return [levels[level] for level in sorted(levels)]
+
+    def _allocate_sorting(self, levels, existing_sortings):
+        """
+        Выделяет коды сортировки строкам без явного кода.
+        Под существующими родителями блоки резервируются через счетчик
+        (Departments.reserve_sorting_codes), под новыми - вычисляются в памяти.
+        """
+        taken = {sorting for sorting in existing_sortings if SORTING_RE.match(sorting)}
+        for level in levels:
+            for entry in level:
+                if entry['dept'].sorting:
+                    taken.add(entry['dept'].sorting)
+
+        max_segment = defaultdict(int)
+        for sorting in taken:
+            prefix, _, segment = sorting.rpartition('.')
+            max_segment[prefix] = max(max_segment[prefix], int(segment))
+
+        for level in levels:
+            pending_existing = defaultdict(list)
+            for entry in level:
+                if entry['dept'].sorting:
+                    continue
+                parent_entry = entry['parent_entry']
+                if parent_entry is not None:
+                    prefix = parent_entry['dept'].sorting
+                    max_segment[prefix] += 1
+                    entry['dept'].sorting = f"{prefix}.{max_segment[prefix]:03d}"
+                else:
+                    parent = entry['dept'].parent
+                    pending_existing[parent.pk if parent else None].append(entry)
+
+            for group in pending_existing.values():
+                parent = group[0]['dept'].parent
+                codes = []
+                while len(codes) < len(group):
+                    reserved = Departments.reserve_sorting_codes(parent=parent, count=len(group) - len(codes))
+                    # Пропускаем коды, явно указанные в других строках файла
+                    codes.extend(code for code in reserved if code not in taken)
+                for entry, code in zip(group, codes):
+                    entry['dept'].sorting = code
+                    taken.add(code)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0013_update_departments_sorting_field'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='departments',
+            name='sorting',
+            field=models.CharField(blank=True, db_index=True, help_text='Путь сортировки в формате: 001, 001.001, 001.002.001 и т.д. (сегменты по 3 цифры, разделенные точкой)', max_length=100, verbose_name='Код сортировки'),
+        ),
+    ]
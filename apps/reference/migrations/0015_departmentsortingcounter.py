@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0014_departments_sorting_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentSortingCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(blank=True, help_text='Пустая строка - корневой уровень', max_length=100, unique=True, verbose_name='Код сортировки родителя')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Последний выданный номер')),
+            ],
+            options={
+                'verbose_name': 'Счетчик кодов сортировки',
+                'verbose_name_plural': 'Счетчики кодов сортировки',
+            },
+        ),
+    ]
@@ -1,9 +1,53 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models.functions import Length
+from django.utils import timezone
+from django.core.cache import cache
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 import re
 
 
+# Ключ кэша полного дерева подразделений
+DEPARTMENTS_TREE_CACHE_KEY = 'reference:departments_tree'
+DEPARTMENTS_TREE_CACHE_TIMEOUT = 60 * 60
+
+
+class DepartmentsQuerySet(models.QuerySet):
+    """
+    Иерархические выборки по материализованному пути sorting.
+
+    Поддерево узла с путем P - это диапазон P <= sorting < P + '/':
+    символ '/' следует сразу за '.' и предшествует цифрам, поэтому в диапазон
+    попадают только сам узел и пути вида P.NNN... Такой фильтр выполняется
+    одним запросом по индексу на sorting.
+    """
+
+    def subtree(self, department, include_self=True):
+        """Подразделение и все его потомки"""
+        if not department.sorting:
+            ids = department.subtree_ids(include_self=include_self)
+            return self.filter(pk__in=ids)
+        if include_self:
+            queryset = self.filter(sorting__gte=department.sorting)
+        else:
+            queryset = self.filter(sorting__gt=department.sorting)
+        return queryset.filter(sorting__lt=department.sorting + '/')
+
+    def ancestors_of(self, department, include_self=False):
+        """Предки подразделения от корня (по префиксам пути)"""
+        if not department.sorting:
+            return self.none()
+        segments = department.sorting.split('.')
+        if not include_self:
+            segments = segments[:-1]
+        paths = ['.'.join(segments[:i]) for i in range(1, len(segments) + 1)]
+        return self.filter(sorting__in=paths).order_by('sorting')
+
+    def at_level(self, level):
+        """Подразделения заданного уровня вложенности (0 - корневые)"""
+        return self.annotate(sorting_length=Length('sorting')).filter(sorting_length=level * 4 + 3)
+
+
 class Departments(models.Model):
     """Справочник подразделений организации"""
     name = models.CharField(max_length=200, verbose_name="Название подразделения")
@@ -11,6 +55,7 @@ class Departments(models.Model):
     sorting = models.CharField(
         max_length=100, 
         blank=True, 
+        db_index=True,
         verbose_name="Код сортировки",
         help_text="Путь сортировки в формате: 001, 001.001, 001.002.001 и т.д. (сегменты по 3 цифры, разделенные точкой)"
     )
@@ -87,6 +132,8 @@ class Departments(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = DepartmentsQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Подразделение"
         verbose_name_plural = "Подразделения"
@@ -108,87 +155,155 @@ class Departments(models.Model):
     @staticmethod
     def get_next_sorting_code(parent=None, exclude_pk=None):
         """
-        Генерирует следующий код сортировки для дочернего элемента.
+        Следующий свободный код сортировки под parent, без резервирования.
         Возвращает код вида: parent_sorting.001, parent_sorting.002 и т.д.
+        Для сохранения подразделения код выделяется через allocate_sorting_code.
         
         Args:
             parent: Родительское подразделение (опционально)
             exclude_pk: ID подразделения, которое нужно исключить из поиска (для обновления)
         """
-        if parent and parent.sorting:
-            # Получаем все дочерние элементы с тем же родителем
-            siblings = Departments.objects.filter(parent=parent)
-            if exclude_pk:
-                siblings = siblings.exclude(pk=exclude_pk)
-            
-            # Фильтруем только те, у которых sorting начинается с parent.sorting + '.'
-            # и имеет правильный формат (ровно на один уровень глубже)
-            parent_prefix = parent.sorting + '.'
-            siblings_list = []
-            for s in siblings:
-                if s.sorting and s.sorting.startswith(parent_prefix):
-                    # Проверяем, что это прямой потомок (ровно на один уровень глубже)
-                    remaining = s.sorting[len(parent_prefix):]
-                    if re.match(r'^\d{3}$', remaining):
-                        siblings_list.append(s)
-            
-            if siblings_list:
-                # Находим максимальный код среди братьев
-                max_sorting = max(siblings_list, key=lambda x: x.sorting)
-                if max_sorting and max_sorting.sorting:
-                    # Извлекаем последний сегмент
-                    last_segment = max_sorting.sorting.split('.')[-1]
-                    try:
-                        next_num = int(last_segment) + 1
-                        return f"{parent.sorting}.{next_num:03d}"
-                    except ValueError:
-                        pass
-            # Если нет братьев или ошибка, начинаем с 001
-            return f"{parent.sorting}.001"
+        prefix = parent.sorting if parent and parent.sorting else ''
+        counter_value = DepartmentSortingCounter.objects.filter(prefix=prefix).values_list(
+            'last_value', flat=True
+        ).first() or 0
+        next_value = max(counter_value, Departments.get_max_sorting_segment(prefix, exclude_pk=exclude_pk)) + 1
+        return f"{prefix}.{next_value:03d}" if prefix else f"{next_value:03d}"
+    
+    @staticmethod
+    def allocate_sorting_code(parent=None):
+        """Выделяет (резервирует) один код сортировки под parent - вызывается один раз на сохранение"""
+        return Departments.reserve_sorting_codes(parent=parent, count=1)[0]
+    
+    @staticmethod
+    def reserve_sorting_codes(parent=None, count=1):
+        """
+        Резервирует блок из count последовательных кодов сортировки под parent.
+        
+        Счетчик DepartmentSortingCounter увеличивается одним UPDATE, который
+        блокирует строку счетчика (на SQLite - всю БД на запись) до конца
+        транзакции, поэтому параллельные вызовы получают непересекающиеся блоки.
+        Счетчик сверяется с максимальным существующим кодом уровня
+        (агрегат по индексу sorting), чтобы учесть коды, заданные вручную.
+        
+        Returns:
+            list: коды вида ['001.003', '001.004', ...]
+        """
+        prefix = parent.sorting if parent and parent.sorting else ''
+        last_value = DepartmentSortingCounter.allocate(prefix, count)
+        first_value = last_value - count + 1
+        if prefix:
+            return [f"{prefix}.{value:03d}" for value in range(first_value, last_value + 1)]
+        return [f"{value:03d}" for value in range(first_value, last_value + 1)]
+    
+    @staticmethod
+    def get_max_sorting_segment(prefix='', exclude_pk=None):
+        """
+        Максимальный последний сегмент среди кодов уровня, следующего за prefix
+        (один агрегирующий запрос по индексу sorting). 0, если кодов нет.
+        """
+        if prefix:
+            queryset = Departments.objects.filter(sorting__gt=prefix + '.', sorting__lt=prefix + '/')
         else:
-            # Корневой элемент - ищем максимальный код среди корневых
-            root_departments = Departments.objects.filter(parent=None)
-            if exclude_pk:
-                root_departments = root_departments.exclude(pk=exclude_pk)
-            
-            # Фильтруем только те, у которых sorting в формате 001, 002 и т.д.
-            valid_roots = [d for d in root_departments if d.sorting and re.match(r'^\d{3}$', d.sorting)]
-            if valid_roots:
-                max_sorting = max(valid_roots, key=lambda x: int(x.sorting))
-                if max_sorting and max_sorting.sorting:
-                    try:
-                        next_num = int(max_sorting.sorting) + 1
-                        return f"{next_num:03d}"
-                    except ValueError:
-                        pass
-            return "001"
+            queryset = Departments.objects.all()
+        if exclude_pk:
+            queryset = queryset.exclude(pk=exclude_pk)
+        max_sorting = queryset.annotate(
+            sorting_length=Length('sorting')
+        ).filter(
+            sorting_length=len(prefix) + 4 if prefix else 3
+        ).aggregate(max_sorting=models.Max('sorting'))['max_sorting']
+        if not max_sorting:
+            return 0
+        try:
+            return int(max_sorting.split('.')[-1])
+        except ValueError:
+            return 0
     
     def update_children_sorting(self):
         """
         Обновляет коды сортировки всех дочерних элементов при изменении родителя.
+        
+        Новые пути всего поддерева вычисляются в памяти (дети нумеруются
+        по порядку sorting, name: .001, .002, ...) и записываются одним
+        bulk_update в транзакции. Сигналы post_save для потомков не вызываются.
+        
+        Returns:
+            int: количество обновленных подразделений
         """
         if not self.sorting:
-            return
+            return 0
+        
+        # Загружаем поддерево по parent уровень за уровнем (один запрос на уровень):
+        # старые пути потомков могут не соответствовать новому положению узла
+        children_by_parent = {}
+        visited = {self.pk}
+        level = [self.pk]
+        while level:
+            children = Departments.objects.filter(parent_id__in=level).exclude(
+                pk__in=visited
+            ).order_by('sorting', 'name').only('pk', 'parent_id', 'sorting')
+            level = []
+            for child in children:
+                children_by_parent.setdefault(child.parent_id, []).append(child)
+                visited.add(child.pk)
+                level.append(child.pk)
         
-        children = Departments.objects.filter(parent=self)
-        for child in children:
-            # Генерируем новый код на основе нового родителя
-            new_sorting = Departments.get_next_sorting_code(parent=self, exclude_pk=child.pk)
-            child.sorting = new_sorting
-            child.save()
-            # Рекурсивно обновляем потомков
-            child.update_children_sorting()
+        # Вычисляем новые пути сверху вниз
+        changed = []
+        now = timezone.now()
+        stack = [(self.pk, self.sorting)]
+        while stack:
+            parent_pk, parent_sorting = stack.pop()
+            for index, child in enumerate(children_by_parent.get(parent_pk, []), start=1):
+                new_sorting = f"{parent_sorting}.{index:03d}"
+                if child.sorting != new_sorting:
+                    child.sorting = new_sorting
+                    child.updated_at = now
+                    changed.append(child)
+                stack.append((child.pk, new_sorting))
+        
+        if changed:
+            with transaction.atomic():
+                Departments.objects.bulk_update(changed, ['sorting', 'updated_at'], batch_size=500)
+            Departments.invalidate_tree_cache()
+        return len(changed)
+    
+    def descendants(self, include_self=False):
+        """
+        QuerySet всех потомков подразделения (один запрос по пути sorting).
+        """
+        return Departments.objects.subtree(self, include_self=include_self).order_by('sorting', 'name')
+    
+    def ancestors(self, include_self=False):
+        """
+        QuerySet предков подразделения от корня к непосредственному родителю.
+        """
+        return Departments.objects.ancestors_of(self, include_self=include_self)
+    
+    def subtree_ids(self, include_self=True):
+        """
+        Список ID подразделения и всех его потомков.
+        Для подразделений без sorting обход выполняется по parent (один запрос на уровень).
+        """
+        if self.sorting:
+            return list(
+                Departments.objects.subtree(self, include_self=include_self).values_list('pk', flat=True)
+            )
+        ids = [self.pk] if include_self else []
+        level = [self.pk]
+        while level:
+            level = list(Departments.objects.filter(parent_id__in=level).values_list('pk', flat=True))
+            ids.extend(level)
+        return ids
     
     def get_all_descendants(self):
         """
         Возвращает все дочерние подразделения (рекурсивно).
         """
-        descendants = []
-        children = Departments.objects.filter(parent=self).order_by('sorting')
-        for child in children:
-            descendants.append(child)
-            descendants.extend(child.get_all_descendants())
-        return descendants
+        if not self.sorting:
+            return list(Departments.objects.filter(pk__in=self.subtree_ids(include_self=False)).order_by('sorting'))
+        return list(self.descendants())
     
     def get_level(self):
         """
@@ -197,6 +312,99 @@ class Departments(models.Model):
         if not self.sorting:
             return 0
         return len(self.sorting.split('.')) - 1
+    
+    @staticmethod
+    def get_cached_tree(active_only=True):
+        """
+        Полное дерево подразделений из кэша.
+        Возвращает список корневых узлов вида {'dept': Departments, 'children': [...]}.
+        Кэш сбрасывается сигналами при сохранении/удалении подразделений
+        и явно после массовых операций (invalidate_tree_cache).
+        """
+        cache_key = f'{DEPARTMENTS_TREE_CACHE_KEY}:{"active" if active_only else "all"}'
+        tree = cache.get(cache_key)
+        if tree is None:
+            departments = Departments.objects.order_by('sorting', 'name')
+            if active_only:
+                departments = departments.filter(is_active=True)
+            tree = Departments.build_tree(list(departments))
+            cache.set(cache_key, tree, DEPARTMENTS_TREE_CACHE_TIMEOUT)
+        return tree
+    
+    @staticmethod
+    def invalidate_tree_cache():
+        """Сбрасывает кэш дерева подразделений"""
+        cache.delete_many([f'{DEPARTMENTS_TREE_CACHE_KEY}:active', f'{DEPARTMENTS_TREE_CACHE_KEY}:all'])
+    
+    @staticmethod
+    def build_tree(departments):
+        """
+        Строит дерево из плоского списка, отсортированного по sorting.
+        Узлы, родитель которых отсутствует в списке, становятся корневыми.
+        """
+        nodes = {dept.pk: {'dept': dept, 'children': []} for dept in departments}
+        roots = []
+        for dept in departments:
+            node = nodes[dept.pk]
+            if dept.parent_id in nodes:
+                nodes[dept.parent_id]['children'].append(node)
+            else:
+                roots.append(node)
+        return roots
+
+
+class DepartmentSortingCounter(models.Model):
+    """Счетчик последнего выданного сегмента кода сортировки для каждого уровня дерева"""
+    prefix = models.CharField(
+        max_length=100,
+        unique=True,
+        blank=True,
+        verbose_name="Код сортировки родителя",
+        help_text="Пустая строка - корневой уровень"
+    )
+    last_value = models.PositiveIntegerField(default=0, verbose_name="Последний выданный номер")
+
+    class Meta:
+        verbose_name = "Счетчик кодов сортировки"
+        verbose_name_plural = "Счетчики кодов сортировки"
+
+    def __str__(self):
+        return f"{self.prefix or '(корень)'}: {self.last_value}"
+
+    @staticmethod
+    def allocate(prefix, count=1):
+        """
+        Атомарно выделяет count номеров для уровня prefix.
+        Возвращает последний выделенный номер (блок: last - count + 1 .. last).
+        """
+        with transaction.atomic():
+            # Первой операцией в транзакции идет запись: она берет блокировку
+            # и сериализует параллельные выделения для одного prefix
+            updated = DepartmentSortingCounter.objects.filter(prefix=prefix).update(
+                last_value=models.F('last_value') + count
+            )
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        DepartmentSortingCounter.objects.create(
+                            prefix=prefix,
+                            last_value=Departments.get_max_sorting_segment(prefix) + count
+                        )
+                except IntegrityError:
+                    # Счетчик создан параллельным запросом - увеличиваем его
+                    DepartmentSortingCounter.objects.filter(prefix=prefix).update(
+                        last_value=models.F('last_value') + count
+                    )
+            
+            last_value = DepartmentSortingCounter.objects.get(prefix=prefix).last_value
+            
+            # Коды могли быть заданы вручную или при перенумерации поддерева
+            existing_max = Departments.get_max_sorting_segment(prefix)
+            if last_value - count < existing_max:
+                last_value = existing_max + count
+                DepartmentSortingCounter.objects.filter(prefix=prefix).update(last_value=last_value)
+        
+        return last_value
 
 
 class Postname(models.Model):
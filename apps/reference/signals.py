@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Departments
+
+
+@receiver(post_save, sender=Departments)
+@receiver(post_delete, sender=Departments)
+def invalidate_departments_tree(sender, instance, **kwargs):
+    """Сброс кэша дерева подразделений при изменении подразделения"""
+    Departments.invalidate_tree_cache()
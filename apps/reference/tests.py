@@ -1,3 +1,88 @@
-from django.test import TestCase
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from .admin import DepartmentsAdmin
+from .forms import DepartmentForm
+from .models import Departments
+
+
+class DepartmentSortingCodeTests(TestCase):
+    """Выделение кодов сортировки при создании подразделений через форму и админ-панель"""
+
+    def _create_with_form(self, name, parent=None):
+        form = DepartmentForm(data={
+            'name': name,
+            'code': name,
+            'parent': parent.pk if parent else '',
+            'is_active': True,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def _create_with_admin(self, name, parent=None):
+        model_admin = DepartmentsAdmin(Departments, AdminSite())
+        request = RequestFactory().post('/')
+        request.user = get_user_model().objects.create_superuser(f'admin-{name}', password='x')
+        form_class = model_admin.get_form(request)
+        form = form_class(data={
+            'name': name,
+            'code': name,
+            'parent': parent.pk if parent else '',
+            'is_active': True,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        obj = form.save(commit=False)
+        model_admin.save_model(request, obj, form, change=False)
+        return obj
+
+    def test_form_allocates_one_code_per_create(self):
+        root = self._create_with_form('root')
+        first_child = self._create_with_form('child-1', parent=root)
+        second_child = self._create_with_form('child-2', parent=root)
+        second_root = self._create_with_form('root-2')
+
+        self.assertEqual(root.sorting, '001')
+        self.assertEqual(first_child.sorting, '001.001')
+        self.assertEqual(second_child.sorting, '001.002')
+        self.assertEqual(second_root.sorting, '002')
+
+    def test_admin_allocates_one_code_per_create(self):
+        root = self._create_with_admin('root')
+        first_child = self._create_with_admin('child-1', parent=root)
+        second_child = self._create_with_admin('child-2', parent=root)
+        second_root = self._create_with_admin('root-2')
+
+        self.assertEqual(root.sorting, '001')
+        self.assertEqual(first_child.sorting, '001.001')
+        self.assertEqual(second_child.sorting, '001.002')
+        self.assertEqual(second_root.sorting, '002')
+
+    def test_get_next_sorting_code_does_not_reserve(self):
+        root = self._create_with_form('root')
+
+        self.assertEqual(Departments.get_next_sorting_code(parent=root), '001.001')
+        self.assertEqual(Departments.get_next_sorting_code(parent=root), '001.001')
+        self.assertEqual(Departments.get_next_sorting_code(), '002')
+
+        # Код, заданный вручную, учитывается; код исключенного подразделения - нет
+        manual = Departments.objects.create(name='manual', code='manual', sorting='005')
+        self.assertEqual(Departments.get_next_sorting_code(), '006')
+        self.assertEqual(Departments.get_next_sorting_code(exclude_pk=manual.pk), '002')
+
+    def test_reparent_allocates_code_under_new_parent(self):
+        first_root = self._create_with_form('root-1')
+        second_root = self._create_with_form('root-2')
+        child = self._create_with_form('child', parent=first_root)
+
+        form = DepartmentForm(instance=child, data={
+            'name': 'child',
+            'code': 'child',
+            'sorting': child.sorting,
+            'parent': second_root.pk,
+            'is_active': True,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        child = form.save()
+
+        self.assertEqual(child.sorting, '002.001')
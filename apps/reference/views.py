@@ -7,6 +7,7 @@ from django.urls import reverse_lazy
 from django.db.models import Q
 from django.http import HttpResponse
 from .models import Departments, Postname, ITAsset, CertificateType
+from .importers import DepartmentCSVImporter
 from .forms import DepartmentForm, PostnameForm, CSVImportPostnameForm, CSVImportDepartmentForm, ITAssetForm, CertificateTypeForm
 import csv
 
@@ -16,20 +17,7 @@ def build_department_tree(departments):
     Строит дерево подразделений из плоского списка, отсортированного по sorting.
     Возвращает список корневых элементов, каждый с атрибутом 'children' (список дочерних).
     """
-    # Создаем словарь для быстрого доступа
-    dept_dict = {dept.pk: {'dept': dept, 'children': []} for dept in departments}
-    roots = []
-    
-    for dept in departments:
-        node = dept_dict[dept.pk]
-        if dept.parent and dept.parent.pk in dept_dict:
-            # Добавляем к родителю
-            dept_dict[dept.parent.pk]['children'].append(node)
-        else:
-            # Корневой элемент
-            roots.append(node)
-    
-    return roots
+    return Departments.build_tree(departments)
 
 
 class DepartmentListView(LoginRequiredMixin, ListView):
@@ -53,9 +41,8 @@ class DepartmentListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search'] = self.request.GET.get('search', '')
-        # Добавляем дерево подразделений для отображения иерархии
-        departments_list = list(context['departments'])
-        context['department_tree'] = build_department_tree(departments_list)
+        # Добавляем полное дерево подразделений (из кэша) для отображения иерархии
+        context['department_tree'] = Departments.get_cached_tree()
         return context
 
 
@@ -124,173 +111,9 @@ class DepartmentCSVImportView(LoginRequiredMixin, View):
                     messages.error(request, 'Файл пуст.')
                     return render(request, 'reference/departments_csv_import.html', {'form': form})
                 
-                imported = 0
-                errors = []
-                
-                # Определяем, есть ли заголовок
-                first_line_lower = lines[0].lower()
-                has_header = 'название' in first_line_lower or 'name' in first_line_lower or 'подразделение' in first_line_lower
-                
-                if has_header:
-                    csv_reader = csv.DictReader(lines, delimiter=';')
-                    start_row = 2
-                else:
-                    csv_reader = csv.reader(lines, delimiter=';')
-                    start_row = 1
-                
-                for row_num, row_data in enumerate(csv_reader, start=start_row):
-                    try:
-                        if has_header:
-                            row = row_data
-                            name = row.get('Название', '').strip()
-                            code = row.get('Код', '').strip()
-                            sorting = row.get('Код сортировки', '').strip()
-                            description = row.get('Описание', '').strip()
-                            dep_short_name = row.get('Короткое наименование', '').strip()
-                            email = row.get('Email', '').strip()
-                            zipcode = row.get('Почтовый индекс', '').strip()
-                            city = row.get('Город', '').strip()
-                            street = row.get('Улица', '').strip()
-                            bldg = row.get('Здание', '').strip()
-                            net_id = row.get('Идентификатор узла', '').strip()
-                            ip = row.get('IP адрес', '').strip()
-                            mask_str = row.get('Маска', '').strip()
-                            parent_str = row.get('Родительское подразделение', '').strip()
-                            is_logical_str = row.get('Логическое', '').strip()
-                            is_active_str = row.get('Активно', '').strip()
-                        else:
-                            if len(row_data) < 2:
-                                errors.append(f"Строка {row_num}: недостаточно данных (нужно минимум 2 поля: Название, Код)")
-                                continue
-                            name = row_data[0].strip() if len(row_data) > 0 else ''
-                            code = row_data[1].strip() if len(row_data) > 1 else ''
-                            sorting = row_data[2].strip() if len(row_data) > 2 else ''
-                            description = row_data[3].strip() if len(row_data) > 3 else ''
-                            dep_short_name = row_data[4].strip() if len(row_data) > 4 else ''
-                            email = row_data[5].strip() if len(row_data) > 5 else ''
-                            zipcode = row_data[6].strip() if len(row_data) > 6 else ''
-                            city = row_data[7].strip() if len(row_data) > 7 else ''
-                            street = row_data[8].strip() if len(row_data) > 8 else ''
-                            bldg = row_data[9].strip() if len(row_data) > 9 else ''
-                            net_id = row_data[10].strip() if len(row_data) > 10 else ''
-                            ip = row_data[11].strip() if len(row_data) > 11 else ''
-                            mask_str = row_data[12].strip() if len(row_data) > 12 else ''
-                            parent_str = row_data[13].strip() if len(row_data) > 13 else ''
-                            is_logical_str = row_data[14].strip() if len(row_data) > 14 else ''
-                            is_active_str = row_data[15].strip() if len(row_data) > 15 else ''
-                        
-                        # Валидация обязательных полей
-                        if not name or not code:
-                            errors.append(f"Строка {row_num}: отсутствует название или код")
-                            continue
-                        
-                        # Проверка уникальности кода
-                        if Departments.objects.filter(code=code).exists():
-                            errors.append(f"Строка {row_num}: подразделение с кодом '{code}' уже существует")
-                            continue
-                        
-                        # Поиск родительского подразделения (опционально)
-                        parent = None
-                        if parent_str:
-                            try:
-                                parent = Departments.objects.get(name=parent_str, is_active=True)
-                            except Departments.DoesNotExist:
-                                try:
-                                    parent = Departments.objects.get(code=parent_str, is_active=True)
-                                except Departments.DoesNotExist:
-                                    errors.append(f"Строка {row_num}: родительское подразделение не найдено: {parent_str}")
-                                    continue
-                        
-                        # Определяем is_logical
-                        is_logical = False
-                        if is_logical_str:
-                            is_logical_str_lower = is_logical_str.lower()
-                            if is_logical_str_lower in ['true', '1', 'да', 'yes', 'да']:
-                                is_logical = True
-                            elif is_logical_str_lower in ['false', '0', 'нет', 'no']:
-                                is_logical = False
-                        
-                        # Определяем is_active
-                        is_active = True
-                        if is_active_str:
-                            is_active_str_lower = is_active_str.lower()
-                            if is_active_str_lower in ['false', '0', 'нет', 'no']:
-                                is_active = False
-                            elif is_active_str_lower in ['true', '1', 'да', 'yes']:
-                                is_active = True
-                        
-                        # Обработка маски
-                        mask = None
-                        if mask_str:
-                            try:
-                                mask = int(mask_str)
-                                if mask < 0 or mask > 32:
-                                    errors.append(f"Строка {row_num}: маска должна быть в диапазоне от 0 до 32")
-                                    continue
-                            except ValueError:
-                                errors.append(f"Строка {row_num}: неверный формат маски: {mask_str}")
-                                continue
-                        
-                        # Валидация net_id
-                        if net_id and len(net_id) > 4:
-                            errors.append(f"Строка {row_num}: идентификатор узла должен содержать не более 4 символов")
-                            continue
-                        
-                        # Валидация email (если указан)
-                        if email and '@' not in email:
-                            errors.append(f"Строка {row_num}: неверный формат email: {email}")
-                            continue
-                        
-                        # Валидация sorting, если указан
-                        if sorting:
-                            import re
-                            if not re.match(r'^(\d{3})(\.\d{3})*$', sorting):
-                                errors.append(f"Строка {row_num}: неверный формат кода сортировки: {sorting}. Должен быть в формате: 001, 001.001, 001.002.001 и т.д.")
-                                continue
-                        
-                        # Если sorting не указан, генерируем автоматически на основе parent
-                        if not sorting and parent:
-                            sorting = Departments.get_next_sorting_code(parent=parent)
-                        elif not sorting:
-                            sorting = Departments.get_next_sorting_code(parent=None)
-                        
-                        # Создаем подразделение с обработкой ошибок валидации
-                        try:
-                            department = Departments(
-                                name=name,
-                                code=code,
-                                sorting=sorting,
-                                description=description,
-                                dep_short_name=dep_short_name,
-                                email=email if email else '',
-                                zipcode=zipcode,
-                                city=city,
-                                street=street,
-                                bldg=bldg,
-                                net_id=net_id,
-                                ip=ip if ip else None,
-                                mask=mask,
-                                parent=parent,
-                                is_logical=is_logical,
-                                is_active=is_active
-                            )
-                            department.full_clean()  # Валидация всех полей
-                            department.save()
-                            imported += 1
-                        except Exception as e:
-                            # Обработка ошибок валидации Django
-                            error_msg = str(e)
-                            if hasattr(e, 'error_dict'):
-                                error_details = []
-                                for field, field_errors in e.error_dict.items():
-                                    for err in field_errors:
-                                        error_details.append(f"{field}: {err.message}")
-                                error_msg = "; ".join(error_details)
-                            errors.append(f"Строка {row_num}: ошибка валидации - {error_msg}")
-                            continue
-                        
-                    except Exception as e:
-                        errors.append(f"Строка {row_num}: ошибка при обработке - {str(e)}")
+                importer = DepartmentCSVImporter()
+                imported = importer.run(lines)
+                errors = importer.errors
                 
                 if imported > 0:
                     messages.success(request, f'Успешно импортировано подразделений: {imported}')
@@ -1,4 +1,11 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
 from django.conf import settings
+from django.db import connections
 from django.shortcuts import redirect
 from urllib.parse import quote as urlquote
 
@@ -47,3 +54,161 @@ class RequireLoginMiddleware:
         return redirect(f"{login_url}?next={next_param}")
 
 
+class RequestStats:
+    """
+    Потокобезопасное хранилище метрик запросов в памяти процесса.
+    Для каждого имени URL хранится кольцевой буфер последних замеров.
+    """
+
+    def __init__(self, maxlen=500):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._buffers = defaultdict(lambda: deque(maxlen=self.maxlen))
+
+    def record(self, route, sample):
+        with self._lock:
+            self._buffers[route].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+
+    @staticmethod
+    def _percentile(sorted_values, percent):
+        """Перцентиль методом ближайшего ранга"""
+        if not sorted_values:
+            return 0.0
+        rank = max(int(math.ceil(percent / 100 * len(sorted_values))), 1)
+        return sorted_values[rank - 1]
+
+    def summary(self):
+        """
+        Сводка по маршрутам: количество замеров, p50/p95/p99 времени ответа (мс),
+        среднее и максимальное число SQL-запросов, среднее время БД/view/шаблонов.
+        """
+        with self._lock:
+            snapshot = {route: list(samples) for route, samples in self._buffers.items()}
+
+        result = {}
+        for route, samples in sorted(snapshot.items()):
+            total = sorted(s['total'] for s in samples)
+            queries = [s['queries'] for s in samples]
+            count = len(samples)
+            result[route] = {
+                'count': count,
+                'p50_ms': round(self._percentile(total, 50), 2),
+                'p95_ms': round(self._percentile(total, 95), 2),
+                'p99_ms': round(self._percentile(total, 99), 2),
+                'queries_avg': round(sum(queries) / count, 2),
+                'queries_max': max(queries),
+                'db_avg_ms': round(sum(s['db'] for s in samples) / count, 2),
+                'view_avg_ms': round(sum(s['view'] for s in samples) / count, 2),
+                'template_avg_ms': round(sum(s['template'] for s in samples) / count, 2),
+            }
+        return result
+
+
+request_stats = RequestStats(maxlen=getattr(settings, 'PERFORMANCE_RING_BUFFER_SIZE', 500))
+
+
+class _QueryTimer:
+    """execute_wrapper для подсчета количества и времени SQL-запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class PerformanceMiddleware:
+    """
+    Замеры производительности запроса:
+    - количество SQL-запросов и суммарное время БД (по всем подключениям);
+    - время view (от process_view до возврата ответа view);
+    - время рендеринга шаблона для TemplateResponse (для render() оно входит во время view).
+
+    Результаты сохраняются в request_stats с группировкой по имени URL
+    (например, 'directory:directory'); запросы к неизвестным URL учитываются под
+    одним ключом UNRESOLVED_ROUTE, чтобы случайные адреса не добавляли новых буферов.
+    Заголовок Server-Timing отдается только в режиме DEBUG и сотрудникам (is_staff).
+    Включается настройкой PERFORMANCE_PROFILING.
+    """
+
+    UNRESOLVED_ROUTE = '<unresolved>'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERFORMANCE_PROFILING', False)
+        self.ignore_prefixes = ('/static/', '/media/')
+
+    def __call__(self, request):
+        if not self.enabled or request.path.startswith(self.ignore_prefixes):
+            return self.get_response(request)
+
+        timer = _QueryTimer()
+        request._perf = {'view_start': None, 'view_end': None, 'render_end': None}
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timer))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        marks = request._perf
+        view_time = template_time = 0.0
+        if marks['view_start'] is not None:
+            view_end = marks['view_end'] or start + total
+            view_time = view_end - marks['view_start']
+            if marks['view_end'] is not None and marks['render_end'] is not None:
+                template_time = marks['render_end'] - marks['view_end']
+
+        sample = {
+            'total': total * 1000,
+            'db': timer.duration * 1000,
+            'queries': timer.count,
+            'view': view_time * 1000,
+            'template': template_time * 1000,
+        }
+        match = request.resolver_match
+        route = match.view_name if match else self.UNRESOLVED_ROUTE
+        request_stats.record(route, sample)
+
+        if self._show_server_timing(request):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={sample["db"]:.2f};desc="SQL x{timer.count}"',
+                f'view;dur={sample["view"]:.2f}',
+                f'tpl;dur={sample["template"]:.2f}',
+                f'total;dur={sample["total"]:.2f}',
+            ])
+        return response
+
+    @staticmethod
+    def _show_server_timing(request):
+        """Детали запроса (число SQL-запросов) видны только при отладке и сотрудникам"""
+        if settings.DEBUG:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_perf'):
+            request._perf['view_start'] = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        if hasattr(request, '_perf'):
+            marks = request._perf
+            marks['view_end'] = time.perf_counter()
+
+            def mark_rendered(rendered_response):
+                marks['render_end'] = time.perf_counter()
+
+            response.add_post_render_callback(mark_rendered)
+        return response
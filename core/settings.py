@@ -25,6 +25,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,10 +97,51 @@ STATICFILES_DIRS = [
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Кэш: пулы вопросов, тексты вопросов и дерево подразделений.
+# По умолчанию LocMemCache - свой кэш в каждом процессе. Если сервер запущен в
+# нескольких процессах, сброс кэша в одном процессе не виден остальным до истечения
+# таймаута, поэтому для такого развертывания задается общий кэш через CACHE_BACKEND:
+# - django.core.cache.backends.db.DatabaseCache (LOCATION - имя таблицы, создается
+#   командой createcachetable; подходит и для нескольких серверов);
+# - django.core.cache.backends.filebased.FileBasedCache (LOCATION - каталог). Файловый
+#   кэш при каждой записи сверх MAX_ENTRIES перебирает и чистит весь каталог, поэтому
+#   MAX_ENTRIES держится небольшим; каталог переживает пересоздание БД - после
+#   перезаливки данных его нужно очистить.
+# Тесты всегда используют отдельный LocMemCache.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=3000, cast=int),
+        },
+    }
+}
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
 # MEDIA settings для файлов сертификатов
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Массовая загрузка сертификатов: число файлов в одном запросе и процессов для разбора
+DATA_UPLOAD_MAX_NUMBER_FILES = config('DATA_UPLOAD_MAX_NUMBER_FILES', default=2000, cast=int)
+CERTIFICATE_PARSE_WORKERS = config('CERTIFICATE_PARSE_WORKERS', default=0, cast=int)
+
+# Кэш разбора сертификатов по SHA-256 файла: размер LRU в памяти процесса и
+# необязательный общий кэш (алиас из CACHES, например файловый или в БД)
+CERTIFICATE_PARSE_CACHE_SIZE = config('CERTIFICATE_PARSE_CACHE_SIZE', default=1024, cast=int)
+CERTIFICATE_PARSE_SHARED_CACHE = config('CERTIFICATE_PARSE_SHARED_CACHE', default='')
+
+# PDF отчетов о результатах: кэш на диске вне MEDIA_ROOT (не раздается по /media/)
+# и максимальное число результатов в одной пакетной выгрузке
+RESULT_PDF_CACHE_DIR = config('RESULT_PDF_CACHE_DIR', default=str(BASE_DIR / 'var' / 'result_pdf'))
+RESULT_PDF_BATCH_LIMIT = config('RESULT_PDF_BATCH_LIMIT', default=500, cast=int)
+
+# Замеры производительности запросов (статистика на /performance/, заголовок Server-Timing - при DEBUG и для сотрудников)
+PERFORMANCE_PROFILING = config('PERFORMANCE_PROFILING', default=False, cast=bool)
+PERFORMANCE_RING_BUFFER_SIZE = config('PERFORMANCE_RING_BUFFER_SIZE', default=500, cast=int)
+
 # URL для редиректа после логина модератора
 LOGIN_URL = '/testing/moderator/login/'
 LOGIN_REDIRECT_URL = 'moderator:dashboard'
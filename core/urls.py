@@ -3,9 +3,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from apps.project_info import views as project_info
+from core import views as core_views
 # Импортируем наше представление для главной страницы
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('performance/', core_views.performance_stats, name='performance_stats'),
     path('accounts/logout/', include('django.contrib.auth.urls'), name='logout'),
     path('', project_info.home_page, name='home'),
     path('project-info/', include('apps.project_info.urls', namespace='project-info')),
@@ -0,0 +1,22 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from apps.access_management.utils.certificate_parser import certificate_parse_cache
+from core.middleware import request_stats
+
+
+@staff_member_required
+def performance_stats(request):
+    """
+    Статистика производительности по маршрутам (только для сотрудников):
+    p50/p95/p99 времени ответа и количество SQL-запросов на запрос,
+    попадания в кэш разбора сертификатов.
+    Данные собирает PerformanceMiddleware в памяти текущего процесса.
+    """
+    if request.GET.get('reset') == '1':
+        request_stats.clear()
+        certificate_parse_cache.reset_stats()
+    return JsonResponse({
+        'routes': request_stats.summary(),
+        'certificate_parse_cache': certificate_parse_cache.stats(),
+    }, json_dumps_params={'ensure_ascii': False})